@@ -0,0 +1,235 @@
+"""
+Repeatable benchmark for the stock data downloader.
+
+Runs StockDataDownloader.process_all against the offline synthetic provider with
+configurable request latency, payload size (bars per ticker), 429 probability
+(per request, or per symbol the way yf.download reports partial throttling),
+poison symbols that fail every request they are in, and outage windows, so batch size, concurrency and back-off settings can be compared
+without depending on live Yahoo behavior. Each run downloads into a fresh
+temporary directory and appends its configuration and results to a JSON file,
+tagged with the current git commit:
+
+    python benchmark_download.py --tickers 500 --workers 4 --rate 5 --error-rate 0.05 \\
+        --outage 20:35 --label concurrent-4
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import pandas as pd
+from rich.console import Console
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+script_dir = Path(__file__).parent
+sys.path.insert(0, str(script_dir))
+from download import BatchSizeController, DownloadMetrics, StockDataDownloader
+from providers import SyntheticProvider
+from storage import COMPRESSIONS, FORMATS
+
+def parse_outage(value: str) -> Tuple[float, float]:
+    """Parse an outage window given as START:END seconds after the run starts."""
+    try:
+        start, end = (float(part) for part in value.split(':'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Outage window must be START:END seconds, got {value!r}")
+    if end <= start:
+        raise argparse.ArgumentTypeError(f"Outage window must end after it starts: {value!r}")
+    return start, end
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process in MiB (None where the resource module is unavailable)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def git_commit() -> Optional[str]:
+    """Short hash of the checked out commit, with a -dirty suffix for local changes."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=script_dir,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=script_dir,
+                               capture_output=True, text=True, check=True).stdout.strip()
+        return commit + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmark(args) -> dict:
+    """
+    Download args.tickers synthetic tickers into a temporary directory.
+
+    Returns:
+        Dict of measured results
+    """
+    tickers = [f'SYN{i:05d}' for i in range(args.tickers)]
+    poison = random.Random(args.seed).sample(tickers, min(args.poison, len(tickers)))
+    end_date = pd.Timestamp(args.end_date)
+    start_date = end_date - pd.offsets.BDay(args.history_days - 1)
+    provider = SyntheticProvider(start_date=start_date.strftime('%Y-%m-%d'), end_date=end_date.strftime('%Y-%m-%d'),
+                                 latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                                 seed=args.seed, outages=args.outage, ticker_error_rate=args.ticker_error_rate,
+                                 poison=poison)
+    metrics = DownloadMetrics()
+
+    with tempfile.TemporaryDirectory(prefix='download-benchmark-') as output_dir:
+        downloader = StockDataDownloader(output_dir=output_dir, workers=args.workers, requests_per_second=args.rate,
+                                         burst=args.burst, provider=provider, storage_format=args.format,
+                                         max_retry_wait=args.max_retry_wait, rate_limit_pause=args.rate_limit_pause,
+                                         metrics=metrics,
+                                         compression=args.compression, compression_level=args.compression_level,
+                                         batch_sizer=BatchSizeController(initial=args.batch_size,
+                                                                         min_size=args.min_batch_size,
+                                                                         max_size=args.max_batch_size))
+        downloader.batch_pause = args.batch_pause
+        if not args.verbose:
+            downloader.console = Console(quiet=True)
+        # Outage windows count from the start of the downloads, not from provider setup
+        provider.started = time.monotonic()
+        started = time.perf_counter()
+        results = downloader.process_all(tickers)
+        elapsed = time.perf_counter() - started
+        quarantined = downloader.manifest.summary().get('quarantined', 0)
+        downloader.manifest.close()
+
+    succeeded = sum(1 for r in results if r.success)
+    sizes = [report['size'] for report in downloader.batch_sizer.history]
+    snapshot = metrics.snapshot()
+    throttled = metrics.get('throttled_seconds')
+    paused = metrics.get('sleep_seconds')
+    return {
+        'tickers': len(tickers),
+        'succeeded': succeeded,
+        'failed': len(tickers) - succeeded,
+        'elapsed_seconds': round(elapsed, 3),
+        'tickers_per_minute': round(succeeded / elapsed * 60, 2) if elapsed > 0 else 0.0,
+        'sleep_seconds': round(throttled + paused, 3),
+        'throttled_seconds': round(throttled, 3),
+        'paused_seconds': round(paused, 3),
+        'retries': int(metrics.get('retries')),
+        'requests': provider.requests,
+        'rate_limited_requests': provider.throttled,
+        'rate_limited_tickers': provider.throttled_tickers,
+        'outage_failures': provider.outage_failures,
+        'poisoned_requests': provider.poisoned,
+        'bisections': int(metrics.get('bisections')),
+        'quarantined': quarantined,
+        'batches': len(sizes),
+        'batch_size_range': [min(sizes), max(sizes)] if sizes else None,
+        'rows_written': int(metrics.get('rows_written')),
+        'bytes_written': int(metrics.get('bytes_written')),
+        'stage_seconds': {stage: histogram['sum'] for stage, histogram in snapshot['stage_seconds'].items()},
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+def save_run(path: str, run: dict) -> int:
+    """Append a run to the JSON results file; returns the number of runs stored in it."""
+    runs: List[dict] = []
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            runs = json.load(f)
+    runs.append(run)
+    temp_path = f'{path}.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(runs, f, indent=2)
+    os.replace(temp_path, path)
+    return len(runs)
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description='Benchmark the downloader against a simulated provider')
+    parser.add_argument('--label', default='',
+                        help='Name stored with the run to tell strategies apart')
+    parser.add_argument('--output', default='download_benchmark.json',
+                        help='JSON file the run is appended to')
+    parser.add_argument('--tickers', type=int, default=300,
+                        help='Synthetic tickers to download')
+    parser.add_argument('--history-days', type=int, default=2500,
+                        help='Bars per ticker in each response (payload size)')
+    parser.add_argument('--end-date', default='2024-12-31',
+                        help='Last date of the synthetic histories (fixed so runs are comparable)')
+    parser.add_argument('--latency', type=float, default=0.2,
+                        help='Mean seconds per provider request')
+    parser.add_argument('--jitter', type=float, default=0.05,
+                        help='Uniform +/- seconds added to the latency')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='Probability that a request is answered with a 429')
+    parser.add_argument('--ticker-error-rate', type=float, default=0.0,
+                        help='Probability that a symbol of a served request comes back throttled')
+    parser.add_argument('--poison', type=int, default=0,
+                        help='Tickers (picked with --seed) that make every request containing them fail')
+    parser.add_argument('--outage', type=parse_outage, action='append', default=[], metavar='START:END',
+                        help='Seconds after the start during which every request times out (repeatable)')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed for latency and error draws')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Concurrent batch workers (1 = sequential batches with fixed pauses)')
+    parser.add_argument('--rate', type=float, default=0.5,
+                        help='Provider requests per second allowed across workers (concurrent mode)')
+    parser.add_argument('--burst', type=int, default=4,
+                        help='Requests that may be sent back to back before the rate applies (concurrent mode)')
+    parser.add_argument('--batch-size', type=int, default=100,
+                        help='Starting tickers per bulk request (adapted per batch)')
+    parser.add_argument('--min-batch-size', type=int, default=5,
+                        help='Smallest batch the controller shrinks to after throttling')
+    parser.add_argument('--max-batch-size', type=int, default=250,
+                        help='Largest batch the controller grows to while requests stay healthy')
+    parser.add_argument('--batch-pause', type=float, default=30,
+                        help='Seconds between sequential batches')
+    parser.add_argument('--max-retry-wait', type=float, default=300,
+                        help='Longest the run waits for parked tickers before deferring them')
+    parser.add_argument('--rate-limit-pause', type=float, default=300,
+                        help='Seconds a throttled ticker waits before it is retried')
+    parser.add_argument('--format', choices=FORMATS, default='json',
+                        help='Storage format for the downloaded files')
+    parser.add_argument('--compression', choices=COMPRESSIONS,
+                        help='Compress json data files')
+    parser.add_argument('--compression-level', type=int,
+                        help='Compression level (default: zstd 3, gzip 6)')
+    parser.add_argument('--verbose', action='store_true',
+                        help='Show the downloader console output')
+    return parser.parse_args()
+
+def main():
+    console = Console()
+    args = parse_args()
+    config = {key: value for key, value in vars(args).items() if key not in ('output', 'verbose', 'label')}
+    console.print(f"[bold blue]Benchmarking {args.tickers} tickers, {args.workers} worker(s), "
+                  f"latency {args.latency}s, 429 rate {args.error_rate:.0%}, {len(args.outage)} outage window(s)[/bold blue]")
+    results = run_benchmark(args)
+    run = {
+        'label': args.label,
+        'commit': git_commit(),
+        'timestamp': pd.Timestamp.now().isoformat(timespec='seconds'),
+        'config': config,
+        'results': results,
+    }
+    count = save_run(args.output, run)
+
+    console.print(f"[bold green]{results['succeeded']}/{results['tickers']} tickers in {results['elapsed_seconds']:.1f}s "
+                  f"({results['tickers_per_minute']:.1f} tickers/min)[/bold green]")
+    console.print(f"[blue]Sleep: {results['sleep_seconds']:.1f}s ({results['throttled_seconds']:.1f}s pacing, "
+                  f"{results['paused_seconds']:.1f}s pauses) | Retries: {results['retries']} | "
+                  f"Requests: {results['requests']} ({results['rate_limited_requests']} rate limited, "
+                  f"{results['rate_limited_tickers']} throttled symbols, "
+                  f"{results['outage_failures']} during outages)[/blue]")
+    console.print(f"[blue]Bisections: {results['bisections']} | Quarantined: {results['quarantined']} "
+                  f"({results['poisoned_requests']} poisoned requests)[/blue]")
+    peak = results['peak_rss_mb']
+    console.print(f"[blue]Peak RSS: {f'{peak:.1f} MiB' if peak is not None else 'n/a'} | "
+                  f"Results appended to {args.output} (run {count})[/blue]")
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,11 @@
-import yfinance as yf
 import pandas as pd
+import argparse
 import os
+import sys
 import threading
-from typing import List, Optional, Set, Dict
+from typing import Callable, Iterable, List, Optional, Set, Dict, Tuple
+from collections import deque
+from contextlib import contextmanager
 from dataclasses import dataclass
 from rich.console import Console
 from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TaskProgressColumn
@@ -16,6 +19,19 @@ import numpy as np
 import random
 import time
 import json
+import hashlib
+import heapq
+import sqlite3
+import concurrent.futures
+
+# Market data providers and storage formats live next to this script
+script_dir = Path(__file__).parent
+sys.path.insert(0, str(script_dir))
+from providers import (MarketDataProvider, YFinanceProvider, PROVIDERS, create_provider, is_rate_limit_message,
+                       response_errors)
+from storage import (COMPRESSIONS, FORMATS, actions_path, append_price_data, compress_payload, decode_price_data,
+                     extract_actions, find_data_file, list_tickers, merge_actions, read_price_data, remove_actions,
+                     serialize_price_data, store_payload)
 
 # Suppress specific warnings
 warnings.filterwarnings('ignore', category=UserWarning, module='rich.live')
@@ -28,14 +44,508 @@ class DownloadResult:
     error: Optional[str] = None
     attempts: int = 0
 
+class TokenBucket:
+    """
+    Thread-safe token bucket shared by concurrent batch workers.
+    
+    Tokens refill at `rate` per second up to `capacity` (the burst). The refill rate
+    is halved whenever the provider throttles us and recovers additively on success,
+    never leaving [min_rate, max_rate].
+    """
+
+    def __init__(self, rate: float, capacity: float, min_rate: Optional[float] = None):
+        self.rate = rate
+        self.max_rate = rate
+        self.min_rate = min_rate if min_rate is not None else rate / 32
+        self.capacity = capacity
+        self.tokens = capacity
+        self.last_refill = time.monotonic()
+        self.throttle_events = 0
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Block until `tokens` are available; returns the seconds spent waiting."""
+        waited = 0.0
+        while True:
+            with self.lock:
+                self._refill(time.monotonic())
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return waited
+                wait = (tokens - self.tokens) / self.rate
+            sleep(wait)
+            waited += wait
+
+    def on_throttled(self):
+        """Multiplicative decrease after a 429: halve the refill rate and drop the burst."""
+        with self.lock:
+            self._refill(time.monotonic())
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = 0.0
+            self.throttle_events += 1
+
+    def on_success(self):
+        """Additive increase back towards the configured rate."""
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+class LatencyHistogram:
+    """Cumulative-bucket latency histogram in seconds (Prometheus layout)."""
+    BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS) + 1)  # Last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        index = next((i for i, bound in enumerate(self.BUCKETS) if seconds <= bound), len(self.BUCKETS))
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        total = 0
+        buckets = []
+        for bound, count in zip(list(self.BUCKETS) + ['+Inf'], self.counts):
+            total += count
+            buckets.append((str(bound), total))
+        return buckets
+
+    def to_dict(self) -> dict:
+        return {'count': self.count, 'sum': round(self.sum, 6), 'max': round(self.max, 6),
+                'avg': round(self.sum / self.count, 6) if self.count else 0.0,
+                'buckets': dict(self.cumulative())}
+
+class DownloadMetrics:
+    """
+    Counters and latency histograms for a download run.
+    
+    Stages are timed with `with metrics.time('fetch'):`; batches, throttling and
+    retries are recorded by the downloader. write() exports everything as JSON or,
+    for a path ending in .prom, as a Prometheus textfile; maybe_write() does so at
+    most every `interval` seconds while the run is going.
+    """
+    STAGES = ('fetch', 'extract', 'sma', 'serialize', 'write')
+
+    def __init__(self, path: Optional[str] = None, interval: float = 30.0):
+        self.path = path
+        self.interval = interval
+        self.started = time.time()
+        self.last_write = self.started
+        self.counters: Dict[str, float] = {}
+        self.stages: Dict[str, LatencyHistogram] = {stage: LatencyHistogram() for stage in self.STAGES}
+        self.batches = LatencyHistogram()
+        self.lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def get(self, name: str) -> float:
+        with self.lock:
+            return self.counters.get(name, 0)
+
+    def observe(self, stage: str, seconds: float):
+        with self.lock:
+            self.stages[stage].observe(seconds)
+
+    def observe_batch(self, seconds: float):
+        with self.lock:
+            self.batches.observe(seconds)
+
+    @contextmanager
+    def time(self, stage: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started)
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            elapsed = time.time() - self.started
+            counters = {name: round(value, 6) for name, value in sorted(self.counters.items())}
+            stages = {stage: histogram.to_dict() for stage, histogram in self.stages.items()}
+            batches = self.batches.to_dict()
+        return {
+            'timestamp': time.time(),
+            'elapsed_seconds': round(elapsed, 3),
+            'tickers_per_minute': round(counters.get('tickers_succeeded', 0) / elapsed * 60, 2) if elapsed > 0 else 0.0,
+            'rows_per_second': round(counters.get('rows_written', 0) / elapsed, 2) if elapsed > 0 else 0.0,
+            'counters': counters,
+            'batch_seconds': batches,
+            'stage_seconds': stages,
+        }
+
+    def to_prometheus(self, snapshot: dict) -> str:
+        lines = [
+            '# TYPE downloader_elapsed_seconds gauge',
+            f"downloader_elapsed_seconds {snapshot['elapsed_seconds']}",
+        ]
+        for name, value in snapshot['counters'].items():
+            lines.append(f'# TYPE downloader_{name}_total counter')
+            lines.append(f'downloader_{name}_total {value}')
+        lines.append('# TYPE downloader_batch_seconds histogram')
+        lines.extend(self.histogram_lines('downloader_batch_seconds', '', snapshot['batch_seconds']))
+        lines.append('# TYPE downloader_stage_seconds histogram')
+        for stage, histogram in snapshot['stage_seconds'].items():
+            lines.extend(self.histogram_lines('downloader_stage_seconds', f'stage="{stage}",', histogram))
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def histogram_lines(name: str, labels: str, histogram: dict) -> List[str]:
+        lines = [f'{name}_bucket{{{labels}le="{bound}"}} {count}' for bound, count in histogram['buckets'].items()]
+        label_set = f'{{{labels.rstrip(",")}}}' if labels else ''
+        lines.append(f"{name}_sum{label_set} {histogram['sum']}")
+        lines.append(f"{name}_count{label_set} {histogram['count']}")
+        return lines
+
+    def write(self, path: Optional[str] = None):
+        """Export the current snapshot (atomically) to path or the configured metrics file."""
+        path = path or self.path
+        if not path:
+            return
+        snapshot = self.snapshot()
+        payload = self.to_prometheus(snapshot) if path.endswith('.prom') else json.dumps(snapshot, indent=2)
+        temp_path = f'{path}.tmp'
+        with open(temp_path, 'w') as f:
+            f.write(payload)
+        os.replace(temp_path, path)
+        self.last_write = time.time()
+
+    def maybe_write(self):
+        if self.path and time.time() - self.last_write >= self.interval:
+            self.write()
+
+class DownloadManifest:
+    """
+    SQLite record of every ticker the downloader has seen, kept next to the data files.
+    
+    Per ticker it stores the stored file, last bar date, row count and checksum of the
+    last successful download, plus the consecutive failure count, failure class and
+    the earliest time the ticker may be retried. Symbols that keep returning no data
+    are retired so a run (and every later run) stops asking for them.
+    """
+    FILENAME = '.download_manifest.db'
+    MAX_FAILURES = 5  # Consecutive no-data/error failures before a symbol is retired
+    RETIRED_RETRY = 30 * 86400  # Retired symbols are checked again after 30 days
+    RETIRED_CLASSES = ('unsupported', 'dead')
+    # Failures caused by the provider rather than the symbol; they delay but never retire a ticker
+    TRANSIENT_CLASSES = ('rate_limited', 'timeout', 'fetch_error')
+
+    def __init__(self, output_dir: str, rate_limit_pause: float = 300):
+        self.path = os.path.join(output_dir, self.FILENAME)
+        self.rate_limit_pause = rate_limit_pause
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS tickers (
+                ticker TEXT PRIMARY KEY,
+                path TEXT,
+                last_date TEXT,
+                rows INTEGER,
+                checksum TEXT,
+                failures INTEGER NOT NULL DEFAULT 0,
+                failure_class TEXT,
+                last_error TEXT,
+                next_retry REAL,
+                updated REAL
+            )''')
+        self.conn.commit()
+
+    @staticmethod
+    def classify_failure(error: str) -> str:
+        """Map a download error to a failure class."""
+        if is_rate_limit_message(error):
+            return 'rate_limited'
+        error = (error or '').lower()
+        if 'timed out' in error or 'timeout' in error:
+            return 'timeout'
+        if 'empty response' in error:
+            # yfinance answers throttled or failed bulk requests with an empty frame
+            return 'fetch_error'
+        if 'no data' in error or 'insufficient data' in error or 'missing columns' in error:
+            return 'no_data'
+        return 'error'
+
+    def retry_delay(self, failure_class: str, failures: int) -> float:
+        """Seconds to wait before the next attempt after `failures` consecutive failures."""
+        if failure_class == 'rate_limited':
+            return self.rate_limit_pause
+        if failure_class in self.TRANSIENT_CLASSES:
+            return 60
+        if failure_class == 'no_data':
+            # First miss is retried right away (bulk responses drop symbols transiently), then 10m, 40m, ...
+            return 0 if failures <= 1 else 600 * 4 ** (failures - 2)
+        return min(3600, 30 * 2 ** (failures - 1))
+
+    @staticmethod
+    def file_checksum(path) -> str:
+        with open(path, 'rb') as f:
+            return hashlib.sha1(f.read()).hexdigest()
+
+    def is_empty(self) -> bool:
+        with self.lock:
+            return self.conn.execute('SELECT COUNT(*) FROM tickers').fetchone()[0] == 0
+
+    def load(self):
+        """
+        Returns:
+            Tuple of (stored tickers, {ticker: failures}, {ticker: next retry time}, retired tickers)
+        """
+        stored, failures, next_retry, retired = set(), {}, {}, set()
+        with self.lock:
+            rows = self.conn.execute('SELECT ticker, path, failures, failure_class, next_retry FROM tickers').fetchall()
+        now = time.time()
+        for ticker, path, count, failure_class, retry_at in rows:
+            if path:
+                stored.add(ticker)
+            if count:
+                failures[ticker] = count
+            if retry_at and retry_at > now:
+                next_retry[ticker] = retry_at
+            if failure_class in self.RETIRED_CLASSES and (retry_at is None or retry_at > now):
+                retired.add(ticker)
+        return stored, failures, next_retry, retired
+
+    def last_dates(self) -> Dict[str, pd.Timestamp]:
+        """Last stored bar date per ticker (only tickers downloaded since the manifest existed)."""
+        with self.lock:
+            rows = self.conn.execute('SELECT ticker, last_date FROM tickers WHERE last_date IS NOT NULL').fetchall()
+        return {ticker: pd.Timestamp(last_date) for ticker, last_date in rows}
+
+    def import_directory(self, tickers: List[str], paths: Dict[str, str]):
+        """
+        Seed the manifest from files already on disk (first run, or --rescan).
+        
+        Tickers the manifest holds a file for that is no longer on disk lose their
+        stored state, so the run downloads them again.
+        """
+        now = time.time()
+        on_disk = set(tickers)
+        with self.lock:
+            stored = [row[0] for row in self.conn.execute('SELECT ticker FROM tickers WHERE path IS NOT NULL')]
+            self.conn.executemany(
+                '''UPDATE tickers SET path = NULL, last_date = NULL, rows = NULL, checksum = NULL, updated = ?
+                   WHERE ticker = ?''',
+                [(now, ticker) for ticker in stored if ticker not in on_disk])
+            self.conn.executemany(
+                '''INSERT INTO tickers (ticker, path, updated) VALUES (?, ?, ?)
+                   ON CONFLICT(ticker) DO UPDATE SET path = excluded.path, updated = excluded.updated''',
+                [(ticker, paths[ticker], now) for ticker in tickers])
+            self.conn.commit()
+
+    def record_success(self, ticker: str, path: Optional[str] = None, last_date: Optional[pd.Timestamp] = None,
+                       rows: Optional[int] = None):
+        """Clear failure state; path/last_date/rows are only updated when a file was written."""
+        checksum = self.file_checksum(path) if path else None
+        last_date = last_date.strftime('%Y-%m-%d') if last_date is not None else None
+        with self.lock:
+            self.conn.execute(
+                '''INSERT INTO tickers (ticker, path, last_date, rows, checksum, failures, updated)
+                   VALUES (?, ?, ?, ?, ?, 0, ?)
+                   ON CONFLICT(ticker) DO UPDATE SET
+                       path = COALESCE(excluded.path, path),
+                       last_date = COALESCE(excluded.last_date, last_date),
+                       rows = COALESCE(excluded.rows, rows),
+                       checksum = COALESCE(excluded.checksum, checksum),
+                       failures = 0, failure_class = NULL, last_error = NULL, next_retry = NULL,
+                       updated = excluded.updated''',
+                (ticker, str(path) if path else None, last_date, rows, checksum, time.time()))
+
+    def record_failure(self, ticker: str, error: str, failure_class: Optional[str] = None):
+        """
+        Count a failure and schedule the next attempt.
+        
+        Rate limiting, timeouts and whole-batch fetch errors say nothing about the
+        symbol itself, so they delay the ticker without counting towards retirement.
+        
+        Returns:
+            Tuple of (failure class, next retry time or None if retired for good)
+        """
+        failure_class = failure_class or self.classify_failure(error)
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute('SELECT failures FROM tickers WHERE ticker = ?', (ticker,)).fetchone()
+            failures = row[0] if row else 0
+            if failure_class not in self.TRANSIENT_CLASSES:
+                failures += 1
+            if failure_class == 'unsupported':
+                next_retry = None
+            elif failure_class not in self.TRANSIENT_CLASSES and failures >= self.MAX_FAILURES:
+                failure_class = 'dead'
+                next_retry = now + self.RETIRED_RETRY
+            else:
+                next_retry = now + self.retry_delay(failure_class, failures)
+            self.conn.execute(
+                '''INSERT INTO tickers (ticker, failures, failure_class, last_error, next_retry, updated)
+                   VALUES (?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(ticker) DO UPDATE SET
+                       failures = excluded.failures, failure_class = excluded.failure_class,
+                       last_error = excluded.last_error, next_retry = excluded.next_retry,
+                       updated = excluded.updated''',
+                (ticker, failures, failure_class, (error or '')[:200], next_retry, now))
+        return failure_class, next_retry
+
+    def summary(self) -> Dict[str, int]:
+        """Number of tickers per failure class (None for healthy tickers)."""
+        with self.lock:
+            return dict(self.conn.execute('SELECT failure_class, COUNT(*) FROM tickers GROUP BY failure_class').fetchall())
+
+    def commit(self):
+        with self.lock:
+            self.conn.commit()
+
+    def close(self):
+        with self.lock:
+            self.conn.commit()
+            self.conn.close()
+
+class RetryScheduler:
+    """
+    Time-ordered delay queue of tickers waiting for their next attempt.
+    
+    Failed tickers are parked until their retry time while everything else keeps
+    flowing; the download loop pops them back into its work queue once they are due.
+    Re-parking a ticker supersedes its earlier entry (stale heap entries are skipped).
+    """
+
+    def __init__(self, ready_at: Optional[Dict[str, float]] = None):
+        self.ready_at: Dict[str, float] = {}
+        self.heap = []
+        self.lock = threading.Lock()
+        for ticker, when in (ready_at or {}).items():
+            self.park(ticker, when)
+
+    def park(self, ticker: str, when: float):
+        with self.lock:
+            self.ready_at[ticker] = when
+            heapq.heappush(self.heap, (when, ticker))
+
+    def is_parked(self, ticker: str, now: Optional[float] = None) -> bool:
+        when = self.ready_at.get(ticker)
+        return when is not None and when > (time.time() if now is None else now)
+
+    def pop_ready(self, now: Optional[float] = None) -> List[str]:
+        """Remove and return every ticker whose retry time has passed, earliest first."""
+        now = time.time() if now is None else now
+        ready = []
+        with self.lock:
+            while self.heap and self.heap[0][0] <= now:
+                when, ticker = heapq.heappop(self.heap)
+                if self.ready_at.get(ticker) == when:
+                    del self.ready_at[ticker]
+                    ready.append(ticker)
+        return ready
+
+    def next_ready(self, among: Optional[Iterable[str]] = None) -> Optional[float]:
+        """Earliest retry time (optionally only among the given tickers), or None if nothing is parked."""
+        with self.lock:
+            if among is None:
+                return min(self.ready_at.values(), default=None)
+            return min((self.ready_at[t] for t in among if t in self.ready_at), default=None)
+
+    def __len__(self) -> int:
+        return len(self.ready_at)
+
+class BatchSizeController:
+    """
+    AIMD batch sizing for bulk requests.
+    
+    The size grows by `increase` tickers after every healthy batch (no throttling or
+    timeout, latency under `max_latency`, failure rate under `max_error_rate`) and is
+    multiplied by `decrease` after a 429 or timeout. Unhealthy but unthrottled
+    batches keep the current size.
+    """
+
+    def __init__(self, initial: int = 100, min_size: int = 5, max_size: int = 250, increase: int = 10,
+                 decrease: float = 0.5, max_latency: float = 60.0, max_error_rate: float = 0.2):
+        self.min_size = min_size
+        self.max_size = max(max_size, min_size)
+        self.size = min(max(initial, min_size), self.max_size)
+        self.increase = increase
+        self.decrease = decrease
+        self.max_latency = max_latency
+        self.max_error_rate = max_error_rate
+        self.history: List[dict] = []
+        self.lock = threading.Lock()
+
+    def next_size(self) -> int:
+        with self.lock:
+            return self.size
+
+    def record(self, size: int, seconds: float, results: List[DownloadResult]) -> dict:
+        """
+        Feed back one finished batch and adjust the size.
+        
+        Returns:
+            Report for the batch: size, seconds, successes, tickers/min, problem and the next size
+        """
+        classes = {DownloadManifest.classify_failure(r.error) for r in results if not r.success}
+        problem = next((c for c in DownloadManifest.TRANSIENT_CLASSES if c in classes), None)
+        succeeded = sum(1 for r in results if r.success)
+        error_rate = (len(results) - succeeded) / len(results) if results else 0.0
+        with self.lock:
+            if problem is not None:
+                self.size = max(self.min_size, int(self.size * self.decrease))
+            elif seconds <= self.max_latency and error_rate <= self.max_error_rate:
+                self.size = min(self.max_size, self.size + self.increase)
+            report = {
+                'batch': len(self.history) + 1,
+                'size': size,
+                'seconds': round(seconds, 3),
+                'succeeded': succeeded,
+                'tickers_per_min': round(succeeded / seconds * 60, 1) if seconds > 0 else 0.0,
+                'problem': problem or ('slow' if seconds > self.max_latency else
+                                       'errors' if error_rate > self.max_error_rate else None),
+                'next_size': self.size,
+            }
+            self.history.append(report)
+        return report
+
 class StockDataDownloader:
-    def __init__(self, output_dir: str = 'data'):
+    SMA_PERIODS = [10, 20, 50]
+    # Tickers cleaned together by the vectorized batch path (bounds its array memory)
+    VECTOR_CHUNK = 16
+
+    def __init__(self, output_dir: str = 'data', incremental: bool = False, workers: int = 1,
+                 requests_per_second: float = 0.5, burst: int = 4, provider: Optional[MarketDataProvider] = None,
+                 storage_format: str = 'json', rescan: bool = False, max_retry_wait: float = 300,
+                 batch_sizer: Optional[BatchSizeController] = None, metrics: Optional[DownloadMetrics] = None,
+                 adjusted: bool = False, on_stored: Optional[Callable[[str, Optional[pd.DataFrame]], None]] = None,
+                 compression: Optional[str] = None, compression_level: Optional[int] = None,
+                 rate_limit_pause: float = 300):
+        if compression and storage_format != 'json':
+            raise ValueError("Compression is only supported for the json storage format")
         self.output_dir = output_dir
+        self.storage_format = storage_format
+        # zstd/gzip codec for json files (None writes plain files)
+        self.compression = compression
+        self.compression_level = compression_level
+        # Raw prices plus a split/dividend table per ticker, adjusted when read; True keeps provider-adjusted prices
+        self.adjusted = adjusted
+        # Called with (ticker, stored frame or None) for every ticker that is up to date on disk
+        self.on_stored = on_stored
+        self.provider = provider if provider is not None else YFinanceProvider()
+        self.incremental = incremental
+        self.workers = max(1, workers)
         self.price_columns = ['Open', 'High', 'Low', 'Close']
         self.required_columns = self.price_columns + ['Volume']
         self.console = Console()
         self.existing_files: Set[str] = set()
+        self.up_to_date: Set[str] = set()  # Tickers that need no download in this run
         self.failed_tickers: Dict[str, int] = {}  # Track failed attempts per ticker
+        self.retired: Set[str] = set()  # Unsupported or dead symbols, skipped until their retry time
+        self.max_retry_wait = max_retry_wait  # Longest a run waits for back-off before deferring tickers
+        self.rate_limit_pause = rate_limit_pause  # Seconds a throttled ticker is parked before its retry
         
         # Ensure output directory exists and is writable
         try:
@@ -46,55 +556,116 @@ class StockDataDownloader:
                 f.write('')
             os.remove(test_file)
             
-            # Load existing files
-            self.existing_files = {f.replace('.json', '') for f in os.listdir(output_dir) if f.endswith('.json')}
+            # Known tickers and their retry state come from the manifest; the directory is only
+            # scanned to seed a new manifest (or when asked to rescan)
+            self.manifest = DownloadManifest(output_dir, rate_limit_pause)
+            if rescan or self.manifest.is_empty():
+                on_disk = list_tickers(output_dir)
+                self.manifest.import_directory(on_disk, {t: str(find_data_file(output_dir, t)) for t in on_disk})
+            self.existing_files, self.failed_tickers, retry_times, self.retired = self.manifest.load()
             self.console.print(f"[blue]Found {len(self.existing_files)} existing data files[/blue]")
+            # In incremental mode existing files are refreshed instead of skipped
+            if not incremental:
+                self.up_to_date = set(self.existing_files)
         except Exception as e:
             self.console.print(f"[red]Error: Cannot create or write to output directory '{output_dir}': {str(e)}[/red]")
             raise
         
-        # Configure session with optimized retry strategy
+        # One keep-alive connection pool for all provider traffic. Each in-flight yf.download fans out
+        # over up to 2 * CPU threads, so the per-host pool holds that many connections per download the
+        # provider can run at once: one per batch worker, or a single one when it serializes its calls.
+        # 429s are not retried here: the downloader's limiter and retry queue handle throttling.
         self.session = requests.Session()
         retry_strategy = Retry(
-            total=10,  # Increased for more retries
-            backoff_factor=2,
-            status_forcelist=[429, 500, 502, 503, 504]
+            total=3,
+            backoff_factor=1,
+            status_forcelist=[500, 502, 503, 504]
         )
-        adapter = HTTPAdapter(max_retries=retry_strategy, pool_connections=10, pool_maxsize=10)
+        concurrent_downloads = self.workers if self.provider.thread_safe else 1
+        self.pool_size = max(10, concurrent_downloads * 2 * (os.cpu_count() or 1))
+        adapter = HTTPAdapter(max_retries=retry_strategy, pool_connections=10, pool_maxsize=self.pool_size)
         self.session.mount("https://", adapter)
         self.session.mount("http://", adapter)
+        self.provider.use_session(self.session)
         
         # Rate limiting variables
         self.last_request_time = 0
         self.base_delay = 0.5
         self.consecutive_failures = 0
         self.max_consecutive_failures = 5
-        self.rate_limit_count = 0
-        self.max_rate_limit_count = 5
-        self.rate_limit_pause = 300  # 5 minutes pause when rate limited
+        self.batch_pause = 30  # Seconds between sequential batches
         self.lock = threading.Lock()
-        self.rate_limit_times = {}  # Track rate limit times per ticker
+        # Failed tickers wait here for their retry time instead of sleeping in the download loop
+        self.retry_queue = RetryScheduler(retry_times)
+        
+        # Concurrent mode: batch workers share a token bucket instead of smart_sleep and fixed pauses
+        self.state_lock = threading.RLock()
+        self.limiter = TokenBucket(requests_per_second, burst) if self.workers > 1 else None
+        self.metrics = metrics if metrics is not None else DownloadMetrics()
+        self.last_dates = self.manifest.last_dates() if incremental else {}
+        self.batch_sizer = batch_sizer
+
+    def connection_stats(self) -> Dict[str, int]:
+        """
+        Connection reuse in the shared session's pools.
+        
+        Returns:
+            Dict with pools, requests sent, connections opened and requests that reused a connection
+        """
+        pools = []
+        for adapter in {id(a): a for a in self.session.adapters.values()}.values():
+            manager = adapter.poolmanager
+            pools.extend(manager.pools[key] for key in manager.pools.keys())
+        requests_sent = sum(pool.num_requests for pool in pools)
+        connections = sum(pool.num_connections for pool in pools)
+        return {'pools': len(pools), 'requests': requests_sent, 'connections': connections,
+                'reused': max(0, requests_sent - connections)}
 
     def is_rate_limited(self, ticker: str) -> bool:
-        """Check if a ticker is currently rate limited."""
-        current_time = time.time()
-        if ticker in self.rate_limit_times:
-            if current_time < self.rate_limit_times[ticker]:
-                return True
-        return False
-
-    def mark_rate_limited(self, ticker: str):
-        """Mark a ticker as rate limited."""
-        self.rate_limit_times[ticker] = time.time() + self.rate_limit_pause
-
-    def wait_for_rate_limit(self):
-        """Pause execution when rate limit is hit using exponential backoff."""
-        wait_time = self.rate_limit_pause * (2 ** self.rate_limit_count) + random.uniform(0, 30)
-        self.console.print(f"[yellow]Rate limit hit, taking a {wait_time/60:.1f} minute break...[/yellow]")
-        sleep(wait_time)
-        self.rate_limit_count = 0
-        with self.lock:
-            self.last_request_time = time.time()
+        """Check if a ticker is parked until a later retry time."""
+        return self.retry_queue.is_parked(ticker)
+
+    def needs_download(self, ticker: str) -> bool:
+        """Whether ticker still has to be fetched in this run."""
+        return ticker not in self.up_to_date and ticker not in self.retired
+
+    def record_failure(self, ticker: str, error: str = '', failure_class: Optional[str] = None) -> int:
+        """Count a failed attempt for ticker, schedule its retry in the manifest and return its attempt count."""
+        failure_class, next_retry = self.manifest.record_failure(ticker, error, failure_class)
+        if next_retry is not None:
+            self.retry_queue.park(ticker, next_retry)
+        with self.state_lock:
+            if failure_class in DownloadManifest.RETIRED_CLASSES:
+                self.retired.add(ticker)
+            self.failed_tickers[ticker] = self.failed_tickers.get(ticker, 0) + 1
+            attempts = self.failed_tickers[ticker]
+        self.metrics.inc('tickers_failed')
+        self.metrics.inc(f'failures_{failure_class}')
+        return attempts
+
+    def throttle(self):
+        """Pace the next provider request (token bucket when concurrent, smart_sleep otherwise)."""
+        started = time.perf_counter()
+        if self.limiter is None:
+            self.smart_sleep()
+        else:
+            self.limiter.acquire()
+        self.metrics.inc('throttled_seconds', time.perf_counter() - started)
+
+    def on_rate_limited(self):
+        """Slow the pacing after the provider throttled a request or some of its tickers."""
+        if self.limiter is not None:
+            # The shared bucket slows every worker down instead of a fixed pause
+            self.limiter.on_throttled()
+        else:
+            # smart_sleep spaces the following requests further apart
+            with self.state_lock:
+                self.consecutive_failures += 1
+
+    def pause(self, seconds: float):
+        """Sleep in the work loop (between batches or until parked tickers are due), counted in sleep_seconds."""
+        sleep(seconds)
+        self.metrics.inc('sleep_seconds', seconds)
 
     def smart_sleep(self):
         """Pause to enforce a minimal interval between requests."""
@@ -132,121 +703,479 @@ class StockDataDownloader:
             self.console.print(f"[red]Error processing data: {str(e)}[/red]")
             raise
 
+    def extend_stock_data(self, stored: pd.DataFrame, new_rows: pd.DataFrame) -> pd.DataFrame:
+        """Add SMA columns to new bars using the stored tail, without recomputing the stored history."""
+        new_rows = new_rows.sort_index()
+        tail = stored['Close'].to_numpy(dtype='float32')[-(max(self.SMA_PERIODS) - 1):]
+        close_prices = np.concatenate([tail, new_rows['Close'].to_numpy(dtype='float32')])
+        for period in self.SMA_PERIODS:
+            if len(close_prices) >= period:
+                sma = np.convolve(close_prices, np.ones(period)/period, mode='valid')[-len(new_rows):]
+                values = np.full(len(new_rows), np.nan)
+                values[len(new_rows) - len(sma):] = sma
+                new_rows[f'{period}sma'] = values
+        return new_rows
+
+    def read_stored_series(self, ticker: str) -> Optional[pd.DataFrame]:
+        """Load a stored ticker file (any format) as a Date-indexed frame (None if missing or unreadable)."""
+        path = find_data_file(self.output_dir, ticker)
+        if path is None:
+            return None
+        try:
+            df = read_price_data(path)
+            return df.sort_index() if df is not None else None
+        except Exception as e:
+            self.console.print(f"[yellow]Could not read stored data for {ticker}: {str(e)}[/yellow]")
+            return None
+
+    def slice_ticker(self, data, ticker: str, first_ticker: str) -> Optional[pd.DataFrame]:
+        """Columns of one ticker in a bulk download (None for flat frames of another ticker)."""
+        if isinstance(data, dict):
+            return data.get(ticker)
+        if isinstance(data.columns, pd.MultiIndex):
+            try:
+                return data.xs(ticker, axis=1, level=1)
+            except:
+                try:
+                    return data[ticker]
+                except:
+                    raise Exception(f"No columns found for ticker {ticker}")
+        return data if ticker == first_ticker else None
+
+    def store_actions(self, ticker: str, data, first_ticker: str, full: bool):
+        """
+        Keep the ticker's split/dividend table in step with its price file.
+        
+        Unadjusted downloads merge the response's events into the table (a full download
+        starts a new one); adjusted downloads drop any table, since their prices already
+        include the adjustments.
+        """
+        if self.adjusted:
+            if full:
+                remove_actions(self.output_dir, ticker)
+            return
+        df = None if isinstance(data, pd.DataFrame) and data.empty else self.slice_ticker(data, ticker, first_ticker)
+        events = extract_actions(df.dropna(how='all') if df is not None else pd.DataFrame())
+        merge_actions(self.output_dir, ticker, events, replace=full)
+
+    def stored_mode_matches(self, ticker: str) -> bool:
+        """Whether the stored file holds prices of this run's kind (raw files have an actions table)."""
+        return actions_path(self.output_dir, ticker).exists() != self.adjusted
+
+    def prepare_price_frame(self, data, ticker: str, first_ticker: str, min_rows: int = 5):
+        """
+        Slice one ticker out of a bulk download and clean it.
+        
+        Returns:
+            Tuple of (frame, error); frame is None when the ticker has to be marked failed
+        """
+        df = self.slice_ticker(data, ticker, first_ticker)
+
+        if df is None or df.empty or len(df) < min_rows:
+            return None, "No data"
+
+        # Filter out rows with null values in Open
+        if 'Open' in df.columns:
+            df = df.dropna(subset=['Open'])
+            if len(df) < min_rows:  # Check if we still have enough data after filtering
+                return None, "Insufficient data after removing null Open values"
+
+        missing_cols = [col for col in self.required_columns if col not in df.columns]
+        if missing_cols:
+            return None, f"Missing columns: {missing_cols}"
+
+        df = df[self.required_columns].copy()
+        df = df.astype({col: 'float32' for col in self.price_columns})
+        df = df.assign(**{col: lambda x, col=col: x[col].round(5) for col in self.price_columns})
+        return df, None
+
+    def clean_batch_arrays(self, data, tickers: List[str], min_rows: int = 5) -> Optional[Dict]:
+        """
+        Clean a chunk of a bulk response at once instead of ticker by ticker.
+        
+        Each field is taken from the wide frame as one (dates, tickers) array. Rows without
+        an Open are compacted out per ticker with a stable argsort (so every ticker's bars
+        start at row 0 in date order) and prices are cast to float32 and rounded together.
+        
+        Volume stays float64 in the array; 'integer_volume' flags the tickers whose own
+        column came back as integers, so missing tickers (NaN columns after the reindex)
+        do not turn everyone's volume into floats.
+        
+        Returns:
+            Dict with one array per required column, the compaction 'order', row 'counts',
+            'integer_volume', 'dates', 'index_name' and per-ticker 'errors'; None for dict responses
+        """
+        if isinstance(data, dict):
+            return None
+        if not isinstance(data.columns, pd.MultiIndex):
+            # Single-ticker responses may come back with flat columns
+            data = pd.concat({tickers[0]: data}, axis=1)
+        # group_by='ticker' puts the symbol in level 0, the default column layout in level 1
+        level = 0 if data.columns.get_level_values(0).isin(tickers).any() else 1
+        present = set(data.columns.get_level_values(level))
+        fields = set(data.columns.get_level_values(1 - level))
+        missing_cols = [col for col in self.required_columns if col not in fields]
+        arrays = {'errors': {}}
+        for ticker in tickers:
+            if ticker not in present or len(data) < min_rows:
+                arrays['errors'][ticker] = "No data"
+            elif missing_cols:
+                arrays['errors'][ticker] = f"Missing columns: {missing_cols}"
+        if len(arrays['errors']) == len(tickers):
+            return arrays
+        
+        if not data.index.is_monotonic_increasing:
+            data = data.sort_index()
+        
+        def field(name):
+            keys = [(ticker, name) if level == 0 else (name, ticker) for ticker in tickers]
+            return data.reindex(columns=pd.MultiIndex.from_tuples(keys))
+        
+        # Move each ticker's rows with an Open to the top, keeping date order
+        valid = ~np.isnan(field('Open').to_numpy(dtype='float64'))
+        counts = valid.sum(axis=0)
+        order = np.argsort(~valid, axis=0, kind='stable')
+        for j, ticker in enumerate(tickers):
+            if ticker not in arrays['errors'] and counts[j] < min_rows:
+                arrays['errors'][ticker] = "Insufficient data after removing null Open values"
+        
+        for col in self.price_columns:
+            prices = np.take_along_axis(field(col).to_numpy(dtype='float64'), order, axis=0).astype('float32')
+            arrays[col] = np.round(prices, 5, out=prices)
+        volume = field('Volume')
+        integer_volume = np.array([pd.api.types.is_integer_dtype(dtype) for dtype in volume.dtypes])
+        arrays['Volume'] = np.take_along_axis(volume.to_numpy(dtype='float64'), order, axis=0)
+        
+        arrays.update(order=order, counts=counts, integer_volume=integer_volume, dates=data.index.values,
+                      index_name=data.index.name)
+        return arrays
+
+    def add_batch_smas(self, arrays: Optional[Dict]):
+        """Compute every SMA period for all tickers of clean_batch_arrays output (stored under 'smas')."""
+        if arrays is None or 'Close' not in arrays:
+            return
+        closes = arrays['Close'].astype('float64')
+        arrays['smas'] = {}
+        for period in self.SMA_PERIODS:
+            windows = len(closes) - period + 1
+            if windows <= 0:
+                continue
+            # Left-to-right weighted sum over all tickers, one pass per window offset
+            weight = 1.0 / period
+            sma = closes[:windows] * weight
+            for offset in range(1, period):
+                sma += closes[offset:offset + windows] * weight
+            arrays['smas'][period] = sma
+
+    def batch_frame(self, data, tickers: List[str], arrays: Optional[Dict], j: int, min_rows: int = 5):
+        """
+        Build the frame for tickers[j] from batch arrays; columns are slices of the arrays.
+        
+        Dict responses (arrays is None) fall back to prepare_price_frame + process_stock_data.
+        
+        Returns:
+            Tuple of (frame, error); frame is None when the ticker has to be marked failed
+        """
+        ticker = tickers[j]
+        if arrays is None:
+            df, error = self.prepare_price_frame(data, ticker, tickers[0], min_rows)
+            return (self.process_stock_data(df) if df is not None else None), error
+        if ticker in arrays['errors']:
+            return None, arrays['errors'][ticker]
+        
+        count = int(arrays['counts'][j])
+        frame = {col: arrays[col][:count, j] for col in self.required_columns}
+        if arrays['integer_volume'][j]:
+            frame['Volume'] = frame['Volume'].astype('int64')
+        for period, sma in arrays['smas'].items():
+            if count >= period:
+                column = np.full(count, np.nan)
+                column[period - 1:] = sma[:count - period + 1, j]
+                frame[f'{period}sma'] = column
+        index = pd.DatetimeIndex(arrays['dates'][arrays['order'][:count, j]], name=arrays['index_name'])
+        return pd.DataFrame(frame, index=index), None
+
+    def iter_batch_frames(self, data, tickers: List[str]):
+        """
+        Clean and add SMAs for a bulk response in chunks of VECTOR_CHUNK tickers.
+        
+        Chunks keep the vectorized arrays small, and frames are built as they are
+        consumed, so the writer never holds more than one chunk plus one frame.
+        
+        Yields:
+            (frame, error) in the order of tickers
+        """
+        for start in range(0, len(tickers), self.VECTOR_CHUNK):
+            chunk = tickers[start:start + self.VECTOR_CHUNK]
+            try:
+                with self.metrics.time('extract'):
+                    arrays = self.clean_batch_arrays(data, chunk)
+                with self.metrics.time('sma'):
+                    self.add_batch_smas(arrays)
+            except Exception as e:
+                error_msg = str(e)[:100]
+                for _ in chunk:
+                    yield None, error_msg
+                continue
+            for j in range(len(chunk)):
+                try:
+                    with self.metrics.time('extract'):
+                        result = self.batch_frame(data, chunk, arrays, j)
+                except Exception as e:
+                    result = None, str(e)[:100]
+                yield result
+
+    def fetch_batch(self, tickers: List[str], start: Optional[pd.Timestamp] = None):
+        """
+        Bulk download tickers (from start, or full history) in a single attempt.
+        
+        An empty response to a delta request (start given) means there are no newer
+        bars and is returned as-is; an empty full-history response for several tickers
+        is a transient fetch error rather than a miss for every symbol. Failures are
+        not retried here: the tickers are parked in the retry queue so other work keeps
+        flowing, throttling slows the shared pacing and the batch size controller
+        shrinks the next batch. A response in which the provider reported some tickers
+        as throttled (response_errors) slows the pacing the same way.
+        
+        Returns:
+            Tuple of (data or None if the batch failed, error message)
+        """
+        start_date = start.strftime('%Y-%m-%d') if start is not None else None
+        try:
+            self.throttle()
+            self.metrics.inc('requests')
+            with self.metrics.time('fetch'):
+                data = self.provider.download(tickers, start=start_date, adjusted=self.adjusted)
+            if isinstance(data, pd.DataFrame):
+                self.metrics.inc('response_bytes', int(data.memory_usage(index=True).sum()))
+            throttled = sum(1 for error in response_errors(data).values() if is_rate_limit_message(error))
+            if throttled:
+                self.metrics.inc('throttled_tickers', throttled)
+                self.on_rate_limited()
+            elif self.limiter is not None:
+                self.limiter.on_success()
+            else:
+                with self.state_lock:
+                    self.consecutive_failures = 0
+            if start is not None and isinstance(data, pd.DataFrame):
+                return data, None
+            if data is None or (isinstance(data, pd.DataFrame) and data.empty):
+                if len(tickers) > 1:
+                    # Says nothing about the symbols; only ones missing from a non-empty response count as no data
+                    raise Exception(f"Empty response from {self.provider.name} for {len(tickers)} tickers")
+                raise Exception(f"No data received from {self.provider.name}")
+            return data, None
+        except Exception as e:
+            failure_class = DownloadManifest.classify_failure(str(e))
+            self.metrics.inc('request_errors')
+            if failure_class == 'rate_limited':
+                self.on_rate_limited()
+            else:
+                self.console.print(f"[yellow]Download of {len(tickers)} tickers failed: {str(e)}[/yellow]")
+            return None, str(e)
+
     def process_bulk_batch(self, tickers_batch: List[str]) -> List[DownloadResult]:
-        """Download and process a batch of tickers in bulk."""
+        """Download and process a batch of tickers in bulk (only newer bars for stored tickers in incremental mode)."""
         results = []
-        # Filter out existing files and rate limited tickers
+        tickers_batch = [ticker.strip().upper() for ticker in tickers_batch]
+        # Warrants, units and rights are never downloaded; retire them so the run does not wait on them
+        for ticker in tickers_batch:
+            if any(ticker.endswith(suffix) for suffix in ['-WT', '-UN', 'U', 'W', 'R']) and ticker not in self.retired:
+                self.record_failure(ticker, "Unsupported symbol type", 'unsupported')
+        # Filter out up-to-date, retired and rate limited tickers
         valid_tickers = [
-            ticker.strip().upper() for ticker in tickers_batch 
-            if not any(ticker.strip().upper().endswith(suffix) for suffix in ['-WT', '-UN', 'U', 'W', 'R'])
-            and ticker.strip().upper() not in self.existing_files
-            and not self.is_rate_limited(ticker.strip().upper())
+            ticker for ticker in tickers_batch
+            if ticker not in self.retired
+            and ticker not in self.up_to_date
+            and not self.is_rate_limited(ticker)
         ]
         
         if not valid_tickers:
+            self.manifest.commit()
             return results
         
-        max_retries = 10
-        data = None
+        # Group tickers by the first date they need; None means full history
+        stored: Dict[str, pd.DataFrame] = {}
+        groups: Dict[Optional[pd.Timestamp], List[str]] = {}
+        today = pd.Timestamp.today().normalize()
+        for ticker in valid_tickers:
+            start = None
+            # Files stored adjusted (or raw) are fully replaced when this run keeps the other kind
+            if self.incremental and ticker in self.existing_files and self.stored_mode_matches(ticker):
+                last_date = self.last_dates.get(ticker)
+                if last_date is not None and last_date + pd.Timedelta(days=1) > today:
+                    # The manifest already shows bars through today; skip reading the file
+                    groups.setdefault(last_date + pd.Timedelta(days=1), []).append(ticker)
+                    continue
+                series = self.read_stored_series(ticker)
+                if series is not None:
+                    stored[ticker] = series
+                    start = series.index[-1] + pd.Timedelta(days=1)
+            groups.setdefault(start, []).append(ticker)
         
-        # Get data from earliest possible date by not specifying start_date
-        for attempt in range(max_retries):
-            try:
-                self.smart_sleep()
-                data = yf.download(' '.join(valid_tickers), timeout=30, group_by='ticker', auto_adjust=True)
-                if data is None or (isinstance(data, pd.DataFrame) and data.empty):
-                    raise Exception("No data received from yfinance")
-                break
-            except Exception as e:
-                error_str = str(e).lower()
-                if "too many requests" in error_str:
-                    self.rate_limit_count += 1
-                    if self.rate_limit_count >= self.max_rate_limit_count:
-                        self.wait_for_rate_limit()
-                    # Mark all tickers in batch as rate limited
-                    for ticker in valid_tickers:
-                        self.mark_rate_limited(ticker)
-                        self.failed_tickers[ticker] = self.failed_tickers.get(ticker, 0) + 1
-                    sleep(60 * (attempt + 1))
+        for start, group in groups.items():
+            if start is not None and start > today:
+                # Already stored through today; nothing to request
+                for ticker in group:
+                    results.append(DownloadResult(ticker, True, records=0, attempts=self.mark_downloaded(ticker)))
+                continue
+            
+            for piece, data, fetch_error in self.fetch_bisected(group, start):
+                if data is None:
+                    error = f"Bulk download failed: {fetch_error}"
+                    failure_class = DownloadManifest.classify_failure(error)
+                    if failure_class == 'error':
+                        # Errors a symbol still hits on its own quarantine it; batch-wide ones are the provider's problem
+                        failure_class = 'quarantined' if len(piece) == 1 else 'fetch_error'
+                    if failure_class == 'quarantined':
+                        self.console.print(f"[yellow]Quarantined {piece[0]}: {fetch_error}[/yellow]")
+                    for ticker in piece:
+                        results.append(DownloadResult(ticker, False, error=error,
+                                                      attempts=self.record_failure(ticker, error, failure_class)))
                     continue
-                else:
-                    self.console.print(f"[yellow]Download attempt {attempt + 1} failed: {str(e)}[/yellow]")
-                    sleep(30)
-        else:
-            for ticker in valid_tickers:
-                self.failed_tickers[ticker] = self.failed_tickers.get(ticker, 0) + 1
-                results.append(DownloadResult(ticker, False, error="Bulk download failed after retries", attempts=self.failed_tickers[ticker]))
-            return results
+                results.extend(self.store_batch_data(piece, data, stored))
+        
+        self.manifest.commit()
+        return results
 
-        # Process data for each valid ticker
-        for ticker in valid_tickers:
+    def fetch_bisected(self, tickers: List[str], start: Optional[pd.Timestamp] = None) -> List[Tuple[List[str], object, Optional[str]]]:
+        """
+        Fetch a batch, bisecting it when the request fails because of its contents.
+        
+        A failing batch is split in halves that are retried right away, narrowing down
+        until the offending symbols fail on their own, so the good symbols of the batch
+        still land on this first retry. Throttling, timeouts and empty responses apply
+        to the whole request and are not bisected.
+        
+        Returns:
+            List of (tickers, data or None, error) pieces covering the batch
+        """
+        data, error = self.fetch_batch(tickers, start)
+        if data is not None or len(tickers) == 1:
+            return [(tickers, data, error)]
+        if DownloadManifest.classify_failure(error) != 'error':
+            return [(tickers, None, error)]
+        middle = len(tickers) // 2
+        self.console.print(f"[yellow]Bisecting failed batch of {len(tickers)} tickers[/yellow]")
+        self.metrics.inc('bisections')
+        return self.fetch_bisected(tickers[:middle], start) + self.fetch_bisected(tickers[middle:], start)
+
+    def store_batch_data(self, group: List[str], data, stored: Dict[str, pd.DataFrame]) -> List[DownloadResult]:
+        """
+        Extract, clean and write every ticker of a successful bulk response.
+        
+        Tickers the provider reported an error for fail with that error (throttled ones
+        as rate_limited). While any ticker of the response was throttled, tickers that
+        come back without data are counted as rate limited too: the provider may have
+        throttled them without saying so, and a no_data miss would move them towards
+        retirement.
+        """
+        results = []
+        errors = response_errors(data)
+        throttled = any(is_rate_limit_message(error) for error in errors.values())
+        new_tickers = [ticker for ticker in group if ticker not in stored and ticker not in errors]
+        frames = self.iter_batch_frames(data, new_tickers)
+        for ticker in group:
             try:
-                if isinstance(data, dict):
-                    df = data.get(ticker)
-                else:
-                    if isinstance(data.columns, pd.MultiIndex):
-                        try:
-                            df = data.xs(ticker, axis=1, level=1)
-                        except:
-                            try:
-                                df = data[ticker]
-                            except:
-                                raise Exception(f"No columns found for ticker {ticker}")
-                    else:
-                        df = data if ticker == valid_tickers[0] else None
-
-                if df is None or df.empty or len(df) < 5:
-                    self.failed_tickers[ticker] = self.failed_tickers.get(ticker, 0) + 1
-                    results.append(DownloadResult(ticker, False, error="No data", attempts=self.failed_tickers[ticker]))
+                if ticker in errors:
+                    error = errors[ticker][:100]
+                    results.append(DownloadResult(ticker, False, error=error, attempts=self.record_failure(ticker, error)))
                     continue
-
-                # Filter out rows with null values in Open
-                if 'Open' in df.columns:
-                    df = df.dropna(subset=['Open'])
-                    if len(df) < 5:  # Check if we still have enough data after filtering
-                        self.failed_tickers[ticker] = self.failed_tickers.get(ticker, 0) + 1
-                        results.append(DownloadResult(ticker, False, error="Insufficient data after removing null Open values", attempts=self.failed_tickers[ticker]))
-                        continue
-
-                missing_cols = [col for col in self.required_columns if col not in df.columns]
-                if missing_cols:
-                    self.failed_tickers[ticker] = self.failed_tickers.get(ticker, 0) + 1
-                    results.append(DownloadResult(ticker, False, error=f"Missing columns: {missing_cols}", attempts=self.failed_tickers[ticker]))
+                if ticker in stored:
+                    results.append(self.update_ticker(ticker, data, group[0], stored[ticker]))
                     continue
-
-                df = df[self.required_columns].copy()
-                df = df.astype({col: 'float32' for col in self.price_columns})
-                df = df.assign(**{col: lambda x, col=col: x[col].round(5) for col in self.price_columns})
-                df = self.process_stock_data(df)
                 
-                records = df.reset_index().to_dict('records')
-                output_path = os.path.join(self.output_dir, f'{ticker}.json')
+                df, error = next(frames)
+                if df is None:
+                    failure_class = None
+                    if throttled and DownloadManifest.classify_failure(error) == 'no_data':
+                        failure_class = 'rate_limited'
+                    results.append(DownloadResult(ticker, False, error=error,
+                                                  attempts=self.record_failure(ticker, error, failure_class)))
+                    continue
                 
-                with open(output_path, 'w') as f:
-                    pd.DataFrame(records).to_json(f, orient='records', date_format='iso')
+                with self.metrics.time('serialize'):
+                    serialized = serialize_price_data(df, self.storage_format)
+                    payload = compress_payload(serialized, self.compression, self.compression_level)
+                with self.metrics.time('write'):
+                    output_path = store_payload(self.output_dir, ticker, payload, self.storage_format, self.compression)
+                    self.store_actions(ticker, data, group[0], full=True)
+                self.metrics.inc('bytes_written', len(payload))
+                self.metrics.inc('rows_written', len(df))
                 
                 if os.path.exists(output_path) and os.path.getsize(output_path) > 0:
-                    results.append(DownloadResult(ticker, True, records=len(df), attempts=self.failed_tickers.get(ticker, 0) + 1))
-                    self.consecutive_failures = 0
-                    self.existing_files.add(ticker)
-                    if ticker in self.failed_tickers:
-                        del self.failed_tickers[ticker]  # Remove from failed tickers on success
+                    # Detection gets the series exactly as the file reads back (JSON keeps 10 decimals)
+                    frame = decode_price_data(serialized, self.storage_format) if self.on_stored else None
+                    results.append(DownloadResult(ticker, True, records=len(df),
+                                                  attempts=self.mark_downloaded(ticker, output_path, df.index[-1], len(df),
+                                                                                frame)))
                 else:
                     raise Exception("File was not created or is empty")
                 
             except Exception as e:
                 error_msg = str(e)[:100]
-                self.failed_tickers[ticker] = self.failed_tickers.get(ticker, 0) + 1
-                results.append(DownloadResult(ticker, False, error=error_msg, attempts=self.failed_tickers[ticker]))
-                self.consecutive_failures += 1
+                results.append(DownloadResult(ticker, False, error=error_msg, attempts=self.record_failure(ticker, error_msg)))
+                with self.state_lock:
+                    self.consecutive_failures += 1
         
         return results
 
+    def update_ticker(self, ticker: str, data, first_ticker: str, stored: pd.DataFrame) -> DownloadResult:
+        """Append the bars newer than the stored series, with SMAs computed from the stored tail."""
+        with self.metrics.time('extract'):
+            df, error = self.prepare_price_frame(data, ticker, first_ticker, min_rows=0) if not data.empty else (None, None)
+        new_rows = df[df.index > stored.index[-1]] if df is not None else None
+        if new_rows is None or new_rows.empty:
+            # Nothing newer than the last stored bar
+            return DownloadResult(ticker, True, records=0, attempts=self.mark_downloaded(ticker))
+        
+        with self.metrics.time('sma'):
+            new_rows = self.extend_stock_data(stored, new_rows)
+        with self.metrics.time('write'):
+            path = append_price_data(self.output_dir, ticker, stored, new_rows, self.storage_format,
+                                     self.compression, self.compression_level)
+            # A new split or dividend only adds a row to the table; the stored history stays as it is
+            self.store_actions(ticker, data, first_ticker, full=False)
+        self.metrics.inc('rows_written', len(new_rows))
+        combined = None
+        if self.on_stored:
+            combined = decode_price_data(serialize_price_data(pd.concat([stored, new_rows]), self.storage_format),
+                                         self.storage_format)
+        return DownloadResult(ticker, True, records=len(new_rows),
+                              attempts=self.mark_downloaded(ticker, path, new_rows.index[-1], len(stored) + len(new_rows),
+                                                            combined))
+
+    def mark_downloaded(self, ticker: str, path=None, last_date: Optional[pd.Timestamp] = None,
+                        rows: Optional[int] = None, frame: Optional[pd.DataFrame] = None) -> int:
+        """
+        Record a successful download or refresh (in memory and in the manifest) and pass it to on_stored.
+        
+        Args:
+            frame: Full stored series when it was just written (None if unchanged on disk)
+        
+        Returns:
+            Attempts it took
+        """
+        self.manifest.record_success(ticker, path, last_date, rows)
+        if self.on_stored is not None:
+            self.on_stored(ticker, frame)
+        self.metrics.inc('tickers_succeeded')
+        with self.state_lock:
+            self.existing_files.add(ticker)
+            self.up_to_date.add(ticker)
+            # Remove from failed tickers on success
+            return self.failed_tickers.pop(ticker, 0) + 1
+
     def process_all(self, tickers: List[str], batch_size: int = 100):
-        """Process tickers in batches sequentially."""
-        total_results = []
-        tickers = [str(ticker).strip() for ticker in tickers if str(ticker).strip()]
-        total_batches = (len(tickers) + batch_size - 1) // batch_size
+        """
+        Process tickers in batches, sequentially or with concurrent batch workers.
+        
+        batch_size is the starting size; the batch size controller adapts it per batch.
+        """
+        tickers = list(dict.fromkeys(str(ticker).strip().upper() for ticker in tickers if str(ticker).strip()))
+        if self.batch_sizer is None:
+            self.batch_sizer = BatchSizeController(initial=batch_size)
+        started = time.time()
         
         with Progress(
             SpinnerColumn(),
@@ -256,35 +1185,207 @@ class StockDataDownloader:
             console=self.console
         ) as progress:
             task = progress.add_task("Processing tickers...", total=len(tickers))
-            while True:  # Keep processing until all tickers are successful
-                remaining_tickers = [t for t in tickers if t not in self.existing_files]
-                
-                if not remaining_tickers:
-                    break
-                    
-                for batch_index, i in enumerate(range(0, len(remaining_tickers), batch_size)):
-                    batch = remaining_tickers[i:i+batch_size]
-                    self.console.print(f"[blue]Processing batch {batch_index+1} of {total_batches}...[/blue]")
-                    batch_results = self.process_bulk_batch(batch)
-                    total_results.extend(batch_results)
-                    progress.update(task, advance=len(batch))
-                    self.console.print(f"[green]Finished batch {batch_index+1} of {total_batches}.[/green]")
-                    sleep(30)
+            progress.update(task, advance=sum(1 for t in tickers if not self.needs_download(t)))
+            total_results = self.drain_work_queue(tickers, progress, task)
         
+        elapsed = time.time() - started
         success_count = sum(1 for r in total_results if r.success)
         failure_count = len(total_results) - success_count
         self.console.print(f"\n[bold green]Success: {success_count}[/bold green] | [bold red]Failed: {failure_count}[/bold red] | [bold blue]Total: {len(total_results)}[/bold blue]")
+        if elapsed > 0:
+            mode = f"{self.workers} workers" if self.limiter is not None else "sequential"
+            self.console.print(f"[bold blue]Throughput: {success_count / elapsed * 60:.1f} tickers/min ({mode}, {elapsed:.1f}s)[/bold blue]")
+        connections = self.connection_stats()
+        if connections['requests']:
+            self.console.print(f"[blue]HTTP: {connections['requests']} requests over {connections['connections']} connections "
+                               f"({connections['reused']} reused, pool size {self.pool_size})[/blue]")
+        sizes = [report['size'] for report in self.batch_sizer.history]
+        if sizes:
+            self.console.print(f"[blue]Batch size: {min(sizes)}-{max(sizes)} over {len(sizes)} batches, "
+                               f"next {self.batch_sizer.next_size()}[/blue]")
+        if self.limiter is not None:
+            self.console.print(f"[blue]Rate limiter: {self.metrics.get('throttled_seconds'):.1f}s waiting for tokens, "
+                               f"{self.limiter.throttle_events} throttle events, "
+                               f"final rate {self.limiter.rate:.2f} req/s[/blue]")
         self.console.print(f"[bold blue]Data files saved in: {os.path.abspath(self.output_dir)}[/bold blue]")
         
-        if self.failed_tickers:
+        failed = {ticker: attempts for ticker, attempts in self.failed_tickers.items() if ticker not in self.retired}
+        if failed:
             self.console.print("\n[yellow]Failed tickers:[/yellow]")
-            for ticker, attempts in self.failed_tickers.items():
+            for ticker, attempts in failed.items():
                 self.console.print(f"  {ticker}: {attempts} attempts")
+        classes = self.manifest.summary()
+        retired = {name: classes.get(name, 0) for name in DownloadManifest.RETIRED_CLASSES}
+        self.console.print(f"[blue]Manifest: {sum(classes.values())} tickers, "
+                           f"{retired['unsupported']} unsupported and {retired['dead']} dead symbols skipped, "
+                           f"{classes.get('quarantined', 0)} quarantined ({self.metrics.get('bisections'):.0f} batch bisections this run)[/blue]")
+        
+        stage_seconds = {stage: histogram['sum'] for stage, histogram in self.metrics.snapshot()['stage_seconds'].items()}
+        self.console.print("[blue]Stage time: " + ", ".join(f"{stage} {seconds:.1f}s" for stage, seconds in stage_seconds.items())
+                           + f", throttled {self.metrics.get('throttled_seconds'):.1f}s"
+                           + f", paused {self.metrics.get('sleep_seconds'):.1f}s[/blue]")
+        if self.metrics.path:
+            self.metrics.write()
+            self.console.print(f"[blue]Metrics written to {self.metrics.path}[/blue]")
         
+        self.manifest.commit()
         return total_results
 
+    def run_batch(self, batch: List[str]):
+        """
+        Process one batch and feed its outcome to the batch size controller.
+        
+        Returns:
+            Tuple of (results, batch report or None if nothing in the batch was attempted)
+        """
+        started = time.monotonic()
+        results = self.process_bulk_batch(batch)
+        if not results:
+            return results, None
+        seconds = time.monotonic() - started
+        self.metrics.observe_batch(seconds)
+        self.metrics.inc('batches')
+        self.metrics.inc('batch_tickers', len(batch))
+        return results, self.batch_sizer.record(len(batch), seconds, results)
+
+    def report_batch(self, report: Optional[dict]):
+        """Print the per-batch size and throughput line."""
+        if report is None:
+            return
+        problem = f", {report['problem']}" if report['problem'] else ""
+        color = "yellow" if report['problem'] else "green"
+        self.console.print(f"[{color}]Finished batch {report['batch']}: {report['succeeded']}/{report['size']} tickers in "
+                           f"{report['seconds']:.1f}s ({report['tickers_per_min']:.0f} tickers/min{problem}), "
+                           f"next batch size {report['next_size']}[/{color}]")
+
+    def drain_work_queue(self, tickers: List[str], progress, task) -> List[DownloadResult]:
+        """
+        Feed batches to the workers until every ticker succeeded, was retired or is deferred.
+        
+        Tickers that fail are parked in the retry queue and rejoin the work queue once
+        due, so nothing waits on them while other tickers are ready. Concurrent mode
+        cuts a new batch whenever a worker frees up; sequential mode runs batches
+        in-line with its fixed pause between them. When only parked tickers remain,
+        the loop sleeps until the earliest is due, or defers them to a later run if
+        that is more than max_retry_wait away.
+        """
+        wanted = set(tickers)
+        pending = deque(t for t in tickers if self.needs_download(t) and not self.is_rate_limited(t))
+        in_flight = {}
+        results = []
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.workers) if self.limiter is not None else None
+
+        def finish(batch: List[str], batch_results: List[DownloadResult], report: Optional[dict]):
+            results.extend(batch_results)
+            self.report_batch(report)
+            self.metrics.maybe_write()
+            progress.update(task, advance=sum(1 for t in batch if not self.needs_download(t)))
+
+        try:
+            while True:
+                queued = set(pending)
+                retries = [t for t in self.retry_queue.pop_ready() if t in wanted and t not in queued and self.needs_download(t)]
+                if retries:
+                    pending.extend(retries)
+                    self.metrics.inc('retries', len(retries))
+                
+                if executor is None and pending:
+                    batch = [pending.popleft() for _ in range(min(len(pending), self.batch_sizer.next_size()))]
+                    self.console.print(f"[blue]Processing batch of {len(batch)} tickers ({len(pending)} queued, "
+                                       f"{len(self.retry_queue)} waiting to retry)...[/blue]")
+                    finish(batch, *self.run_batch(batch))
+                    if pending:
+                        self.pause(self.batch_pause)
+                    continue
+                
+                while pending and len(in_flight) < self.workers:
+                    batch = [pending.popleft() for _ in range(min(len(pending), self.batch_sizer.next_size()))]
+                    in_flight[executor.submit(self.run_batch, batch)] = batch
+                
+                if in_flight:
+                    # Wake up for finished batches or for the next parked ticker becoming due
+                    next_ready = self.retry_queue.next_ready(wanted)
+                    timeout = max(0.0, next_ready - time.time()) if next_ready is not None else None
+                    done, _ = concurrent.futures.wait(in_flight, timeout=timeout,
+                                                      return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in done:
+                        batch = in_flight.pop(future)
+                        try:
+                            finish(batch, *future.result())
+                        except Exception as e:
+                            self.console.print(f"[red]Batch of {len(batch)} tickers failed: {str(e)}[/red]")
+                    continue
+                
+                waiting = [t for t in wanted if self.needs_download(t) and self.is_rate_limited(t)]
+                if not waiting:
+                    break
+                # Only parked tickers are left; wait for the earliest unless it is too far away
+                wait = self.retry_queue.next_ready(waiting) - time.time()
+                if wait > self.max_retry_wait:
+                    self.console.print(f"[yellow]Deferring {len(waiting)} tickers to a later run "
+                                       f"(next retry in {wait / 60:.0f} min)[/yellow]")
+                    break
+                self.pause(max(wait, 0))
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True)
+        return results
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description='Download daily price history for tickers.csv')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Refresh existing data files with bars newer than their last stored date')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Concurrent batch workers (1 = sequential batches with fixed pauses)')
+    parser.add_argument('--rate', type=float, default=0.5,
+                        help='Provider requests per second allowed across workers (concurrent mode)')
+    parser.add_argument('--burst', type=int, default=4,
+                        help='Requests that may be sent back to back before the rate applies (concurrent mode)')
+    parser.add_argument('--provider', choices=PROVIDERS, default='yfinance',
+                        help='Market data source (replay and synthetic run offline)')
+    parser.add_argument('--record', metavar='DIR',
+                        help='Save raw provider responses to DIR for later replay')
+    parser.add_argument('--replay-dir', metavar='DIR',
+                        help='Recording directory served by --provider replay')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='Simulated seconds per request (offline providers)')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='Probability of an injected 429 per request (offline providers)')
+    parser.add_argument('--ticker-error-rate', type=float, default=0.0,
+                        help='Probability that a symbol of a served request comes back throttled (offline providers)')
+    parser.add_argument('--poison', action='append', default=[], metavar='SYMBOL',
+                        help='Symbol that makes every request containing it fail (offline providers, repeatable)')
+    parser.add_argument('--rate-limit-pause', type=float, default=300,
+                        help='Seconds a throttled ticker waits before it is retried')
+    parser.add_argument('--batch-size', type=int, default=100,
+                        help='Starting tickers per bulk request (adapted per batch)')
+    parser.add_argument('--min-batch-size', type=int, default=5,
+                        help='Smallest batch the controller shrinks to after throttling')
+    parser.add_argument('--max-batch-size', type=int, default=250,
+                        help='Largest batch the controller grows to while requests stay healthy')
+    parser.add_argument('--metrics-file', metavar='PATH',
+                        help='Write run metrics to PATH (.prom for a Prometheus textfile, JSON otherwise)')
+    parser.add_argument('--metrics-interval', type=float, default=30,
+                        help='Seconds between metrics file updates during the run')
+    parser.add_argument('--rescan', action='store_true',
+                        help='Rebuild the download manifest from the files in the data directory '
+                             '(tickers whose files were deleted are downloaded again)')
+    parser.add_argument('--format', choices=FORMATS, default='json',
+                        help='Storage format for data files (npz/parquet load faster and are smaller than json)')
+    parser.add_argument('--compression', choices=COMPRESSIONS,
+                        help='Compress json data files (zstd needs the zstandard package)')
+    parser.add_argument('--compression-level', type=int,
+                        help='Compression level (default: zstd 3, gzip 6)')
+    parser.add_argument('--detect', action='store_true',
+                        help='Run breakout detection on each ticker as soon as it is stored, while downloading continues')
+    parser.add_argument('--adjusted', action='store_true',
+                        help='Store provider-adjusted prices instead of raw prices plus a split/dividend table')
+    return parser.parse_args()
+
 def main():
     console = Console()
+    args = parse_args()
     try:
         # Check if tickers.csv exists
         if not os.path.exists('tickers.csv'):
@@ -319,8 +1420,43 @@ def main():
             console.print(f"[bold blue]Found {len(tickers):,} tickers to process[/bold blue]")
             console.print(f"[bold blue]Data will be saved to: {os.path.abspath(data_dir)}[/bold blue]")
             
-            downloader = StockDataDownloader(output_dir=data_dir)
-            results = downloader.process_all(tickers)
+            provider = create_provider(args.provider, record_dir=args.record, replay_dir=args.replay_dir,
+                                       latency=args.latency, error_rate=args.error_rate,
+                                       ticker_error_rate=args.ticker_error_rate, poison=args.poison)
+            console.print(f"[bold blue]Market data provider: {provider.name}[/bold blue]")
+            detector = None
+            try:
+                if args.detect:
+                    # Imported lazily: detection is only needed in the pipelined mode
+                    import quality_breakouts
+                    detector = quality_breakouts.start_detection(data_dir=Path(data_dir).resolve())
+                downloader = StockDataDownloader(output_dir=data_dir, incremental=args.incremental, workers=args.workers,
+                                                 requests_per_second=args.rate, burst=args.burst, provider=provider,
+                                                 storage_format=args.format, rescan=args.rescan,
+                                                 batch_sizer=BatchSizeController(initial=args.batch_size,
+                                                                                 min_size=args.min_batch_size,
+                                                                                 max_size=args.max_batch_size),
+                                                 metrics=DownloadMetrics(args.metrics_file, args.metrics_interval),
+                                                 adjusted=args.adjusted,
+                                                 on_stored=detector.submit if detector else None,
+                                                 compression=args.compression,
+                                                 compression_level=args.compression_level,
+                                                 rate_limit_pause=args.rate_limit_pause)
+                if detector:
+                    # Files that need no download this run are detected from disk while the rest downloads
+                    for ticker in sorted(downloader.up_to_date):
+                        detector.submit(ticker)
+                results = downloader.process_all(tickers)
+                if detector:
+                    # Stored tickers whose refresh failed still get detected on their existing files
+                    for ticker in list_tickers(data_dir):
+                        detector.submit(ticker)
+            finally:
+                # Also on errors and Ctrl-C: queued tickers are detected and their breakouts written
+                if detector:
+                    found = detector.close()
+                    console.print(f"[bold blue]Breakout detection: {len(detector.submitted):,} tickers, "
+                                  f"{found:,} with breakouts[/bold blue]")
             
             # Print detailed results
             success_count = sum(1 for r in results if r.success)
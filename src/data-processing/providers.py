@@ -0,0 +1,459 @@
+"""
+Market data providers for the stock data downloader.
+
+Every provider answers bulk requests the way yf.download(group_by='ticker') does:
+a Date-indexed frame whose column level 0 is the ticker. Unadjusted requests
+(adjusted=False) return raw prices plus Dividends and Stock Splits columns, so the
+caller can keep its own corporate-actions table. Besides the live yfinance
+backend there is a recording wrapper that captures raw responses to disk and two
+offline backends (replay of recorded responses, synthetic random walks) with
+configurable latency and injected rate-limit errors, so the downloader can be
+tested and benchmarked without network access.
+
+yf.download does not raise when Yahoo throttles some of the symbols of a request:
+it logs the error and leaves those columns empty. Providers report such symbols
+in the response's attrs['errors'] ({ticker: message}, see response_errors), and
+raise RateLimitError when the whole request came back throttled.
+"""
+
+import ast
+import logging
+import os
+import random
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from storage import ACTION_COLUMNS, adjust_price_data, extract_actions
+
+try:
+    import yfinance as yf
+except ImportError:
+    yf = None
+
+PRICE_FIELDS = ['Open', 'High', 'Low', 'Close', 'Volume']
+RATE_LIMIT_MESSAGE = "Too Many Requests. Rate limited. Try after a while."
+
+class RateLimitError(Exception):
+    """Raised when a whole request was throttled; the message matches what yfinance reports on HTTP 429."""
+
+    def __init__(self, message: str = RATE_LIMIT_MESSAGE):
+        super().__init__(message)
+
+def is_rate_limit_message(message: Optional[str]) -> bool:
+    """Whether an error message reports throttling (HTTP 429 / YFRateLimitError)."""
+    message = (message or '').lower()
+    return 'too many requests' in message or 'rate limit' in message
+
+def response_errors(data) -> Dict[str, str]:
+    """Per-ticker errors a provider reported for a bulk response ({} when every ticker was served)."""
+    return data.attrs.get('errors', {}) if isinstance(data, pd.DataFrame) else {}
+
+def attach_errors(data, tickers: List[str], errors: Dict[str, str]):
+    """
+    Record per-ticker errors on a bulk response.
+
+    Raises:
+        RateLimitError: If some ticker was throttled and no ticker came back with data
+    """
+    errors = {ticker: error for ticker, error in errors.items() if ticker in tickers}
+    if not errors:
+        return data
+    served = [ticker for ticker in tickers if ticker not in errors]
+    frames = split_frames(data, served) if served else {}
+    if all(df.empty for df in frames.values()) and any(is_rate_limit_message(error) for error in errors.values()):
+        raise RateLimitError()
+    if isinstance(data, pd.DataFrame) and not data.empty:
+        data.attrs['errors'] = errors
+    return data
+
+def combine_frames(frames: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """Assemble per-ticker frames into one bulk response (ticker as column level 0)."""
+    frames = {ticker: df for ticker, df in frames.items() if df is not None and not df.empty}
+    if not frames:
+        return pd.DataFrame()
+    data = pd.concat(frames, axis=1).sort_index()
+    data.index.name = 'Date'
+    return data
+
+def split_frames(data, tickers: List[str]) -> Dict[str, pd.DataFrame]:
+    """Split a bulk response back into per-ticker frames (tickers missing from it are skipped)."""
+    if isinstance(data, dict):
+        return {ticker: df for ticker, df in data.items() if ticker in tickers}
+    if data is None or data.empty:
+        return {}
+    if not isinstance(data.columns, pd.MultiIndex):
+        # Single-ticker responses may come back with flat columns
+        return {tickers[0]: data} if len(tickers) == 1 else {}
+    present = set(data.columns.get_level_values(0))
+    return {ticker: data[ticker].dropna(how='all') for ticker in tickers if ticker in present}
+
+def unsplit_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Undo the split adjustment Yahoo applies even with auto_adjust=False.
+
+    Bars before a split in the frame are scaled back to the share count they traded
+    at (prices and dividends times the ratio, volume divided by it). Splits after
+    the frame's last bar cannot exist, since responses always run up to today.
+    """
+    if 'Stock Splits' not in df.columns:
+        return df
+    splits = df['Stock Splits'].fillna(0.0).to_numpy(dtype='float64')
+    splits = np.where(splits > 0, splits, 1.0)
+    # Combined ratio of the splits strictly after each bar
+    later = np.append(np.cumprod(splits[::-1])[::-1][1:], 1.0)
+    df = df.copy()
+    for col in ['Open', 'High', 'Low', 'Close', 'Dividends']:
+        if col in df.columns:
+            df[col] = df[col] * later
+    df['Volume'] = df['Volume'] / later
+    return df
+
+class MarketDataProvider:
+    """
+    Interface used by StockDataDownloader.
+
+    Attributes:
+        name: Label used in console output
+        thread_safe: Whether download may be called from several workers at once
+    """
+    name = 'base'
+    thread_safe = True
+
+    def download(self, tickers: List[str], start: Optional[str] = None, adjusted: bool = True) -> pd.DataFrame:
+        """
+        Fetch daily bars for tickers.
+
+        Args:
+            tickers: Symbols to fetch in one request
+            start: First date (YYYY-MM-DD) to return, or None for the full history
+            adjusted: Split/dividend adjusted prices; False returns raw prices plus ACTION_COLUMNS
+
+        Returns:
+            Bulk frame with the ticker as column level 0 (empty if nothing matched)
+        """
+        raise NotImplementedError
+
+    def use_session(self, session):
+        """Route the provider's HTTP traffic through a shared session (offline providers ignore it)."""
+
+class YFinanceErrorHandler(logging.Handler):
+    """Collects the per-ticker errors yf.download logs as "['AAA', 'BBB']: message" records."""
+
+    def __init__(self):
+        super().__init__(logging.ERROR)
+        self.errors: Dict[str, str] = {}
+
+    def emit(self, record: logging.LogRecord):
+        message = record.getMessage().strip()
+        if not message.startswith('[') or ']: ' not in message:
+            return
+        symbols, error = message.split(']: ', 1)
+        try:
+            symbols = ast.literal_eval(symbols + ']')
+        except (ValueError, SyntaxError):
+            return
+        for symbol in symbols:
+            self.errors[str(symbol).upper()] = error
+
+class YFinanceProvider(MarketDataProvider):
+    """
+    Live Yahoo Finance data through yf.download.
+
+    Symbols yfinance could not fetch are taken from yf.shared._ERRORS (0.2.x) or,
+    on versions that only log them, from the error records of the yfinance logger.
+    """
+    name = 'yfinance'
+    # yf.download keeps per-call results in module-level state, so concurrent calls must not overlap
+    thread_safe = False
+
+    def __init__(self, timeout: int = 30, session=None):
+        if yf is None:
+            raise ImportError("yfinance is required for the yfinance provider")
+        self.timeout = timeout
+        self.session = session
+        self.lock = threading.Lock()
+
+    def use_session(self, session):
+        self.session = session
+
+    def download(self, tickers: List[str], start: Optional[str] = None, adjusted: bool = True) -> pd.DataFrame:
+        kwargs = {'start': start} if start is not None else {}
+        if self.session is not None:
+            kwargs['session'] = self.session
+        handler = YFinanceErrorHandler()
+        yf_logger = logging.getLogger('yfinance')
+        with self.lock:
+            yf_logger.addHandler(handler)
+            try:
+                data = yf.download(' '.join(tickers), timeout=self.timeout, group_by='ticker', auto_adjust=adjusted,
+                                   actions=not adjusted, **kwargs)
+                shared = getattr(getattr(yf, 'shared', None), '_ERRORS', None)
+                errors = dict(shared) if shared else handler.errors
+            finally:
+                yf_logger.removeHandler(handler)
+        errors = {ticker.upper(): str(error) for ticker, error in errors.items()}
+        if not adjusted and data is not None and not data.empty:
+            frames = split_frames(data, tickers)
+            data = combine_frames({ticker: unsplit_frame(df.drop(columns=['Adj Close'], errors='ignore'))
+                                   for ticker, df in frames.items()})
+        return attach_errors(data, tickers, errors)
+
+class RecordingProvider(MarketDataProvider):
+    """
+    Wraps another provider and saves every response it returns.
+
+    Responses are stored per ticker as raw pickled frames under record_dir, later
+    requests for the same ticker merge into the stored frame, so a recording can
+    be replayed with any batch size or start date.
+    """
+
+    def __init__(self, inner: MarketDataProvider, record_dir: str):
+        self.inner = inner
+        self.name = f'{inner.name} (recording)'
+        self.thread_safe = inner.thread_safe
+        self.record_dir = Path(record_dir)
+        self.record_dir.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+
+    def use_session(self, session):
+        self.inner.use_session(session)
+
+    def download(self, tickers: List[str], start: Optional[str] = None, adjusted: bool = True) -> pd.DataFrame:
+        data = self.inner.download(tickers, start=start, adjusted=adjusted)
+        errors = response_errors(data)
+        with self.lock:
+            for ticker, df in split_frames(data, [ticker for ticker in tickers if ticker not in errors]).items():
+                path = self.record_dir / f'{ticker}.pkl'
+                if path.exists():
+                    stored = pd.read_pickle(path)
+                    df = pd.concat([stored[~stored.index.isin(df.index)], df]).sort_index()
+                temp_path = path.with_suffix('.tmp')
+                df.to_pickle(temp_path)
+                os.replace(temp_path, path)
+        return data
+
+class SimulatedProvider(MarketDataProvider):
+    """
+    Base for offline providers: adds per-request latency, injected 429 errors and outages.
+
+    Args:
+        latency: Mean seconds per request
+        jitter: Uniform +/- seconds added to the latency
+        error_rate: Probability that a request fails with RateLimitError
+        seed: Seed for the latency/error draws
+        outages: (start, end) windows in seconds after the provider is created during
+            which every request times out
+        ticker_error_rate: Probability that a symbol of an otherwise served request is
+            throttled the way yf.download reports it (all-NaN columns plus a per-ticker error)
+        poison: Symbols that make any request containing them fail with a non-throttling
+            error, like a symbol whose response the provider cannot parse
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0, seed: Optional[int] = None,
+                 outages: Sequence[Tuple[float, float]] = (), ticker_error_rate: float = 0.0,
+                 poison: Sequence[str] = ()):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.ticker_error_rate = ticker_error_rate
+        self.poison = {ticker.upper() for ticker in poison}
+        self.outages = list(outages)
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.requests = 0
+        self.throttled = 0
+        self.throttled_tickers = 0
+        self.outage_failures = 0
+        self.poisoned = 0
+
+    def simulate_request(self, tickers: Sequence[str] = ()):
+        """
+        Sleep for the simulated latency and raise the injected failure, if any.
+
+        Raises:
+            TimeoutError: During an outage
+            RateLimitError: When the request is throttled
+            ValueError: When the request contains a poison symbol
+        """
+        with self.lock:
+            self.requests += 1
+            delay = max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+            now = time.monotonic() - self.started
+            down = any(start <= now < end for start, end in self.outages)
+            throttled = not down and self.random.random() < self.error_rate
+            if throttled:
+                self.throttled += 1
+            if down:
+                self.outage_failures += 1
+        if delay:
+            time.sleep(delay)
+        if down:
+            raise TimeoutError("Read timed out (provider outage)")
+        if throttled:
+            raise RateLimitError()
+        if self.poison.intersection(tickers):
+            with self.lock:
+                self.poisoned += 1
+            raise ValueError("Malformed response: could not parse quote data")
+
+    def throttled_symbols(self, tickers: List[str]) -> List[str]:
+        """Draw the symbols of a served request that come back throttled."""
+        if not self.ticker_error_rate:
+            return []
+        with self.lock:
+            throttled = [ticker for ticker in tickers if self.random.random() < self.ticker_error_rate]
+            self.throttled_tickers += len(throttled)
+        return throttled
+
+    def frame_for(self, ticker: str) -> Optional[pd.DataFrame]:
+        """Full history for one ticker (None if the provider has no data for it); may carry ACTION_COLUMNS."""
+        raise NotImplementedError
+
+    def download(self, tickers: List[str], start: Optional[str] = None, adjusted: bool = True) -> pd.DataFrame:
+        self.simulate_request(tickers)
+        errors = {ticker: RATE_LIMIT_MESSAGE for ticker in self.throttled_symbols(tickers)}
+        frames = {}
+        for ticker in tickers:
+            df = self.frame_for(ticker)
+            if df is not None:
+                has_actions = all(col in df.columns for col in ACTION_COLUMNS)
+                if adjusted and has_actions:
+                    df = adjust_price_data(df[PRICE_FIELDS], extract_actions(df))
+                elif not adjusted and not has_actions:
+                    # Adjusted recordings have no events to report
+                    df = df.assign(**{col: 0.0 for col in ACTION_COLUMNS})
+                if start is not None:
+                    df = df[df.index >= pd.Timestamp(start)]
+                if ticker in errors:
+                    # yf.download keeps throttled symbols in the response as empty columns
+                    df = pd.DataFrame(np.nan, index=df.index, columns=df.columns)
+            frames[ticker] = df
+        return attach_errors(combine_frames(frames), tickers, errors)
+
+class ReplayProvider(SimulatedProvider):
+    """Serves responses captured by RecordingProvider; unrecorded tickers come back without data."""
+
+    def __init__(self, record_dir: str, **kwargs):
+        super().__init__(**kwargs)
+        self.name = 'replay'
+        self.record_dir = Path(record_dir)
+        if not self.record_dir.is_dir():
+            raise FileNotFoundError(f"Recording directory not found: {record_dir}")
+        self.cache = {}
+
+    def frame_for(self, ticker: str) -> Optional[pd.DataFrame]:
+        if ticker not in self.cache:
+            path = self.record_dir / f'{ticker}.pkl'
+            self.cache[ticker] = pd.read_pickle(path) if path.exists() else None
+        return self.cache[ticker]
+
+class SyntheticProvider(SimulatedProvider):
+    """
+    Generates a deterministic random walk per ticker over business days.
+
+    Bars are drawn over one fixed calendar from CALENDAR_START, with a random stream
+    per (ticker, year) that always covers the whole year, and then sliced to the
+    requested dates. A bar therefore only depends on its symbol and date, so runs
+    with other start or end dates (and delta requests) see the same history. About
+    half of the tickers pay quarterly dividends and a quarter have one split, so
+    unadjusted requests have events to report. Event dates are positions in the
+    fixed calendar too (the split day is drawn up to SPLIT_HORIZON and may lie after
+    the last bar), so every window reports the same events and raw prices.
+    """
+    CALENDAR_START = pd.Timestamp('2000-01-01')
+    SPLIT_HORIZON = pd.Timestamp('2039-12-31')
+    # Business days from CALENDAR_START through SPLIT_HORIZON
+    HORIZON_DAYS = len(pd.bdate_range(CALENDAR_START, SPLIT_HORIZON))
+
+    def __init__(self, start_date: str = '2015-01-02', end_date: Optional[str] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.name = 'synthetic'
+        self.calendar = pd.bdate_range(self.CALENDAR_START, end_date or pd.Timestamp.today().normalize(), name='Date')
+        self.dates = self.calendar[self.calendar >= pd.Timestamp(start_date)]
+        self.year_days = {int(year): len(pd.bdate_range(f'{year}-01-01', f'{year}-12-31'))
+                          for year in self.calendar.year.unique()}
+
+    def draw_bars(self, ticker: str) -> Dict[str, np.ndarray]:
+        """Open/High/Low/Close/Volume of ticker over the whole calendar (post-split share count)."""
+        seed = zlib.crc32(ticker.encode())
+        blocks = {name: [] for name in ['returns', 'gap', 'high', 'low', 'volume']}
+        for year, days in self.year_days.items():
+            rng = np.random.default_rng([seed, year])
+            blocks['returns'].append(rng.normal(0.0003, 0.02, days))
+            blocks['gap'].append(rng.normal(0, 0.005, days))
+            blocks['high'].append(rng.uniform(0, 0.02, days))
+            blocks['low'].append(rng.uniform(0, 0.02, days))
+            blocks['volume'].append(rng.integers(10_000, 5_000_000, days))
+        n = len(self.calendar)
+        draws = {name: np.concatenate(values)[:n] for name, values in blocks.items()}
+        close = np.random.default_rng(seed).uniform(5, 200) * np.exp(np.cumsum(draws['returns']))
+        open_ = close * (1 + draws['gap'])
+        return {'Open': open_, 'High': np.maximum(open_, close) * (1 + draws['high']),
+                'Low': np.minimum(open_, close) * (1 - draws['low']), 'Close': close, 'Volume': draws['volume']}
+
+    def frame_for(self, ticker: str) -> Optional[pd.DataFrame]:
+        bars = self.draw_bars(ticker)
+        close = bars['Close']
+        n = len(self.calendar)
+        
+        # Events come from a second stream so the walk itself does not depend on them
+        events = np.random.default_rng([zlib.crc32(ticker.encode()), 1])
+        dividends = np.zeros(n)
+        splits = np.zeros(n)
+        if events.random() < 0.5:
+            days = np.arange(events.integers(1, 63), n, 63)
+            dividends[days] = np.round(close[days - 1] * events.uniform(0.002, 0.01), 4)
+        if events.random() < 0.25:
+            day = int(events.integers(1, self.HORIZON_DAYS))
+            ratio = float(events.choice([2, 3, 4]))
+            if day < n:
+                splits[day] = ratio
+            # The walk is the post-split share count; earlier bars traded at ratio times the price
+            for col in ['Open', 'High', 'Low', 'Close']:
+                bars[col] = np.concatenate([bars[col][:day] * ratio, bars[col][day:]])
+            bars['Volume'] = np.concatenate([np.round(bars['Volume'][:day] / ratio).astype('int64'),
+                                             bars['Volume'][day:]])
+            dividends[:day] *= ratio
+        bars['Dividends'] = dividends
+        bars['Stock Splits'] = splits
+        
+        first = n - len(self.dates)
+        return pd.DataFrame({col: values[first:] for col, values in bars.items()}, index=self.dates)
+
+PROVIDERS = ['yfinance', 'replay', 'synthetic']
+
+def create_provider(name: str = 'yfinance', record_dir: Optional[str] = None, replay_dir: Optional[str] = None,
+                    latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                    seed: Optional[int] = None, ticker_error_rate: float = 0.0,
+                    poison: Sequence[str] = ()) -> MarketDataProvider:
+    """
+    Build a provider from command line style options.
+
+    Args:
+        name: One of PROVIDERS
+        record_dir: If given, wrap the provider so raw responses are saved there
+        replay_dir: Recording directory served by the replay provider
+        latency, jitter, error_rate, seed, ticker_error_rate, poison: Simulation settings for offline providers
+    """
+    simulation = dict(latency=latency, jitter=jitter, error_rate=error_rate, seed=seed,
+                      ticker_error_rate=ticker_error_rate, poison=poison)
+    if name == 'yfinance':
+        provider = YFinanceProvider()
+    elif name == 'replay':
+        if not replay_dir:
+            raise ValueError("The replay provider needs a recording directory")
+        provider = ReplayProvider(replay_dir, **simulation)
+    elif name == 'synthetic':
+        provider = SyntheticProvider(**simulation)
+    else:
+        raise ValueError(f"Unknown provider: {name}")
+    if record_dir:
+        provider = RecordingProvider(provider, record_dir)
+    return provider
@@ -17,10 +17,15 @@ import concurrent.futures
 import gc
 import json
 import logging
+import multiprocessing
+import multiprocessing.util
 import os
+import queue
 import random
 import shutil
+import sys
 import tempfile
+import threading
 import time
 import warnings
 from datetime import datetime, timedelta
@@ -33,6 +38,13 @@ from tqdm.auto import tqdm
 
 # Get script directory for relative path resolution
 SCRIPT_DIR = Path(__file__).parent.resolve()
+# Downloaded price files (and their actions/ tables) read by the standalone run
+DATA_DIR = SCRIPT_DIR / 'data'
+
+# Data file formats are shared with the downloader (same directory)
+sys.path.insert(0, str(SCRIPT_DIR))
+from storage import (adjust_price_data, data_file_format, find_data_file, list_tickers, read_actions, read_file_bytes,
+                     read_price_data)
 
 def parse_args():
     """Parse command line arguments."""
@@ -40,9 +52,14 @@ def parse_args():
     parser.add_argument('-v', '--verbose', action='store_true', help='Enable verbose logging')
     parser.add_argument('-q', '--quiet', action='store_true', help='Minimize logging (errors only)')
     parser.add_argument('-d', '--dataset', type=str, default='quality_breakouts', help='Dataset name')
-    parser.add_argument('-w', '--workers', type=int, default=4, help='Number of worker threads')
+    parser.add_argument('-w', '--workers', type=int, default=4,
+                        help='Number of worker processes (1 = process tickers serially)')
     parser.add_argument('--verbosity', type=int, choices=[0, 1, 2], default=1,
                         help='Verbosity level: 0=minimal, 1=normal, 2=verbose')
+    parser.add_argument('--writer-threads', type=int, default=None,
+                        help='Background output writer threads per process (0 = write inline)')
+    parser.add_argument('--compact-json', action='store_true',
+                        help='Write output JSON without pretty-printing')
     return parser.parse_args()
 
 
@@ -66,20 +83,28 @@ CONFIG = {
     'min_big_move_pct': 35.0,  # Stricter: require 35% big move (was 30%)
     'max_big_move_pct': 100.0,
     'min_date': pd.Timestamp('1990-01-01'),
+    'writer_threads': 2,  # Background output writer threads (0 = write inline)
+    'writer_queue_size': 64,  # Breakouts waiting to be written before detection blocks
+    'writer_batch_size': 8,  # Breakouts written per writer batch
+    'detect_queue_size': 32,  # Downloaded tickers waiting for detection before the downloader blocks
+    'compact_json': False,  # Write output JSON without indent=4 pretty-printing
     'verbosity': 0  # Minimal logging for speed
 }
 
 logger = logging.getLogger(__name__)
-STATS = {'ticker_count': 0, 'success_count': 0, 'failed_count': 0}
+STATS = {'ticker_count': 0, 'success_count': 0, 'failed_count': 0,
+         'files_avoided': 0, 'dirs_avoided': 0}
+WRITE_STAT_KEYS = ('files_avoided', 'dirs_avoided')
 _data_cache = {}
 
 
-def read_stock_data(ticker: str) -> Optional[pd.DataFrame]:
+def read_stock_data(ticker: str, data_dir: Optional[Path] = None) -> Optional[pd.DataFrame]:
     """
     Load and preprocess daily stock data with efficient caching.
     
     Args:
         ticker: Stock ticker symbol
+        data_dir: Directory holding the data files (default: DATA_DIR)
         
     Returns:
         DataFrame with daily OHLCV data and technical indicators, or None if invalid
@@ -87,26 +112,52 @@ def read_stock_data(ticker: str) -> Optional[pd.DataFrame]:
     if ticker in _data_cache:
         return _data_cache[ticker]
         
-    path = SCRIPT_DIR / 'data' / f'{ticker}.json'
-    if not path.exists():
+    data_dir = DATA_DIR if data_dir is None else data_dir
+    path = find_data_file(data_dir, ticker)
+    if path is None:
         return None
         
     try:
-        # Optimized JSON loading - read file once
-        with open(path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        if not data or not isinstance(data, list) or len(data) == 0:
-            return None
-        
-        # Quick column check on first record before creating DataFrame
-        first_record = data[0]
-        if first_record and not all(col in first_record for col in ['Date', 'Open', 'High', 'Low', 'Close', 'Volume']):
-            logger.debug(f"{ticker}: Missing required columns")
-            return None
+        if data_file_format(path)[0] == 'json':
+            # Optimized JSON loading - read file once (zstd/gzip files are decoded on the way)
+            data = json.loads(read_file_bytes(path))
+            
+            if not data or not isinstance(data, list) or len(data) == 0:
+                return None
+            
+            # Quick column check on first record before creating DataFrame
+            first_record = data[0]
+            if first_record and not all(col in first_record for col in ['Date', 'Open', 'High', 'Low', 'Close', 'Volume']):
+                logger.debug(f"{ticker}: Missing required columns")
+                return None
+            
+            # Use faster DataFrame construction
+            df = pd.DataFrame(data, copy=False)
+        else:
+            # Columnar files already hold typed columns and parsed dates
+            df = read_price_data(path)
+            if df is None:
+                return None
+            df = df.reset_index()
+    except Exception as e:
+        logger.error(f"Error reading data for {ticker}: {e}")
+        return None
+    return prepare_stock_frame(ticker, df, data_dir)
+
+
+def prepare_stock_frame(ticker: str, df: pd.DataFrame, data_dir: Optional[Path] = None) -> Optional[pd.DataFrame]:
+    """
+    Validate and preprocess loaded daily bars, caching the result.
+    
+    Args:
+        ticker: Stock ticker symbol
+        df: Bars with a Date column and the stored column names (modified in place)
+        data_dir: Directory holding the ticker's actions table (default: DATA_DIR)
         
-        # Use faster DataFrame construction
-        df = pd.DataFrame(data, copy=False)
+    Returns:
+        DataFrame with daily OHLCV data and technical indicators, or None if invalid
+    """
+    try:
         required_cols = ['Date', 'Open', 'High', 'Low', 'Close', 'Volume']
         if not all(col in df.columns for col in required_cols):
             logger.debug(f"{ticker}: Missing required columns")
@@ -125,6 +176,8 @@ def read_stock_data(ticker: str) -> Optional[pd.DataFrame]:
             return None
         
         df.set_index('Date', inplace=True)
+        # Raw downloads keep a split/dividend table; apply it once here (the adjusted frame is cached)
+        df = adjust_price_data(df, read_actions(DATA_DIR if data_dir is None else data_dir, ticker))
         df.columns = df.columns.str.lower()
         
         # Filter out data before 1990 (Qullamaggie's strategy is for modern markets)
@@ -221,17 +274,199 @@ def check_data_quality(df):
     """Check if dataframe has minimum required data."""
     return df is not None and len(df) >= 126
 
-def check_average_daily_range(df, breakout_idx, min_range_pct=None):
+BAR_COLUMNS = ['open', 'high', 'low', 'close', 'volume', '10sma', '20sma', '50sma']
+
+class Bars:
+    """
+    Contiguous NumPy arrays holding one ticker's daily bars.
+    
+    Built once from the DataFrame returned by read_stock_data. The detection engine
+    works on integer bar positions and int64 day ordinals from here on; pandas is
+    only used again when an output window is serialized (see frame).
+    """
+    
+    __slots__ = ('name', 'dates', 'day', 'open', 'high', 'low', 'close', 'volume',
+                 'sma10', 'sma20', 'sma50', 'length', '_features', '_outcomes')
+    
+    def __init__(self, dates: pd.DatetimeIndex, open_: np.ndarray, high: np.ndarray, low: np.ndarray,
+                 close: np.ndarray, volume: np.ndarray, sma10: Optional[np.ndarray] = None,
+                 sma20: Optional[np.ndarray] = None, sma50: Optional[np.ndarray] = None,
+                 name: Optional[str] = None):
+        self.name = name
+        self.dates = dates
+        self.day = dates.values.astype('datetime64[D]').astype(np.int64)
+        self.open = open_
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+        self.sma10 = sma10
+        self.sma20 = sma20
+        self.sma50 = sma50
+        self.length = len(dates)
+        self._features = None
+        self._outcomes = None
+    
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, name: Optional[str] = None) -> 'Bars':
+        """Copy a daily OHLCV frame (lowercase columns, DatetimeIndex) into contiguous arrays."""
+        def column(col: str) -> Optional[np.ndarray]:
+            return np.ascontiguousarray(df[col].to_numpy(dtype=np.float64)) if col in df.columns else None
+        
+        return cls(df.index, column('open'), column('high'), column('low'), column('close'),
+                   column('volume'), column('10sma'), column('20sma'), column('50sma'),
+                   name=name if name is not None else getattr(df, 'name', None))
+    
+    def __len__(self) -> int:
+        return self.length
+    
+    @property
+    def features(self) -> 'FeatureTable':
+        """Rolling features for these bars, computed on first use."""
+        if self._features is None:
+            self._features = FeatureTable(self)
+        return self._features
+    
+    @property
+    def outcomes(self) -> 'ForwardOutcomes':
+        """Forward outcome lookups for these bars, computed on first use."""
+        if self._outcomes is None:
+            self._outcomes = ForwardOutcomes(self)
+        return self._outcomes
+    
+    def complete_rows(self, start: int, end: int) -> np.ndarray:
+        """Positions in start..end (inclusive) where every output column has a value."""
+        columns = [self.open, self.high, self.low, self.close, self.volume, self.sma10, self.sma20, self.sma50]
+        if any(values is None for values in columns):
+            return np.empty(0, dtype=np.int64)
+        present = np.ones(max(0, end - start + 1), dtype=bool)
+        for values in columns:
+            present &= ~np.isnan(values[start:end + 1])
+        return np.flatnonzero(present) + start
+    
+    def frame(self, rows: np.ndarray) -> pd.DataFrame:
+        """Build the output DataFrame (BAR_COLUMNS, Date index) for the given positions."""
+        columns = [self.open, self.high, self.low, self.close, self.volume, self.sma10, self.sma20, self.sma50]
+        data = pd.DataFrame({col: values[rows] for col, values in zip(BAR_COLUMNS, columns)},
+                            index=self.dates[rows])
+        data.index.name = 'Date'
+        return data
+
+class RangeExtremum:
+    """
+    Sparse table answering range max (or min) queries in O(1) after an O(n log n) build.
+    
+    Queries return the extreme value and its first position, matching pandas
+    max/idxmax (min/idxmin) on the same slice; NaNs are skipped.
+    """
+    
+    def __init__(self, values: np.ndarray, mode: str = 'max'):
+        self.values = values
+        sign = 1.0 if mode == 'max' else -1.0
+        self._key = np.where(np.isnan(values), -np.inf, values * sign)
+        self._table = [np.arange(len(values))]
+        span = 1
+        while span * 2 <= len(values):
+            prev = self._table[-1]
+            left, right = prev[:len(prev) - span], prev[span:]
+            self._table.append(np.where(self._key[left] >= self._key[right], left, right))
+            span *= 2
+    
+    def query(self, start: int, end: int) -> Tuple[float, int]:
+        """Extreme value and its first position over start..end (inclusive)."""
+        start, end = int(start), int(end)
+        level = (end - start + 1).bit_length() - 1
+        left = self._table[level][start]
+        right = self._table[level][end - (1 << level) + 1]
+        pos = int(left if self._key[left] >= self._key[right] else right)
+        return self.values[pos], pos
+
+class FeatureTable:
+    """
+    Rolling per-ticker features computed once, right after read_stock_data.
+    
+    Every array is aligned with the ticker's bars so candidate filters and indicator
+    scorers read prefix-sum ratios and means and range extrema instead of cutting
+    fresh windows for each candidate.
+    """
+    
+    def __init__(self, bars: Bars):
+        self.length = len(bars)
+        open_, high, low, close, volume = bars.open, bars.high, bars.low, bars.close, bars.volume
+        
+        self.daily_range_pct = (high - low) / open_ * 100
+        
+        # Running counts and sums (length n+1) for O(1) window ratios and means
+        self.green_count = self._prefix(close > open_)
+        volume_present = ~np.isnan(volume)
+        self.volume_sum = self._prefix(np.where(volume_present, volume, 0.0))
+        self.volume_count = self._prefix(volume_present)
+        bar_range = high - low
+        range_present = ~np.isnan(bar_range)
+        self.range_sum = self._prefix(np.where(range_present, bar_range, 0.0))
+        self.range_count = self._prefix(range_present)
+        
+        # 10-day trend ending at each bar
+        self.trend_10 = np.full(self.length, np.nan)
+        self.trend_10[9:] = (close[9:] - close[:-9]) / close[:-9]
+        
+        # Swing highs: high above both neighbours
+        self.swing_high = np.zeros(self.length, dtype=bool)
+        self.swing_high[1:-1] = (high[1:-1] > high[:-2]) & (high[1:-1] > high[2:])
+        
+        # Bars holding the 20SMA (low within 3% above it and close above it)
+        if bars.sma20 is not None:
+            ma_valid = ~np.isnan(low) & ~np.isnan(bars.sma20)
+            ma_support = ma_valid & (low >= bars.sma20 * 0.97) & (close >= bars.sma20)
+            self.ma_valid_count = self._prefix(ma_valid)
+            self.ma_support_count = self._prefix(ma_support)
+        
+        # Bars "surfing" a moving average: low within 2% above it and close no more than 2% below it
+        if bars.sma10 is not None and bars.sma20 is not None and bars.sma50 is not None:
+            touches = np.zeros(self.length, dtype=bool)
+            for sma in (bars.sma10, bars.sma20, bars.sma50):
+                usable = ~np.isnan(sma) & (sma != 0)
+                touches |= usable & (low <= sma * 1.02) & (close >= sma * 0.98)
+            self.ma_touch_count = self._prefix(touches)
+        
+        self.low_min = RangeExtremum(low, 'min')
+        self.high_max = RangeExtremum(high, 'max')
+    
+    @staticmethod
+    def _prefix(values: np.ndarray) -> np.ndarray:
+        return np.concatenate(([0], np.cumsum(values)))
+    
+    def green_ratio(self, start: int, end: int) -> float:
+        """Share of green candles over start..end (inclusive)."""
+        return (self.green_count[end + 1] - self.green_count[start]) / (end + 1 - start)
+    
+    def mean_volume(self, start: int, end: int) -> float:
+        """Mean volume over start..end-1, skipping NaNs (NaN for an empty window)."""
+        count = self.volume_count[end] - self.volume_count[start]
+        return (self.volume_sum[end] - self.volume_sum[start]) / count if count > 0 else np.nan
+    
+    def prior_mean_volume(self, window: int) -> np.ndarray:
+        """Mean volume over the `window` bars before each bar (fewer at the start, NaN at bar 0)."""
+        end = np.arange(self.length)
+        start = np.maximum(0, end - window)
+        count = self.volume_count[end] - self.volume_count[start]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(count > 0, (self.volume_sum[end] - self.volume_sum[start]) / count, np.nan)
+    
+    def mean_range(self, start: int, end: int) -> float:
+        """Mean high-low range over start..end-1, skipping NaNs (NaN for an empty window)."""
+        count = self.range_count[end] - self.range_count[start]
+        return (self.range_sum[end] - self.range_sum[start]) / count if count > 0 else np.nan
+
+def check_average_daily_range(bars, breakout_idx, min_range_pct=None):
     """Check if daily range on breakout day meets minimum requirement."""
-    if breakout_idx >= len(df):
+    if breakout_idx >= len(bars):
         return False
         
     if min_range_pct is None:
         min_range_pct = CONFIG['min_daily_range_pct']
     
-    row = df.iloc[breakout_idx]
-    daily_range_pct = (row['high'] - row['low']) / row['open'] * 100
-    return daily_range_pct >= min_range_pct
+    return bars.features.daily_range_pct[breakout_idx] >= min_range_pct
 
 def format_date(ts):
     ts = pd.to_datetime(ts)
@@ -241,83 +476,144 @@ def log_file_operation(*args, **kwargs):
     """No-op stub for removed logging functionality - optimized for speed."""
     pass
 
-def write_json(path, df):
+OUTPUT_FIELDS = [('open', 'Open'), ('high', 'High'), ('low', 'Low'), ('close', 'Close'), ('volume', 'Volume'),
+                 ('10sma', '10sma'), ('20sma', '20sma'), ('50sma', '50sma')]
+
+class EncodedRecords:
+    """
+    Output records pre-encoded column by column.
+    
+    Each column holds the JSON text of its values, so writing only stitches rows
+    together. encode() produces the same bytes json.dump gives for the equivalent
+    list of dicts, pretty-printed with indent=4 or compact.
+    """
+    
+    __slots__ = ('keys', 'columns')
+    
+    def __init__(self, keys: List[str], columns: List[List[str]]):
+        self.keys = keys
+        self.columns = columns
+    
+    def __len__(self) -> int:
+        return len(self.columns[0]) if self.columns else 0
+    
+    def encode(self, compact: bool = False) -> str:
+        if len(self) == 0:
+            return '[]'
+        keys = [json.dumps(key) for key in self.keys]
+        if compact:
+            row = '{' + ','.join(f'{key}:%s' for key in keys) + '}'
+            head, sep, tail = '[', ',', ']'
+        else:
+            row = '    {\n' + ',\n'.join(f'        {key}: %s' for key in keys) + '\n    }'
+            head, sep, tail = '[\n', ',\n', '\n]'
+        return head + sep.join([row % values for values in zip(*self.columns)]) + tail
+
+def encode_float_column(values) -> List[str]:
+    """JSON text for a numeric column: float reprs, null for NaN; infinities are rejected like allow_nan=False."""
+    values = np.asarray(values, dtype=np.float64)
+    if np.isinf(values).any():
+        raise ValueError("Out of range float values are not JSON compliant")
+    encoded = list(map(float.__repr__, values.tolist()))
+    for pos in np.flatnonzero(np.isnan(values)):
+        encoded[pos] = 'null'
+    return encoded
+
+def encode_date_column(values) -> List[str]:
+    """JSON text for a date column: YYYY-MM-DD for timestamps, str() otherwise, null when missing."""
+    if isinstance(values, pd.DatetimeIndex) or pd.api.types.is_datetime64_any_dtype(values):
+        dates = pd.DatetimeIndex(values)
+        text = dates.strftime('%Y-%m-%d')
+        return ['null' if missing else f'"{day}"' for day, missing in zip(text, dates.isna())]
+    return [json.dumps(value if isinstance(value, str) else str(value)) if not pd.isna(value) else 'null'
+            for value in values]
+
+def serialize_json_payload(path, df):
+    """
+    Convert a points list or OHLCV window into the JSON-ready structure written to path.
+    
+    OHLCV windows are encoded column-wise into EncodedRecords; anything else is
+    returned as a plain structure for json.dump.
+    
+    Returns:
+        JSON-ready payload, or None if the window is empty or missing columns
+    """
+    if path.endswith("points.json"):
+        return [{"points": indicator} for indicator in df] if isinstance(df, list) else [{"points": str(df)}]
+    if not hasattr(df, 'columns'):
+        return df
+    
+    columns = {str(col).lower(): col for col in df.columns}
+    dates = None
+    if isinstance(df.index, pd.DatetimeIndex):
+        # reset_index() would turn the index into a column named after it ('index' when unnamed)
+        if str(df.index.name if df.index.name is not None else 'index').lower() == 'date':
+            dates = df.index
+    if dates is None and 'date' in columns:
+        dates = df[columns['date']]
+    
+    if not all(col in columns for col, _ in OUTPUT_FIELDS) or len(df) == 0:
+        return None
+    
+    keys = [key for _, key in OUTPUT_FIELDS]
+    encoded = [encode_float_column(df[columns[col]].to_numpy(dtype=np.float64, na_value=np.nan))
+               for col, _ in OUTPUT_FIELDS]
+    if dates is not None:
+        keys = ['Date'] + keys
+        encoded = [encode_date_column(dates)] + encoded
+    return EncodedRecords(keys, encoded)
+
+def write_temp_json(path_obj: Path, data, compact: Optional[bool] = None) -> Path:
+    """Dump data to a temporary file next to path_obj and return the temporary path."""
+    if compact is None:
+        compact = CONFIG.get('compact_json', False)
+    with tempfile.NamedTemporaryFile(mode='w', delete=False, dir=str(path_obj.parent),
+                                    prefix=f".{path_obj.stem}_", suffix=path_obj.suffix,
+                                    encoding='utf-8') as tmp_file:
+        if isinstance(data, EncodedRecords):
+            tmp_file.write(data.encode(compact))
+        elif compact:
+            json.dump(data, tmp_file, separators=(',', ':'), allow_nan=False)
+        else:
+            json.dump(data, tmp_file, indent=4, allow_nan=False)
+        tmp_file.flush()
+        return Path(tmp_file.name)
+
+def commit_temp_file(tmp_path: Path, path_obj: Path):
+    """Atomically move a temporary file into place."""
+    try:
+        os.replace(tmp_path, path_obj)
+    except OSError:
+        if path_obj.exists():
+            path_obj.unlink()
+            os.replace(tmp_path, path_obj)
+        else:
+            tmp_path.rename(path_obj)
+
+def write_json(path, df, compact: Optional[bool] = None):
     """Write data to JSON file - optimized for speed."""
     try:
         path_obj = Path(path)
         path_obj.parent.mkdir(parents=True, exist_ok=True)
         
-        if path.endswith("points.json"):
-            data_to_write = [{"points": indicator} for indicator in df] if isinstance(df, list) else [{"points": str(df)}]
-        else:
-            if hasattr(df, 'columns'):
-                df_copy = df.reset_index() if isinstance(df.index, pd.DatetimeIndex) else df.copy()
-                df_copy.columns = df_copy.columns.str.lower()
-                required_cols = ['open', 'high', 'low', 'close', 'volume', '10sma', '20sma', '50sma']
-                if 'date' in df_copy.columns:
-                    required_cols = ['date'] + required_cols
-                
-                if not all(col in df_copy.columns for col in required_cols):
-                    return False
-                
-                df_subset = df_copy[required_cols].copy()
-                df_subset = df_subset.where(pd.notnull(df_subset), None)
-                
-                if len(df_subset) == 0:
-                    return False
-                
-                records = df_subset.to_dict('records')
-                data_to_write = []
-                for r in records:
-                    record = {}
-                    if 'date' in r:
-                        date_val = r['date']
-                        record["Date"] = date_val.strftime('%Y-%m-%d') if isinstance(date_val, pd.Timestamp) else (str(date_val) if date_val is not None else None)
-                    record.update({
-                        "Open": float(r['open']) if r['open'] is not None and not pd.isna(r['open']) else None,
-                        "High": float(r['high']) if r['high'] is not None and not pd.isna(r['high']) else None,
-                        "Low": float(r['low']) if r['low'] is not None and not pd.isna(r['low']) else None,
-                        "Close": float(r['close']) if r['close'] is not None and not pd.isna(r['close']) else None,
-                        "Volume": float(r['volume']) if r['volume'] is not None and not pd.isna(r['volume']) else None,
-                        "10sma": float(r['10sma']) if r['10sma'] is not None and not pd.isna(r['10sma']) else None,
-                        "20sma": float(r['20sma']) if r['20sma'] is not None and not pd.isna(r['20sma']) else None,
-                        "50sma": float(r['50sma']) if r['50sma'] is not None and not pd.isna(r['50sma']) else None
-                    })
-                    data_to_write.append(record)
-            else:
-                data_to_write = df
+        data_to_write = serialize_json_payload(path, df)
+        if data_to_write is None:
+            return False
         
         # Simplified write - single attempt, no verification overhead
-        with tempfile.NamedTemporaryFile(mode='w', delete=False, dir=str(path_obj.parent),
-                                        prefix=f".{path_obj.stem}_", suffix=path_obj.suffix,
-                                        encoding='utf-8') as tmp_file:
-            json.dump(data_to_write, tmp_file, indent=4, allow_nan=False)
-            tmp_file.flush()
-            tmp_path = Path(tmp_file.name)
-        
-        try:
-            os.replace(tmp_path, path_obj)
-        except OSError:
-            if path_obj.exists():
-                path_obj.unlink()
-                os.replace(tmp_path, path_obj)
-            else:
-                tmp_path.rename(path_obj)
-        
+        commit_temp_file(write_temp_json(path_obj, data_to_write, compact), path_obj)
         return True
     except Exception as e:
         logger.error(f"Error writing {path}: {e}")
         return False
 
-
-
-def determine_performance_category(df, breakout_idx, cross_idx):
+def determine_performance_category(bars, breakout_idx, cross_idx):
     """Determine performance category based on price movement."""
-    if cross_idx >= len(df):
-        cross_idx = len(df) - 1
+    if cross_idx >= len(bars):
+        cross_idx = len(bars) - 1
     
-    breakout_price = df.iloc[breakout_idx]['open']
-    cross_close_price = df.iloc[cross_idx]['close']
+    breakout_price = bars.open[breakout_idx]
+    cross_close_price = bars.close[cross_idx]
     performance_pct = (cross_close_price - breakout_price) / breakout_price * 100
     
     if performance_pct <= -2.5:
@@ -328,36 +624,37 @@ def determine_performance_category(df, breakout_idx, cross_idx):
         return 3
     return 4
 
-def generate_indicators(data, breakout_idx, category):
+def generate_indicators(bars, breakout_idx, category):
     """
     Generate and score technical indicators for a breakout pattern.
     Returns only the 3 best-fitting indicators based on a comprehensive scoring metric.
     """
+    features = bars.features
     indicator_scores = {}
     
     # Higher Lows Pattern (increased priority - key consolidation pattern)
     if breakout_idx > 5:
-        pre_breakout = data.iloc[max(0, breakout_idx-20):breakout_idx]
-        if len(pre_breakout) >= 10:
-            recent_low = pre_breakout.iloc[-5:]['low'].min()
-            earlier_low = pre_breakout.iloc[-10:-5]['low'].min()
-            earliest_low = pre_breakout.iloc[:-10]['low'].min() if len(pre_breakout) > 10 else float('inf')
-            if recent_low > earlier_low * 1.01 and (len(pre_breakout) <= 10 or earlier_low > earliest_low * 1.005):
+        pre_start = max(0, breakout_idx-20)
+        if breakout_idx - pre_start >= 10:
+            recent_low = features.low_min.query(breakout_idx-5, breakout_idx-1)[0]
+            earlier_low = features.low_min.query(breakout_idx-10, breakout_idx-6)[0]
+            earliest_low = features.low_min.query(pre_start, breakout_idx-11)[0] if breakout_idx - pre_start > 10 else float('inf')
+            if recent_low > earlier_low * 1.01 and (breakout_idx - pre_start <= 10 or earlier_low > earliest_low * 1.005):
                 score = 90 + min(20, (recent_low / earlier_low - 1) * 1500)  # Increased from 85+15
                 indicator_scores["Higher Lows"] = score
     
     # Cup and Handle Pattern
     if breakout_idx > 30:
-        window = data.iloc[max(0, breakout_idx-50):breakout_idx]
-        if len(window) >= 30:
-            potential_cup = window.iloc[:-10]
-            potential_handle = window.iloc[-10:]
-            if len(potential_cup) >= 20:
-                cup_left = potential_cup.iloc[:len(potential_cup)//2]['high'].max()
-                cup_right = potential_cup.iloc[len(potential_cup)//2:]['high'].max()
-                cup_bottom = potential_cup['low'].min()
-                handle_low = potential_handle['low'].min()
-                handle_high = potential_handle['high'].max()
+        window_start = max(0, breakout_idx-50)
+        if breakout_idx - window_start >= 30:
+            handle_start = breakout_idx - 10
+            cup_mid = window_start + (handle_start - window_start) // 2
+            if handle_start - window_start >= 20:
+                cup_left = features.high_max.query(window_start, cup_mid-1)[0]
+                cup_right = features.high_max.query(cup_mid, handle_start-1)[0]
+                cup_bottom = features.low_min.query(window_start, handle_start-1)[0]
+                handle_low = features.low_min.query(handle_start, breakout_idx-1)[0]
+                handle_high = features.high_max.query(handle_start, breakout_idx-1)[0]
                 cup_symmetry = 0.8 <= cup_left/cup_right <= 1.25
                 cup_depth = (min(cup_left, cup_right) - cup_bottom) / min(cup_left, cup_right) >= 0.1
                 handle_shallowness = handle_low > cup_bottom * 1.03
@@ -367,24 +664,22 @@ def generate_indicators(data, breakout_idx, category):
                     indicator_scores["Cup and Handle"] = score
     
     # Uptrending Moving Averages
-    if breakout_idx > 20 and '20sma' in data.columns and '50sma' in data.columns:
-        sma20 = data['20sma'].iloc[breakout_idx]
-        sma20_10days_ago = data['20sma'].iloc[breakout_idx-10]
-        sma50 = data['50sma'].iloc[breakout_idx] if not pd.isna(data['50sma'].iloc[breakout_idx]) else 0
-        sma50_20days_ago = data['50sma'].iloc[breakout_idx-20] if breakout_idx >= 20 and not pd.isna(data['50sma'].iloc[breakout_idx-20]) else 0
+    if breakout_idx > 20 and bars.sma20 is not None and bars.sma50 is not None:
+        sma20 = bars.sma20[breakout_idx]
+        sma20_10days_ago = bars.sma20[breakout_idx-10]
+        sma50 = bars.sma50[breakout_idx] if not pd.isna(bars.sma50[breakout_idx]) else 0
+        sma50_20days_ago = bars.sma50[breakout_idx-20] if breakout_idx >= 20 and not pd.isna(bars.sma50[breakout_idx-20]) else 0
         if sma20 > sma20_10days_ago * 1.01 and (sma50 == 0 or sma50 > sma50_20days_ago * 1.005):
             score = 70 + ((sma20 / sma20_10days_ago - 1) * 500)
             indicator_scores["Uptrending MAs"] = score
     
     # Resistance Break
     if breakout_idx > 20:
-        lookback_window = data.iloc[max(0, breakout_idx-30):breakout_idx]
-        if len(lookback_window) >= 15:
-            swing_highs = []
-            for i in range(1, len(lookback_window)-1):
-                if (lookback_window.iloc[i]['high'] > lookback_window.iloc[i-1]['high'] and
-                    lookback_window.iloc[i]['high'] > lookback_window.iloc[i+1]['high']):
-                    swing_highs.append(lookback_window.iloc[i]['high'])
+        lookback_start = max(0, breakout_idx-30)
+        if breakout_idx - lookback_start >= 15:
+            # Swing highs strictly inside the lookback window (both neighbours in the window)
+            swing_slice = slice(lookback_start + 1, breakout_idx - 1)
+            swing_highs = bars.high[swing_slice][features.swing_high[swing_slice]].tolist()
             
             resistance_levels = []
             if swing_highs:
@@ -399,8 +694,8 @@ def generate_indicators(data, breakout_idx, category):
                 if len(current_cluster) >= 2:
                     resistance_levels.append(sum(current_cluster) / len(current_cluster))
             
-            if resistance_levels and breakout_idx < len(data):
-                breakout_close = data.iloc[breakout_idx]['close']
+            if resistance_levels and breakout_idx < len(bars):
+                breakout_close = bars.close[breakout_idx]
                 for level in resistance_levels:
                     if breakout_close > level * 1.01:
                         score = 80 + min(20, (breakout_close / level - 1) * 1000)
@@ -408,10 +703,10 @@ def generate_indicators(data, breakout_idx, category):
                         break
     
     # Volume Surge (reduced priority - consolidation patterns are more important)
-    if breakout_idx > 20 and breakout_idx < len(data):
-        short_term_avg = data.iloc[max(0, breakout_idx-10):breakout_idx]['volume'].mean()
-        longer_term_avg = data.iloc[max(0, breakout_idx-30):breakout_idx]['volume'].mean()
-        breakout_volume = data.iloc[breakout_idx]['volume']
+    if breakout_idx > 20 and breakout_idx < len(bars):
+        short_term_avg = features.mean_volume(max(0, breakout_idx-10), breakout_idx)
+        longer_term_avg = features.mean_volume(max(0, breakout_idx-30), breakout_idx)
+        breakout_volume = bars.volume[breakout_idx]
         if short_term_avg > 0 and longer_term_avg > 0:
             volume_ratio = min(breakout_volume / short_term_avg, breakout_volume / longer_term_avg)
             if breakout_volume > short_term_avg * 1.8 and breakout_volume > longer_term_avg * 1.5:
@@ -420,10 +715,10 @@ def generate_indicators(data, breakout_idx, category):
     
     # Volume Contraction (reduced priority)
     if breakout_idx > 15:
-        early_vol = data.iloc[max(0, breakout_idx-15):max(0, breakout_idx-8)]['volume'].mean()
-        late_vol = data.iloc[max(0, breakout_idx-7):breakout_idx]['volume'].mean()
+        early_vol = features.mean_volume(max(0, breakout_idx-15), max(0, breakout_idx-8))
+        late_vol = features.mean_volume(max(0, breakout_idx-7), breakout_idx)
         if early_vol > 0 and late_vol < early_vol * 0.85 and not pd.isna(early_vol) and not pd.isna(late_vol):
-            vol_data = data.iloc[max(0, breakout_idx-15):breakout_idx]['volume']
+            vol_data = bars.volume[max(0, breakout_idx-15):breakout_idx]
             if len(vol_data) >= 7:
                 days = np.arange(len(vol_data))
                 volume_slope = np.polyfit(days, vol_data, 1)[0]
@@ -433,11 +728,11 @@ def generate_indicators(data, breakout_idx, category):
     
     # Tight Consolidation (increased priority - key consolidation pattern)
     if breakout_idx > 10:
-        pre_breakout = data.iloc[max(0, breakout_idx-15):breakout_idx]
-        if len(pre_breakout) >= 7:
-            high = pre_breakout['high'].max()
-            low = pre_breakout['low'].min()
-            close_vals = pre_breakout['close'].values
+        pre_start = max(0, breakout_idx-15)
+        if breakout_idx - pre_start >= 7:
+            high = features.high_max.query(pre_start, breakout_idx-1)[0]
+            low = features.low_min.query(pre_start, breakout_idx-1)[0]
+            close_vals = bars.close[pre_start:breakout_idx]
             if low > 0:
                 range_pct = (high - low) / low
                 if len(close_vals) >= 10:
@@ -451,46 +746,42 @@ def generate_indicators(data, breakout_idx, category):
                     indicator_scores["Tight Consolidation"] = score
     
     # MA Support (increased priority - key consolidation pattern)
-    if breakout_idx > 20 and '20sma' in data.columns:
-        lows_near_ma = 0
-        total_checks = 0
-        for i in range(max(0, breakout_idx-15), breakout_idx):
-            if i < len(data) and not pd.isna(data.iloc[i]['low']) and not pd.isna(data.iloc[i]['20sma']):
-                total_checks += 1
-                ma_value = data.iloc[i]['20sma']
-                low_value = data.iloc[i]['low']
-                if low_value >= ma_value * 0.97 and data.iloc[i]['close'] >= ma_value:
-                    lows_near_ma += 1
+    if breakout_idx > 20 and bars.sma20 is not None:
+        support_start = max(0, breakout_idx-15)
+        total_checks = features.ma_valid_count[breakout_idx] - features.ma_valid_count[support_start]
+        lows_near_ma = features.ma_support_count[breakout_idx] - features.ma_support_count[support_start]
         if lows_near_ma >= 3 and total_checks > 0 and lows_near_ma / total_checks >= 0.4:
             score = 82 + (lows_near_ma / total_checks) * 40  # Increased from 68+30
             indicator_scores["MA Support"] = score
     
     # Above Key MAs
-    if breakout_idx > 50 and '20sma' in data.columns and '50sma' in data.columns and breakout_idx < len(data):
-        sma20 = data['20sma'].iloc[breakout_idx] if not pd.isna(data['20sma'].iloc[breakout_idx]) else 0
-        sma50 = data['50sma'].iloc[breakout_idx] if not pd.isna(data['50sma'].iloc[breakout_idx]) else 0
-        close_price = data['close'].iloc[breakout_idx]
+    if breakout_idx > 50 and bars.sma20 is not None and bars.sma50 is not None and breakout_idx < len(bars):
+        sma20 = bars.sma20[breakout_idx] if not pd.isna(bars.sma20[breakout_idx]) else 0
+        sma50 = bars.sma50[breakout_idx] if not pd.isna(bars.sma50[breakout_idx]) else 0
+        close_price = bars.close[breakout_idx]
         if sma20 > 0 and sma50 > 0 and close_price > sma20 * 1.02 and close_price > sma50 * 1.02 and sma20 > sma50:
             score = 72 + ((close_price / sma20 - 1) * 200)
             indicator_scores["Above Key MAs"] = score
     
     # Low Volatility (using price range instead of ATR)
     if breakout_idx > 28:
-        recent_period = data.iloc[max(0, breakout_idx-14):breakout_idx]
-        earlier_period = data.iloc[max(0, breakout_idx-28):max(0, breakout_idx-14)]
-        if len(recent_period) >= 10 and len(earlier_period) >= 10:
-            recent_range = (recent_period['high'] - recent_period['low']).mean()
-            earlier_range = (earlier_period['high'] - earlier_period['low']).mean()
+        recent_start = max(0, breakout_idx-14)
+        earlier_start = max(0, breakout_idx-28)
+        if breakout_idx - recent_start >= 10 and recent_start - earlier_start >= 10:
+            recent_range = features.mean_range(recent_start, breakout_idx)
+            earlier_range = features.mean_range(earlier_start, recent_start)
             if earlier_range > 0 and recent_range < earlier_range * 0.82:
                 score = 63 + ((earlier_range - recent_range) / earlier_range) * 100
                 indicator_scores["Low Volatility"] = score
     
     # Strong Close
-    if breakout_idx < len(data):
-        row = data.iloc[breakout_idx]
-        if row['open'] > 0:
-            candle_body_pct = (row['close'] - row['open']) / row['open'] * 100
-            close_to_high_pct = (row['high'] - row['close']) / row['high'] * 100
+    if breakout_idx < len(bars):
+        bar_open = bars.open[breakout_idx]
+        bar_close = bars.close[breakout_idx]
+        bar_high = bars.high[breakout_idx]
+        if bar_open > 0:
+            candle_body_pct = (bar_close - bar_open) / bar_open * 100
+            close_to_high_pct = (bar_high - bar_close) / bar_high * 100
             if candle_body_pct >= 2.0 and close_to_high_pct <= 0.5:
                 score = 78 + min(22, candle_body_pct * 2)
                 indicator_scores["Strong Close"] = score
@@ -527,113 +818,392 @@ def generate_indicators(data, breakout_idx, category):
     sorted_indicators = sorted(indicator_scores.items(), key=lambda x: x[1], reverse=True)
     return [ind for ind, score in sorted_indicators[:3]]
 
-def create_files(directory: str, data: pd.DataFrame, breakout_idx: int, cross_idx: int, 
-                 ticker: str, d_data: pd.DataFrame) -> bool:
-    """Create all necessary files for a breakout pattern."""
-    dir_path = Path(directory)
+def discard_breakout_files(dir_path: Path, tmp_paths: List[Path], committed: List[Path]):
+    """Remove a breakout's staged and already renamed files and its directory once it is empty."""
+    for path in tmp_paths + committed:
+        try:
+            path.unlink()
+        except OSError:
+            pass
     try:
-        dir_path.mkdir(parents=True, exist_ok=True)
-    except Exception:
-        return False
+        dir_path.rmdir()
+    except OSError:
+        pass
+
+def write_breakout_files(breakouts: List[dict], compact: Optional[bool] = None) -> Tuple[int, int, List[str]]:
+    """
+    Write the pending files of accepted breakouts (phase two of process_breakout).
     
-    category = determine_performance_category(data, breakout_idx, cross_idx)
-    applied_indicators = generate_indicators(data, breakout_idx, category)
+    Directories are created once per batch, every file is staged to a temporary
+    file first and the atomic renames run together at the end. A breakout whose
+    D.json or after.json cannot be written is dropped as a whole: its other files
+    and its directory are removed instead of leaving a partial sample behind.
     
-    points_path = dir_path / "points.json"
-    return write_json(str(points_path), applied_indicators)
+    Args:
+        breakouts: Breakout dictionaries returned by process_breakout
+        compact: Write compact JSON instead of indent=4 (default: CONFIG['compact_json'])
+        
+    Returns:
+        Tuple of (files_written, write_failures, output paths of breakouts dropped as integrity failures)
+    """
+    failures = 0
+    dropped = []
+    ready = set()
+    for dir_path in {Path(breakout['output_path']) for breakout in breakouts}:
+        try:
+            dir_path.mkdir(parents=True, exist_ok=True)
+            ready.add(dir_path)
+        except Exception as e:
+            logger.error(f"Error creating {dir_path}: {e}")
+    
+    # Per breakout: (directory, [(tmp_path, path, required)]), or None once it has been dropped
+    staged = []
+    for breakout in breakouts:
+        dir_path = Path(breakout['output_path'])
+        files = []
+        complete = True
+        for filename, payload, required in breakout.pop('pending_files', []):
+            path_obj = dir_path / filename
+            try:
+                if dir_path not in ready:
+                    raise OSError("directory unavailable")
+                data = serialize_json_payload(str(path_obj), payload)
+                if data is None:
+                    raise ValueError("no data to write")
+                files.append((write_temp_json(path_obj, data, compact), path_obj, required))
+            except Exception as e:
+                failures += 1
+                if required:
+                    logger.error(f"Error writing {path_obj}: {e}")
+                    complete = False
+                    break
+                logger.warning(f"Failed to write {filename} for {breakout['ticker']}")
+        if not complete:
+            dropped.append(breakout['output_path'])
+            discard_breakout_files(dir_path, [tmp_path for tmp_path, _, _ in files], [])
+            continue
+        staged.append((breakout, dir_path, files))
+    
+    written = 0
+    for breakout, dir_path, files in staged:
+        # Required files are renamed first so a failure leaves nothing of the breakout in place
+        files = sorted(files, key=lambda item: not item[2])
+        committed = []
+        for pos, (tmp_path, path_obj, required) in enumerate(files):
+            try:
+                commit_temp_file(tmp_path, path_obj)
+                committed.append(path_obj)
+            except Exception as e:
+                failures += 1
+                logger.error(f"Error writing {path_obj}: {e}")
+                if required:
+                    dropped.append(breakout['output_path'])
+                    discard_breakout_files(dir_path, [tmp for tmp, _, _ in files[pos:]], committed)
+                    committed = []
+                    break
+        written += len(committed)
+    return written, failures, dropped
 
-def create_files_with_category(directory: str, data: pd.DataFrame, breakout_idx: int, cross_idx: int, 
-                               forced_category: int, ticker: str, d_data: pd.DataFrame) -> bool:
-    """Create files with a forced category."""
-    dir_path = Path(directory)
-    try:
-        dir_path.mkdir(parents=True, exist_ok=True)
-    except Exception:
-        return False
+WRITER_METRIC_KEYS = ('breakouts_queued', 'writer_batches', 'files_written', 'write_failures', 'write_integrity_fail',
+                      'queue_depth_sum', 'queue_depth_max', 'flush_latency_sum', 'flush_latency_max')
+
+def merge_writer_metrics(target: dict, metrics: dict):
+    """Accumulate writer metrics into target (maxima are kept, dropped directories are collected, the rest is summed)."""
+    if metrics.get('dropped_dirs'):
+        target.setdefault('dropped_dirs', []).extend(metrics['dropped_dirs'])
+    for key in WRITER_METRIC_KEYS:
+        value = metrics.get(key, 0)
+        if key.endswith('_max'):
+            target[key] = max(target.get(key, 0), value)
+        else:
+            target[key] = target.get(key, 0) + value
+
+class BreakoutWriter:
+    """
+    Background writer stage for accepted breakouts.
+    
+    Detection hands breakouts to submit(), which blocks only while the bounded
+    queue is full. A small pool of threads drains the queue in batches through
+    write_breakout_files. With zero threads every breakout is written inline.
+    Queue depth (sampled at submit) and flush latency (submit to rename) are
+    tracked in metrics; output directories of breakouts dropped at write time are
+    collected in dropped_dirs.
+    """
     
-    applied_indicators = generate_indicators(data, breakout_idx, forced_category)
-    points_path = dir_path / "points.json"
-    return write_json(str(points_path), applied_indicators)
+    def __init__(self, threads: Optional[int] = None, queue_size: Optional[int] = None,
+                 batch_size: Optional[int] = None, compact: Optional[bool] = None):
+        self.threads = CONFIG.get('writer_threads', 2) if threads is None else threads
+        self.batch_size = max(1, CONFIG.get('writer_batch_size', 8) if batch_size is None else batch_size)
+        self.compact = CONFIG.get('compact_json', False) if compact is None else compact
+        self.metrics = dict.fromkeys(WRITER_METRIC_KEYS, 0)
+        self.dropped_dirs: List[str] = []
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=max(1, CONFIG.get('writer_queue_size', 64) if queue_size is None else queue_size))
+        self._workers = [
+            threading.Thread(target=self._run, name=f"breakout-writer-{i}", daemon=True)
+            for i in range(self.threads)
+        ]
+        for worker in self._workers:
+            worker.start()
+    
+    def submit(self, breakout: dict):
+        """Queue an accepted breakout for writing."""
+        depth = self._queue.qsize()
+        with self._lock:
+            self.metrics['breakouts_queued'] += 1
+            self.metrics['queue_depth_sum'] += depth
+            self.metrics['queue_depth_max'] = max(self.metrics['queue_depth_max'], depth)
+        item = (time.perf_counter(), breakout)
+        if self._workers:
+            self._queue.put(item)
+        else:
+            self._write_batch([item])
+    
+    def _run(self):
+        stop = False
+        while not stop:
+            item = self._queue.get()
+            batch = []
+            if item is None:
+                stop = True
+            else:
+                batch.append(item)
+            while not stop and len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                else:
+                    batch.append(item)
+            try:
+                if batch:
+                    self._write_batch(batch)
+            except Exception as e:
+                logger.error(f"Error in breakout writer: {e}")
+            finally:
+                for _ in range(len(batch) + (1 if stop else 0)):
+                    self._queue.task_done()
+    
+    def _write_batch(self, batch: list):
+        written, failures, dropped = write_breakout_files([breakout for _, breakout in batch], self.compact)
+        done = time.perf_counter()
+        latencies = [done - queued_at for queued_at, _ in batch]
+        with self._lock:
+            self.metrics['writer_batches'] += 1
+            self.metrics['files_written'] += written
+            self.metrics['write_failures'] += failures
+            self.metrics['write_integrity_fail'] += len(dropped)
+            self.dropped_dirs.extend(dropped)
+            self.metrics['flush_latency_sum'] += sum(latencies)
+            self.metrics['flush_latency_max'] = max(self.metrics['flush_latency_max'], max(latencies))
+    
+    def flush(self):
+        """Block until every queued breakout has been written."""
+        if self._workers:
+            self._queue.join()
+    
+    def drain_metrics(self) -> dict:
+        """Return the metrics (and 'dropped_dirs') gathered since the last call and reset them."""
+        with self._lock:
+            metrics = self.metrics
+            metrics['dropped_dirs'] = self.dropped_dirs
+            self.metrics = dict.fromkeys(WRITER_METRIC_KEYS, 0)
+            self.dropped_dirs = []
+        return metrics
+    
+    def close(self) -> dict:
+        """Flush, stop the writer threads and return the remaining metrics."""
+        self.flush()
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join()
+        self._workers = []
+        return self.drain_metrics()
+
+_writer: Optional[BreakoutWriter] = None
+
+def get_writer() -> BreakoutWriter:
+    """Return this process's breakout writer, starting it on first use."""
+    global _writer
+    if _writer is None:
+        _writer = BreakoutWriter()
+    return _writer
 
-def find_first_cross_below_sma(df, focus_idx, sma_period=20):
+def close_writer() -> dict:
+    """Close this process's breakout writer (if started) and return its metrics."""
+    global _writer
+    if _writer is None:
+        return {}
+    writer, _writer = _writer, None
+    return writer.close()
+
+class ForwardOutcomes:
+    """
+    Per-ticker forward-looking lookups shared by cross, success and category labeling.
+    
+    Every table is built lazily in one vectorized pass over the ticker's arrays, so
+    repeated outcome queries for different breakouts of the same ticker cost O(1):
+    - next close below an SMA from any bar
+    - last bar within a calendar-day horizon of any bar
+    - highest high (and its first position) over any bar range, via a sparse table
+    """
+    
+    def __init__(self, bars: Bars):
+        self.bars = bars
+        self.length = len(bars)
+        self._next_cross = {}
+        self._horizon_end = {}
+    
+    def next_cross_below(self, focus_idx: int, sma_period: int = 20) -> int:
+        """Index of the first close below the SMA after focus_idx (last index if none)."""
+        if focus_idx + 1 >= self.length:
+            return self.length - 1
+        if sma_period not in self._next_cross:
+            sma = getattr(self.bars, f'sma{sma_period}')
+            crosses = np.where(self.bars.close < sma, np.arange(self.length), self.length - 1)
+            self._next_cross[sma_period] = np.minimum.accumulate(crosses[::-1])[::-1]
+        return int(self._next_cross[sma_period][focus_idx + 1])
+    
+    def last_index_within(self, idx: int, days: int) -> int:
+        """Index of the last bar at most `days` calendar days after bar idx."""
+        if days not in self._horizon_end:
+            day = self.bars.day
+            self._horizon_end[days] = np.searchsorted(day, day + days, side='right') - 1
+        return int(self._horizon_end[days][idx])
+    
+    def highest_high(self, start: int, end: int) -> Tuple[float, int]:
+        """Highest high and its first position over bars start..end (inclusive)."""
+        return self.bars.features.high_max.query(start, end)
+
+def find_first_cross_below_sma(bars, focus_idx, sma_period=20):
     """Find the first index where price closes below the specified SMA."""
-    sma_col = f'{sma_period}sma'
-    if focus_idx + 1 >= len(df):
-        return len(df) - 1
-    cross = (df['close'].iloc[focus_idx + 1:] < df[sma_col].iloc[focus_idx + 1:])
-    if cross.any():
-        return df.index.get_loc(cross[cross].index[0])
-    return len(df) - 1
-
-def check_successful_breakout(df, breakout_idx, cross_idx):
+    return bars.outcomes.next_cross_below(focus_idx, sma_period)
+
+def check_successful_breakout(bars, breakout_idx, cross_idx):
     """Check if price rose 30% from breakout open before closing below 20SMA."""
-    if breakout_idx >= len(df) or breakout_idx < 0:
+    if breakout_idx >= len(bars) or breakout_idx < 0:
         return False, None
-        
-    breakout_open = df.iloc[breakout_idx]['open']
-    breakout_date = df.index[breakout_idx]
+    outcomes = bars.outcomes
     
-    if cross_idx >= len(df):
-        cross_idx = len(df) - 1
+    breakout_open = bars.open[breakout_idx]
+    
+    if cross_idx >= len(bars):
+        cross_idx = len(bars) - 1
     
     max_days = 70
-    dates_after = [d for d in df.index if d > breakout_date and (d - breakout_date).days <= max_days]
-    if not dates_after:
+    max_idx = outcomes.last_index_within(breakout_idx, max_days)
+    if max_idx <= breakout_idx:
         return False, None
     
-    last_day = dates_after[-1]
-    max_idx = df.index.get_loc(last_day)
     end_idx = min(cross_idx, max_idx)
-    
-    segment = df.iloc[breakout_idx:end_idx+1]
-    if segment.empty:
+    if end_idx < breakout_idx:
         return False, None
     
-    highest_price = segment['high'].max()
-    highest_date = segment['high'].idxmax()
+    highest_price, highest_idx = outcomes.highest_high(breakout_idx, end_idx)
     gain_pct = (highest_price - breakout_open) / breakout_open
     
-    return gain_pct >= 0.30, highest_date
+    return gain_pct >= 0.30, bars.dates[highest_idx]
 
-def find_big_move(df, end_date, min_days=30, min_daily_pct=1.5):
-    """Find upward price movement averaging at least min_daily_pct per day over min_days."""
+def compute_segment_metrics(bars: Bars, start_idx: int, high_idx: int) -> dict:
+    """
+    Compute big-move segment metrics for every start position at once.
+    
+    Segment i spans bars start_idx+i..high_idx (inclusive). Suffix sums and reverse
+    cumulative maxima give each segment's statistics without re-slicing the window
+    for every start.
+    
+    Args:
+        bars: Ticker bars
+        start_idx: First bar of the lookback window
+        high_idx: Bar of the high that ends every segment
+        
+    Returns:
+        Dictionary of arrays indexed by window-relative start position (length high_idx - start_idx)
+    """
+    high_loc = high_idx - start_idx
+    close = bars.close[start_idx:high_idx + 1]
+    high = bars.high[start_idx:high_idx + 1]
+    volume = bars.volume[start_idx:high_idx + 1]
+    seg_len = high_loc + 1 - np.arange(high_loc)
+    
+    # Start at the CLOSE of day i, end at the HIGH of the high day
+    start_price = close[:high_loc]
+    total_pct = (high[high_loc] - start_price) / start_price * 100
+    days = np.maximum(1, bars.day[high_idx] - bars.day[start_idx:high_idx])
+    simple_avg_daily_pct = total_pct / days
+    
+    # Up-day count for every suffix (close[j] > close[j-1] for j in i+1..high_loc)
+    up_days = close[1:] > close[:-1]
+    price_increases = np.cumsum(up_days[::-1])[::-1]
+    price_increase_ratio = price_increases / (seg_len - 1)
+    
+    # Largest single-day gain in highs for every suffix
+    high_gains = high[1:] / high[:-1] - 1
+    max_single_day_gain = np.fmax.accumulate(high_gains[::-1])[::-1] * 100
+    with np.errstate(divide='ignore', invalid='ignore'):
+        max_day_contribution = np.where(total_pct > 0, max_single_day_gain / total_pct, 1.0)
+    
+    # Mean volume per suffix, then count days above 1.2x that mean
+    volume_present = ~np.isnan(volume)
+    volume_sum = np.cumsum(np.where(volume_present, volume, 0.0)[::-1])[::-1][:high_loc]
+    volume_count = np.cumsum(volume_present[::-1])[::-1][:high_loc]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        avg_volume = volume_sum / volume_count
+    in_segment = np.arange(high_loc + 1)[None, :] >= np.arange(high_loc)[:, None]
+    high_volume_days = ((volume[None, :] > avg_volume[:, None] * 1.2) & in_segment).sum(axis=1)
+    high_volume_ratio = high_volume_days / seg_len
+    
+    return {
+        'seg_len': seg_len,
+        'start_price': start_price,
+        'total_pct': total_pct,
+        'days': days,
+        'simple_avg_daily_pct': simple_avg_daily_pct,
+        'price_increase_ratio': price_increase_ratio,
+        'max_day_contribution': max_day_contribution,
+        'high_volume_ratio': high_volume_ratio
+    }
+
+def find_big_move(bars, end_idx, min_days=30, min_daily_pct=1.5):
+    """
+    Find upward price movement averaging at least min_daily_pct per day over min_days.
+    
+    Returns:
+        Tuple of (found, move_start_idx, high_idx, total_pct)
+    """
     try:
-        ticker = None
-        try:
-            # Try to extract ticker from dataframe if available for logging
-            if hasattr(df, 'name'):
-                ticker = df.name
-        except:
-            pass
-            
-        end_idx = df.index.get_loc(end_date)
+        ticker = bars.name
+        end_date = bars.dates[end_idx]
         
         # Look back at most max_lookback_days days to find the start of the uptrend (from CONFIG)
         max_lookback = CONFIG['max_lookback_days']
         start_idx = max(0, end_idx - max_lookback)
-        
-        window = df.iloc[start_idx:end_idx + 1]
+        window_size = end_idx + 1 - start_idx
+        features = bars.features
         
         if CONFIG.get('verbosity', 0) >= 2:
             logger.debug(
                 f"[BIG_MOVE] {ticker or 'unknown'} {end_date.date()}: Initial setup | "
                 f"end_idx={end_idx} | start_idx={start_idx} | max_lookback={max_lookback} | "
-                f"window_size={len(window)} | min_days={min_days} | min_daily_pct={min_daily_pct}"
+                f"window_size={window_size} | min_days={min_days} | min_daily_pct={min_daily_pct}"
             )
         
         # If not enough data, return False
-        if len(window) < min_days:
+        if window_size < min_days:
             if CONFIG.get('verbosity', 0) >= 1:
                 logger.debug(
                     f"[BIG_MOVE] {ticker or 'unknown'} {end_date.date()}: Not enough data - "
-                    f"{len(window)} days, need {min_days}"
+                    f"{window_size} days, need {min_days}"
                 )
             return False, None, None, 0
         
         # Find the high before the breakout
-        high_price = window['high'].max()
-        high_date = window['high'].idxmax()
-        high_loc = window.index.get_loc(high_date)
+        high_price, high_idx = features.high_max.query(start_idx, end_idx)
+        high_loc = high_idx - start_idx
+        high_date = bars.dates[high_idx]
         
         if CONFIG.get('verbosity', 0) >= 2:
             logger.debug(
@@ -642,13 +1212,12 @@ def find_big_move(df, end_date, min_days=30, min_daily_pct=1.5):
             )
         
         # If high is at the end of the window (at the breakout date), find the previous high
-        if high_loc >= len(window) - 3:
+        if high_loc >= window_size - 3:
             # Use the window excluding the last 3 days
-            prev_window = window.iloc[:-3]
-            if not prev_window.empty:
-                high_price = prev_window['high'].max()
-                high_date = prev_window['high'].idxmax()
-                high_loc = window.index.get_loc(high_date)
+            if window_size > 3:
+                high_price, high_idx = features.high_max.query(start_idx, end_idx - 3)
+                high_loc = high_idx - start_idx
+                high_date = bars.dates[high_idx]
                 if CONFIG.get('verbosity', 0) >= 2:
                     logger.debug(
                         f"[BIG_MOVE] {ticker or 'unknown'} {end_date.date()}: High at end, using previous | "
@@ -660,7 +1229,7 @@ def find_big_move(df, end_date, min_days=30, min_daily_pct=1.5):
             if CONFIG.get('verbosity', 0) >= 1:
                 logger.debug(
                     f"[BIG_MOVE] {ticker or 'unknown'} {end_date.date()}: High point too early "
-                    f"(position {high_loc} <= 3) | window_size={len(window)} | "
+                    f"(position {high_loc} <= 3) | window_size={window_size} | "
                     f"high_date={high_date.date()} | end_date={end_date.date()}"
                 )
             return False, None, None, 0
@@ -673,7 +1242,7 @@ def find_big_move(df, end_date, min_days=30, min_daily_pct=1.5):
             if CONFIG.get('verbosity', 0) >= 1:
                 logger.debug(
                     f"[BIG_MOVE] {ticker or 'unknown'} {end_date.date()}: No check_indices (high_loc={high_loc} <= 0) | "
-                    f"window_size={len(window)} | high_date={high_date.date()}"
+                    f"window_size={window_size} | high_date={high_date.date()}"
                 )
             return False, None, None, 0
         
@@ -695,7 +1264,6 @@ def find_big_move(df, end_date, min_days=30, min_daily_pct=1.5):
         
         # Track best candidate for logging
         best_candidate = None
-        best_score = -1
         
         log_details = {
             'ticker': ticker or 'unknown',
@@ -703,7 +1271,7 @@ def find_big_move(df, end_date, min_days=30, min_daily_pct=1.5):
             'high_date': str(high_date.date()),
             'high_price': high_price,
             'high_loc': high_loc,
-            'window_size': len(window),
+            'window_size': window_size,
             'check_indices_count': len(check_indices),
             'min_total_gain': min_total_gain,
             'max_total_gain': max_total_gain,
@@ -715,100 +1283,47 @@ def find_big_move(df, end_date, min_days=30, min_daily_pct=1.5):
         if CONFIG.get('verbosity', 0) >= 2:
             logger.debug(f"[BIG_MOVE] {ticker or 'unknown'} {end_date.date()}: Starting evaluation | {log_details}")
         
-        for i in check_indices:
-            segment = window.iloc[i:high_loc+1]
-            if len(segment) < min_days:
-                continue
-            
-            # Get start and end prices - use CLOSE price for start and HIGH for end
-            start_price = segment.iloc[0]['close']
-            end_price = segment.iloc[-1]['high']
-            start_date_seg = segment.index[0]
-            
-            # Calculate total percentage gain
-            total_pct = (end_price - start_price) / start_price * 100
-            
-            # Calculate days and average daily percentage
-            days = max(1, (segment.index[-1] - segment.index[0]).days)
-            simple_avg_daily_pct = total_pct / days if days > 0 else 0
-            
-            # Basic quality checks
-            price_increases = (segment['close'] > segment['close'].shift(1)).sum()
-            price_increase_ratio = price_increases / (len(segment) - 1) if len(segment) > 1 else 0
-            
-            # Check for single-day spikes
-            max_single_day_gain = segment['high'].pct_change().max() * 100 if len(segment) > 1 else 0
-            max_day_contribution = max_single_day_gain / total_pct if total_pct > 0 else 1.0
-            
-            # Volume check
-            avg_volume = segment['volume'].mean()
-            high_volume_days = (segment['volume'] > avg_volume * 1.2).sum()
-            high_volume_ratio = high_volume_days / len(segment) if len(segment) > 0 else 0
-            
-            # Quality metrics - slightly relaxed to find more patterns
-            consistent_uptrend = price_increase_ratio >= 0.4  # Changed from 0.5
-            not_just_spike = max_day_contribution <= 0.6  # Changed from 0.5
-            decent_volume = high_volume_ratio >= 0.25  # Changed from 0.3
-            
-            # Check each validation criterion
-            # Qullamaggie: Big move should be 30-100%+ and last a few days to a few weeks
-            # Limit to max 3 months (90 days) for the big move itself
-            total_gain_ok = min_total_gain <= total_pct <= max_total_gain
-            avg_daily_ok = simple_avg_daily_pct >= min_daily_pct * 0.8
-            days_ok = min_days <= days <= 90  # Big move should be a few days to a few weeks (max ~3 months)
-            quality_ok = (consistent_uptrend + not_just_spike + decent_volume >= 1)
-            
-            # Simplified validation criteria - must meet total gain within range and average daily move
-            valid_segment = (
-                total_gain_ok and
-                avg_daily_ok and 
-                days_ok and
-                quality_ok
-            )
-            
-            # Track best candidate (highest total_pct that meets some criteria)
-            candidate_score = total_pct if total_pct > 0 else -1
-            if candidate_score > best_score:
-                best_score = candidate_score
-                best_candidate = {
-                    'start_date': str(start_date_seg.date()),
-                    'start_price': start_price,
-                    'end_price': end_price,
-                    'total_pct': total_pct,
-                    'days': days,
-                    'simple_avg_daily_pct': simple_avg_daily_pct,
-                    'price_increase_ratio': price_increase_ratio,
-                    'max_day_contribution': max_day_contribution,
-                    'high_volume_ratio': high_volume_ratio,
-                    'total_gain_ok': total_gain_ok,
-                    'avg_daily_ok': avg_daily_ok,
-                    'days_ok': days_ok,
-                    'quality_ok': quality_ok,
-                    'consistent_uptrend': consistent_uptrend,
-                    'not_just_spike': not_just_spike,
-                    'decent_volume': decent_volume,
-                    'valid': valid_segment
-                }
-            
-            # Log detailed info for each segment if verbose
-            if CONFIG.get('verbosity', 0) >= 2:
+        # Evaluate every start position in one pass
+        metrics = compute_segment_metrics(bars, start_idx, high_idx)
+        total_pct = metrics['total_pct']
+        days = metrics['days']
+        evaluated = metrics['seg_len'] >= min_days
+        
+        # Quality metrics - slightly relaxed to find more patterns
+        consistent_uptrend = metrics['price_increase_ratio'] >= 0.4  # Changed from 0.5
+        not_just_spike = metrics['max_day_contribution'] <= 0.6  # Changed from 0.5
+        decent_volume = metrics['high_volume_ratio'] >= 0.25  # Changed from 0.3
+        
+        # Qullamaggie: Big move should be 30-100%+ and last a few days to a few weeks
+        # Limit to max 3 months (90 days) for the big move itself
+        total_gain_ok = (min_total_gain <= total_pct) & (total_pct <= max_total_gain)
+        avg_daily_ok = metrics['simple_avg_daily_pct'] >= min_daily_pct * 0.8
+        days_ok = (min_days <= days) & (days <= 90)  # Big move should be a few days to a few weeks (max ~3 months)
+        quality_ok = consistent_uptrend | not_just_spike | decent_volume
+        
+        # Simplified validation criteria - must meet total gain within range and average daily move
+        valid_segment = evaluated & total_gain_ok & avg_daily_ok & days_ok & quality_ok
+        valid_starts = np.flatnonzero(valid_segment)
+        if len(valid_starts) > 0:
+            first_valid_idx = int(valid_starts[0])
+            valid_total_pct = total_pct[first_valid_idx]
+        
+        # Log detailed info for each segment up to the first valid one if verbose
+        if CONFIG.get('verbosity', 0) >= 2:
+            last_logged = first_valid_idx if first_valid_idx is not None else high_loc - 1
+            for i in np.flatnonzero(evaluated[:last_logged + 1]):
                 logger.debug(
                     f"[BIG_MOVE] {ticker or 'unknown'} {end_date.date()}: Segment {i}->{high_loc} "
-                    f"| start={start_date_seg.date()} | total_pct={total_pct:.2f}% | "
-                    f"avg_daily={simple_avg_daily_pct:.3f}% | days={days} | "
-                    f"gain_ok={total_gain_ok} | daily_ok={avg_daily_ok} | days_ok={days_ok} | "
-                    f"quality_ok={quality_ok} | valid={valid_segment}"
+                    f"| start={bars.dates[start_idx + i].date()} | total_pct={total_pct[i]:.2f}% | "
+                    f"avg_daily={metrics['simple_avg_daily_pct'][i]:.3f}% | days={days[i]} | "
+                    f"gain_ok={total_gain_ok[i]} | daily_ok={avg_daily_ok[i]} | days_ok={days_ok[i]} | "
+                    f"quality_ok={quality_ok[i]} | valid={valid_segment[i]}"
+                )
+            if first_valid_idx is not None:
+                logger.debug(
+                    f"[BIG_MOVE] {ticker or 'unknown'} {end_date.date()}: VALID SEGMENT FOUND! "
+                    f"start_idx={first_valid_idx} | total_pct={valid_total_pct:.2f}% | days={days[first_valid_idx]}"
                 )
-            
-            if valid_segment:
-                first_valid_idx = i
-                valid_total_pct = total_pct
-                if CONFIG.get('verbosity', 0) >= 2:
-                    logger.debug(
-                        f"[BIG_MOVE] {ticker or 'unknown'} {end_date.date()}: VALID SEGMENT FOUND! "
-                        f"start_idx={i} | total_pct={total_pct:.2f}% | days={days}"
-                    )
-                break
         
         # If we found a valid starting point, look for the local minimum after it
         if first_valid_idx is not None:
@@ -818,33 +1333,29 @@ def find_big_move(df, end_date, min_days=30, min_daily_pct=1.5):
             
             # Find the lowest low in the period after the first valid point
             if search_end > first_valid_idx:
-                search_segment = window.iloc[first_valid_idx:search_end+1]
-                if not search_segment.empty:
-                    min_idx = search_segment['low'].idxmin()
-                    min_loc = window.index.get_loc(min_idx)
+                search_lows = bars.low[start_idx + first_valid_idx:start_idx + search_end + 1]
+                if len(search_lows) > 0:
+                    min_loc = first_valid_idx + int(np.nanargmin(search_lows))
                     
                     # Use this minimum as our starting point if it creates a valid segment
                     if min_loc < high_loc - min_days:  # Ensure enough days left for uptrend
-                        min_to_high_segment = window.iloc[min_loc:high_loc+1]
-                        days_in_segment = max(1, (min_to_high_segment.index[-1] - min_to_high_segment.index[0]).days)
+                        days_in_segment = max(1, int(bars.day[high_idx] - bars.day[start_idx + min_loc]))
                         
                         if days_in_segment >= min_days:
                             # We've found our local minimum after the first valid point
-                            start_date = window.index[min_loc]
-                            days_in_uptrend = max(1, (high_date - start_date).days)
                             if CONFIG.get('verbosity', 0) > 1:
                                 logger.debug(f"{ticker} {end_date.date()}: Found local minimum after valid point")
-                            return True, start_date, high_date, valid_total_pct
+                            return True, start_idx + min_loc, high_idx, valid_total_pct
             
             # If we couldn't find a suitable local minimum, use the original first valid point
-            start_date = window.index[first_valid_idx]
-            days_in_uptrend = max(1, (high_date - start_date).days)
+            move_start_idx = start_idx + first_valid_idx
+            days_in_uptrend = max(1, int(bars.day[high_idx] - bars.day[move_start_idx]))
             if CONFIG.get('verbosity', 0) > 1:
                 logger.debug(f"{ticker} {end_date.date()}: Valid uptrend - {valid_total_pct:.2f}% over {days_in_uptrend} days")
-            return True, start_date, high_date, valid_total_pct
+            return True, move_start_idx, high_idx, valid_total_pct
         
         # Log summary of evaluation
-        segments_evaluated = sum(1 for i in check_indices if len(window.iloc[i:high_loc+1]) >= min_days)
+        segments_evaluated = int(evaluated.sum())
         if CONFIG.get('verbosity', 0) >= 2:
             logger.debug(
                 f"[BIG_MOVE] {ticker or 'unknown'} {end_date.date()}: Evaluation complete | "
@@ -854,6 +1365,29 @@ def find_big_move(df, end_date, min_days=30, min_daily_pct=1.5):
         
         # Log failure with best candidate details
         if first_valid_idx is None:
+            # Best candidate is the first evaluated segment with the highest positive gain
+            candidate_scores = np.where(evaluated & (total_pct > 0), total_pct, -1)
+            i = int(np.argmax(candidate_scores))
+            if candidate_scores[i] > -1:
+                best_candidate = {
+                    'start_date': str(bars.dates[start_idx + i].date()),
+                    'start_price': metrics['start_price'][i],
+                    'end_price': bars.high[high_idx],
+                    'total_pct': total_pct[i],
+                    'days': days[i],
+                    'simple_avg_daily_pct': metrics['simple_avg_daily_pct'][i],
+                    'price_increase_ratio': metrics['price_increase_ratio'][i],
+                    'max_day_contribution': metrics['max_day_contribution'][i],
+                    'high_volume_ratio': metrics['high_volume_ratio'][i],
+                    'total_gain_ok': total_gain_ok[i],
+                    'avg_daily_ok': avg_daily_ok[i],
+                    'days_ok': days_ok[i],
+                    'quality_ok': quality_ok[i],
+                    'consistent_uptrend': consistent_uptrend[i],
+                    'not_just_spike': not_just_spike[i],
+                    'decent_volume': decent_volume[i],
+                    'valid': valid_segment[i]
+                }
             failure_reasons = []
             if best_candidate:
                 if not best_candidate['total_gain_ok']:
@@ -913,34 +1447,29 @@ def find_big_move(df, end_date, min_days=30, min_daily_pct=1.5):
         logger.error(f"Error in find_big_move: {e}")
         return False, None, None, 0
 
-def check_pattern_quality(df, start_idx, end_idx):
+def check_pattern_quality(bars, start_idx, end_idx):
     """Check if pattern has enough data points."""
     return end_idx - start_idx >= 4
 
-def check_price_within_range(df, high_date, breakout_date):
+def check_price_within_range(bars, high_idx, breakout_idx):
     """Check if price stays within allowed range from high to breakout."""
-    high_idx = df.index.get_loc(high_date)
-    breakout_idx = df.index.get_loc(breakout_date)
     if high_idx >= breakout_idx:
         return False
     
-    high_price = df.iloc[high_idx]['high']
-    cons_low = df.iloc[high_idx:breakout_idx+1]['low'].min()
+    high_price = bars.high[high_idx]
+    cons_low = bars.features.low_min.query(high_idx, breakout_idx)[0]
     drop_pct = (high_price - cons_low) / high_price
     return drop_pct <= CONFIG['max_consolidation_drop']
 
-def check_price_within_range_relaxed(df, high_date, breakout_date, max_drop=0.30):
+def check_price_within_range_relaxed(bars, high_idx, breakout_idx, max_drop=0.30):
     """Check if price stays within specified range from high to breakout"""
     try:
-        high_idx = df.index.get_loc(high_date)
-        breakout_idx = df.index.get_loc(breakout_date)
-        
         if high_idx >= breakout_idx:
             return False
         
-        high_price = df.iloc[high_idx]['high']
+        high_price = bars.high[high_idx]
         # Find lowest price between high and breakout
-        cons_low = df.iloc[high_idx:breakout_idx+1]['low'].min()
+        cons_low = bars.features.low_min.query(high_idx, breakout_idx)[0]
         
         # Calculate the drop from high to consolidation low
         drop_pct = (high_price - cons_low) / high_price
@@ -951,14 +1480,14 @@ def check_price_within_range_relaxed(df, high_date, breakout_date, max_drop=0.30
         logger.error(f"Error in check_price_within_range_relaxed: {e}")
         return False
 
-def check_consolidation_tightness(df, high_date, breakout_date, max_drop=None, exception_threshold=None, max_exception_days=None):
+def check_consolidation_tightness(bars, high_idx, breakout_idx, max_drop=None, exception_threshold=None, max_exception_days=None):
     """
     Check if price stays within specified range during consolidation, allowing for brief exceptions.
     
     Args:
-        df: Price dataframe
-        high_date: Date of the high before consolidation
-        breakout_date: Date of the breakout
+        bars: Ticker bars
+        high_idx: Bar of the high before consolidation
+        breakout_idx: Bar of the breakout
         max_drop: Maximum allowed drop from high (default: from CONFIG)
         exception_threshold: Threshold for brief exceptions (default: from CONFIG)
         max_exception_days: Maximum days allowed for brief exceptions (default: from CONFIG)
@@ -972,28 +1501,20 @@ def check_consolidation_tightness(df, high_date, breakout_date, max_drop=None, e
         exception_threshold = exception_threshold if exception_threshold is not None else CONFIG['exception_threshold']
         max_exception_days = max_exception_days if max_exception_days is not None else CONFIG['max_exception_days']
         
-        high_idx = df.index.get_loc(high_date)
-        breakout_idx = df.index.get_loc(breakout_date)
-        
         if high_idx >= breakout_idx:
             return False, 0, 0
         
         # Get consolidation segment
-        consolidation = df.iloc[high_idx:breakout_idx+1]
-        if len(consolidation) < 3:  # Too short to analyze properly
+        if breakout_idx - high_idx + 1 < 3:  # Too short to analyze properly
             return False, 0, 0
             
-        high_price = consolidation.iloc[0]['high']
+        high_price = bars.high[high_idx]
         
         # Calculate daily drops from the high for each day
-        daily_drops = []
-        for i in range(len(consolidation)):
-            day_low = consolidation.iloc[i]['low']
-            drop_pct = (high_price - day_low) / high_price
-            daily_drops.append(drop_pct)
+        daily_drops = (high_price - bars.low[high_idx:breakout_idx+1]) / high_price
         
         # Find the maximum drop during consolidation
-        max_drop_pct = max(daily_drops)
+        max_drop_pct = float(daily_drops.max())
         
         # Check if the maximum drop exceeds our threshold
         if max_drop_pct <= max_drop:
@@ -1001,10 +1522,10 @@ def check_consolidation_tightness(df, high_date, breakout_date, max_drop=None, e
             return True, max_drop_pct, 0
         
         # Count days that exceed the regular threshold but are below exception threshold
-        exception_days = sum(1 for drop in daily_drops if max_drop < drop <= exception_threshold)
+        exception_days = int(((daily_drops > max_drop) & (daily_drops <= exception_threshold)).sum())
         
         # Count days that exceed even the exception threshold
-        severe_violation_days = sum(1 for drop in daily_drops if drop > exception_threshold)
+        severe_violation_days = int((daily_drops > exception_threshold).sum())
         
         # Allow pattern if:
         # 1. Exception days are within allowed limit
@@ -1017,9 +1538,8 @@ def check_consolidation_tightness(df, high_date, breakout_date, max_drop=None, e
         logger.error(f"Error in check_consolidation_tightness: {e}")
         return False, 0, 0
 
-
 def evaluate_candidate(
-    df: pd.DataFrame,
+    bars: Bars,
     idx: int,
     existing_breakouts: List[dict],
     ticker: str,
@@ -1027,57 +1547,52 @@ def evaluate_candidate(
     debug_enabled: bool
 ) -> Optional[dict]:
     """Evaluate a breakout candidate using all filters at once."""
-    focus_date = df.index[idx]
-    date_str = focus_date.strftime('%Y-%m-%d')
+    features = bars.features
+    log_enabled = debug_enabled or CONFIG.get('verbosity', 0) > 1
     
     def log_debug(message: str):
-        if debug_enabled or CONFIG.get('verbosity', 0) > 1:
+        if log_enabled:
             logger.debug(message)
     
     def fail(reason_key: Optional[str], message: str):
         if reason_key and reason_key in stats:
             stats[reason_key] += 1
-        log_debug(f"{ticker} {date_str}: {message}")
+        if log_enabled:
+            logger.debug(f"{ticker} {bars.dates[idx].strftime('%Y-%m-%d')}: {message}")
         return None
     
     # Recent candle distribution
     window_start = max(0, idx - 20)
-    recent_window = df.iloc[window_start:idx+1]
-    green_ratio = (recent_window['close'] > recent_window['open']).sum() / len(recent_window)
+    green_ratio = features.green_ratio(window_start, idx)
     if green_ratio > 0.85:
         return fail('green_candle_filter', f"Rejected - green candle ratio {green_ratio:.2f} > 0.85")
     
     # Breakout day must be meaningfully above prior high
     if idx > 0:
-        prev_high = df.iloc[idx-1]['high']
-        current_high = df.iloc[idx]['high']
+        prev_high = bars.high[idx-1]
+        current_high = bars.high[idx]
         if prev_high and current_high <= prev_high * 1.005:
             return fail('initial_filter', f"Rejected - breakout high only {(current_high/prev_high-1)*100:.2f}% above previous")
     
     # Ensure recent trend has positive slope
     if idx >= 10:
-        recent_10 = df.iloc[idx-9:idx+1]
-        price_trend = (recent_10['close'].iloc[-1] - recent_10['close'].iloc[0]) / recent_10['close'].iloc[0]
+        price_trend = features.trend_10[idx]
         if price_trend < 0.03:
             return fail('initial_filter', f"Rejected - 10 day trend {price_trend*100:.2f}% < 3%")
     
     # Confirm big move (step 1)
-    found_move, move_start_date, high_date, move_pct = find_big_move(
-        df,
-        focus_date,
+    found_move, move_start_idx, high_point_idx, move_pct = find_big_move(
+        bars,
+        idx,
         min_days=CONFIG['min_uptrend_days'],
         min_daily_pct=CONFIG['min_daily_uptrend_pct']
     )
-    if not found_move or move_start_date is None or high_date is None:
+    if not found_move or move_start_idx is None or high_point_idx is None:
         return fail('big_move_filter', f"Rejected - no qualifying big move (move_pct={move_pct:.2f}%)")
     
-    move_start_idx = df.index.get_loc(move_start_date)
-    segment = df.iloc[move_start_idx:idx+1]
-    high_point_idx = df.index.get_loc(high_date)
-    
     # Time since high (ensure orderly consolidation)
     # Qullamaggie: Consolidation phase is usually 2 weeks to 2 months
-    days_from_high = (focus_date - df.index[high_point_idx]).days
+    days_from_high = int(bars.day[idx] - bars.day[high_point_idx])
     min_consolidation_days = CONFIG.get('min_days_from_high', 14)
     max_consolidation_days = CONFIG.get('max_days_from_high', 60)
     if days_from_high < min_consolidation_days:
@@ -1086,41 +1601,39 @@ def evaluate_candidate(
         return fail('time_filter', f"Rejected - {days_from_high} days since high (need <= {max_consolidation_days})")
     
     # Consolidation tightness
-    within_range = check_price_within_range(df, df.index[high_point_idx], focus_date)
+    within_range = check_price_within_range(bars, high_point_idx, idx)
     if not within_range:
         within_range = check_price_within_range_relaxed(
-            df,
-            df.index[high_point_idx],
-            focus_date,
+            bars,
+            high_point_idx,
+            idx,
             max_drop=min(CONFIG['max_consolidation_drop'] + 0.05, 0.5)
         )
     if not within_range:
         return fail('price_range_filter', "Rejected - consolidation drop exceeded threshold")
     
     # Pattern length (higher lows, tightening range)
-    if not check_pattern_quality(df, high_point_idx, idx):
+    if not check_pattern_quality(bars, high_point_idx, idx):
         return fail('pattern_quality_filter', "Rejected - consolidation too short")
     
     # Pullback quality (step 2)
-    pullback_result, low_date, pullback_pct = check_orderly_pullback(df, df.index[high_point_idx])
-    if not pullback_result or low_date is None:
+    pullback_result, low_idx, pullback_pct = check_orderly_pullback(bars, high_point_idx)
+    if not pullback_result or low_idx is None:
         return fail('pullback_filter', f"Rejected - pullback insufficient ({pullback_pct*100:.2f}%)")
     
     # Qullamaggie: Price should "surf" the rising 10-, 20-, and sometimes 50-day moving averages during consolidation
     # Check that moving averages are rising and price stays near/above them
-    if idx >= 50 and '10sma' in df.columns and '20sma' in df.columns and '50sma' in df.columns:
+    if idx >= 50 and bars.sma10 is not None and bars.sma20 is not None and bars.sma50 is not None:
         # Check consolidation period (from high to breakout)
         cons_start_idx = high_point_idx
         cons_end_idx = idx
         
         if cons_end_idx > cons_start_idx:
             # Get moving averages at start and end of consolidation
-            sma10_start = df.iloc[cons_start_idx]['10sma'] if not pd.isna(df.iloc[cons_start_idx]['10sma']) else None
-            sma20_start = df.iloc[cons_start_idx]['20sma'] if not pd.isna(df.iloc[cons_start_idx]['20sma']) else None
-            sma50_start = df.iloc[cons_start_idx]['50sma'] if not pd.isna(df.iloc[cons_start_idx]['50sma']) else None
-            sma10_end = df.iloc[cons_end_idx]['10sma'] if not pd.isna(df.iloc[cons_end_idx]['10sma']) else None
-            sma20_end = df.iloc[cons_end_idx]['20sma'] if not pd.isna(df.iloc[cons_end_idx]['20sma']) else None
-            sma50_end = df.iloc[cons_end_idx]['50sma'] if not pd.isna(df.iloc[cons_end_idx]['50sma']) else None
+            sma10_start = bars.sma10[cons_start_idx] if not np.isnan(bars.sma10[cons_start_idx]) else None
+            sma20_start = bars.sma20[cons_start_idx] if not np.isnan(bars.sma20[cons_start_idx]) else None
+            sma10_end = bars.sma10[cons_end_idx] if not np.isnan(bars.sma10[cons_end_idx]) else None
+            sma20_end = bars.sma20[cons_end_idx] if not np.isnan(bars.sma20[cons_end_idx]) else None
             
             # Check that moving averages are rising (at least 10SMA and 20SMA should be rising)
             mas_rising = True
@@ -1131,26 +1644,13 @@ def evaluate_candidate(
             
             # Check that price stays near/above moving averages during consolidation
             # Price should touch or stay above at least one MA for most of the consolidation
-            consolidation_segment = df.iloc[cons_start_idx:cons_end_idx+1]
+            consolidation_length = cons_end_idx - cons_start_idx + 1
             price_surfing = False
-            if len(consolidation_segment) >= 5:
-                touches_ma = 0
-                for i in range(len(consolidation_segment)):
-                    row = consolidation_segment.iloc[i]
-                    low_price = row['low']
-                    close_price = row['close']
-                    sma10 = row['10sma'] if not pd.isna(row['10sma']) else None
-                    sma20 = row['20sma'] if not pd.isna(row['20sma']) else None
-                    sma50 = row['50sma'] if not pd.isna(row['50sma']) else None
-                    
-                    # Check if price touches or stays above at least one MA
-                    if (sma10 and (low_price <= sma10 * 1.02 and close_price >= sma10 * 0.98)) or \
-                       (sma20 and (low_price <= sma20 * 1.02 and close_price >= sma20 * 0.98)) or \
-                       (sma50 and (low_price <= sma50 * 1.02 and close_price >= sma50 * 0.98)):
-                        touches_ma += 1
+            if consolidation_length >= 5:
+                touches_ma = features.ma_touch_count[cons_end_idx + 1] - features.ma_touch_count[cons_start_idx]
                 
                 # Price should "surf" MAs for at least 40% of consolidation period
-                if touches_ma / len(consolidation_segment) >= 0.4:
+                if touches_ma / consolidation_length >= 0.4:
                     price_surfing = True
             
             if not mas_rising or not price_surfing:
@@ -1159,68 +1659,59 @@ def evaluate_candidate(
     # Duplicate spacing
     min_spacing_days = max(3, CONFIG.get('spacing_days', 20) // 2)
     duplicate = any(
-        abs((valid_breakout['breakout_date'] - focus_date).days) < min_spacing_days
+        abs(bars.day[valid_breakout['breakout_idx']] - bars.day[idx]) < min_spacing_days
         for valid_breakout in existing_breakouts
     )
     if duplicate:
         return fail('duplicate_filter', f"Rejected - another breakout within {min_spacing_days} days")
     
     # Range expansion / breakout (step 3)
-    cross_idx = find_first_cross_below_sma(df, idx)
-    category = determine_performance_category(df, idx, cross_idx)
+    cross_idx = find_first_cross_below_sma(bars, idx)
+    category = determine_performance_category(bars, idx, cross_idx)
+    focus_date = bars.dates[idx]
     
     log_debug(
-        f"{ticker} {date_str}: Candidate approved (Category {category}) "
+        f"{ticker} {focus_date.strftime('%Y-%m-%d')}: Candidate approved (Category {category}) "
         f"move_pct={move_pct:.2f}% pullback={pullback_pct*100:.2f}% days_from_high={days_from_high}"
     )
     
     return {
+        'focus_idx': idx,
         'focus_date': focus_date,
-        'move_start_date': move_start_date,
-        'high_date': df.index[high_point_idx],
-        'low_date': low_date,
+        'move_start_idx': move_start_idx,
+        'high_idx': high_point_idx,
+        'low_idx': low_idx,
         'category': category,
         'cross_idx': cross_idx
     }
 
-def check_orderly_pullback(df, high_date, min_pullback_pct=None, min_days=None, max_days=None):
-    """Check if there's an orderly pullback after the high point."""
+def check_orderly_pullback(bars, high_idx, min_pullback_pct=None, min_days=None, max_days=None):
+    """
+    Check if there's an orderly pullback after the high point.
+    
+    Returns:
+        Tuple of (has_pullback, low_idx, pullback_pct)
+    """
     try:
         # Use config values as defaults
         min_pullback_pct = min_pullback_pct if min_pullback_pct is not None else CONFIG['min_pullback_pct']
         min_days = min_days if min_days is not None else CONFIG['min_pullback_days']
         max_days = max_days if max_days is not None else CONFIG['max_pullback_days']
         
-        # Get high point index
-        high_idx = df.index.get_loc(high_date)
-        ticker = None
-        try:
-            # Try to extract ticker from dataframe if available for logging
-            if hasattr(df, 'name'):
-                ticker = df.name
-        except:
-            pass
+        ticker = bars.name
         
         # Define pullback window efficiently
-        end_idx = min(high_idx + max_days + 1, len(df))
+        end_idx = min(high_idx + max_days + 1, len(bars))
         if high_idx + min_days >= end_idx:
             if CONFIG.get('verbosity', 0) > 1:
-                logger.debug(f"{ticker} {high_date.date()}: Pullback window too small - need {min_days} days")
-            return False, None, 0
-        
-        # Get pullback window efficiently
-        pullback_window = df.iloc[high_idx + min_days : end_idx]
-        if pullback_window.empty:
-            if CONFIG.get('verbosity', 0) > 1:
-                logger.debug(f"{ticker} {high_date.date()}: Empty pullback window")
+                logger.debug(f"{ticker} {bars.dates[high_idx].date()}: Pullback window too small - need {min_days} days")
             return False, None, 0
         
         # Get high price once
-        high_price = df.iloc[high_idx]['high']
+        high_price = bars.high[high_idx]
         
         # Find lowest point in pullback window
-        low_price = pullback_window['low'].min()
-        low_date = pullback_window['low'].idxmin()
+        low_price, low_idx = bars.features.low_min.query(high_idx + min_days, end_idx - 1)
         
         # Calculate pullback percentage
         pullback_pct = (high_price - low_price) / high_price
@@ -1229,88 +1720,87 @@ def check_orderly_pullback(df, high_date, min_pullback_pct=None, min_days=None,
         result = pullback_pct >= min_pullback_pct
         
         if not result and CONFIG.get('verbosity', 0) > 1:
-            logger.debug(f"{ticker} {high_date.date()}: Insufficient pullback - {pullback_pct*100:.2f}% vs {min_pullback_pct*100}%")
+            logger.debug(f"{ticker} {bars.dates[high_idx].date()}: Insufficient pullback - {pullback_pct*100:.2f}% vs {min_pullback_pct*100}%")
         
-        return result, low_date, pullback_pct
+        return result, low_idx, pullback_pct
     
     except Exception as e:
         logger.error(f"Error in check_orderly_pullback: {e}")
         return False, None, 0
 
-def check_candle_distribution(df, max_green_pct=0.9):
-    """Check if candle distribution is reasonable."""
-    if 'open' not in df.columns or 'close' not in df.columns or len(df) == 0:
+def check_candle_distribution(bars, rows, max_green_pct=0.9):
+    """Check if candle distribution over the given bar positions is reasonable."""
+    if len(rows) == 0:
         return True
-    green_pct = (df['close'] > df['open']).sum() / len(df)
+    green_pct = (bars.close[rows] > bars.open[rows]).sum() / len(rows)
     return green_pct <= max_green_pct
 
-def process_breakout(ticker: str, data: pd.DataFrame, focus_date: pd.Timestamp, 
-                    low_date: pd.Timestamp, cons_start: pd.Timestamp, 
-                    forced_category: Optional[int] = None) -> Optional[dict]:
+def process_breakout(ticker: str, bars: Bars, focus_idx: int, low_idx: int,
+                    cons_start_idx: int, forced_category: Optional[int] = None,
+                    stats: Optional[dict] = None) -> Optional[dict]:
     """
-    Process a single breakout pattern and create all necessary files.
+    Evaluate a single breakout pattern and prepare its output files in memory.
+    
+    Every quality gate, the indicator selection and the success window are
+    resolved here without touching disk; the files are returned under
+    'pending_files' and only written by write_breakout_files once the breakout
+    is accepted.
     
     Args:
         ticker: Stock ticker symbol
-        data: Full daily dataframe
-        focus_date: Breakout date
-        low_date: Start of uptrend date
-        cons_start: High date before consolidation
+        bars: Full daily bars for the ticker
+        focus_idx: Breakout bar
+        low_idx: Start of uptrend bar
+        cons_start_idx: High bar before consolidation
         forced_category: Optional category override (1-4)
+        stats: Optional per-ticker statistics; counts writes avoided by late rejections
         
     Returns:
         Breakout data dictionary or None if processing fails
     """
+    def reject_unwritten():
+        # Gates that used to run after the directory, points.json, D.json and after.json were written
+        if stats is not None:
+            stats['dirs_avoided'] = stats.get('dirs_avoided', 0) + 1
+            stats['files_avoided'] = stats.get('files_avoided', 0) + 3
+        return None
+    
     try:
+        focus_date = bars.dates[focus_idx]
         if CONFIG.get('verbosity', 0) > 0:
             logger.info(f"Processing breakout: {ticker} on {focus_date.date()}")
         
-        # Get indices for slicing data FIRST (before creating directory)
-        all_dates = data.index
-        focus_idx = all_dates.get_loc(focus_date)
-        
-        # Get start of upward movement index
-        low_idx = all_dates.get_loc(low_date)
-        
         # Find where price crosses below 20SMA
-        cross_idx = find_first_cross_below_sma(data, focus_idx, sma_period=20)
+        cross_idx = find_first_cross_below_sma(bars, focus_idx, sma_period=20)
         # End 3 days after it closes below the 20sma
-        end_idx = min(len(data) - 1, cross_idx + 3)
-        
-        # Create D.json with data from beginning of upward movement to breakout
-        # Ensure Date index is preserved
-        d_data = data.iloc[low_idx:focus_idx+1][['open', 'high', 'low', 'close', 'volume', '10sma', '20sma', '50sma']].copy()
-        # Ensure index name is set for proper JSON serialization
-        if d_data.index.name is None:
-            d_data.index.name = 'Date'
-        
-        # Handle null values in D.json data
-        if d_data.isnull().any().any():
-            d_data = d_data.dropna()
-            if d_data.empty:
-                return None
+        end_idx = min(len(bars) - 1, cross_idx + 3)
+        
+        # D.json rows: beginning of upward movement to breakout, skipping bars with null values
+        d_rows = bars.complete_rows(low_idx, focus_idx)
+        if len(d_rows) == 0:
+            return None
             
         # Check if there are too many green candles in the data
-        if not check_candle_distribution(d_data):
+        if not check_candle_distribution(bars, d_rows):
             return None
         
         # Visual quality check: Ensure breakout shows clear upward movement
-        if len(d_data) >= 10:
-            start_price = d_data.iloc[0]['close']
-            end_price = d_data.iloc[-1]['close']
+        if len(d_rows) >= 10:
+            start_price = bars.close[d_rows[0]]
+            end_price = bars.close[d_rows[-1]]
             total_gain = (end_price - start_price) / start_price
             if total_gain < 0.07:
                 return None
         
         # Visual quality check: Ensure breakout day is clearly above recent highs
-        if len(d_data) >= 6:
-            recent_highs = d_data.iloc[-6:-1]['high'].max()
-            breakout_high = d_data.iloc[-1]['high']
+        if len(d_rows) >= 6:
+            recent_highs = bars.high[d_rows[-6:-1]].max()
+            breakout_high = bars.high[d_rows[-1]]
             if breakout_high <= recent_highs * 1.01:
                 return None
-        elif len(d_data) >= 2:
-            recent_highs = d_data.iloc[:-1]['high'].max()
-            breakout_high = d_data.iloc[-1]['high']
+        elif len(d_rows) >= 2:
+            recent_highs = bars.high[d_rows[:-1]].max()
+            breakout_high = bars.high[d_rows[-1]]
             if breakout_high <= recent_highs * 1.01:
                 return None
             
@@ -1318,119 +1808,98 @@ def process_breakout(ticker: str, data: pd.DataFrame, focus_date: pd.Timestamp,
         # Ensure it includes at least 25 days of data regardless of when price crosses below 20SMA
         after_start_idx = focus_idx + 1  # Start the day after the breakout
         min_after_days = 15  # Minimum days to include in after.json
-        after_end_idx = max(min(len(data) - 1, after_start_idx + min_after_days), end_idx)
+        after_end_idx = max(min(len(bars) - 1, after_start_idx + min_after_days), end_idx)
         
         # Ensure we have enough data
         if after_end_idx - after_start_idx < min_after_days:
             # If we don't have enough data after the breakout, use what we have
-            after_end_idx = min(len(data) - 1, after_start_idx + min_after_days)
-        
-        # Get the after data
-        after_data = data.iloc[after_start_idx:after_end_idx+1][['open', 'high', 'low', 'close', 'volume', '10sma', '20sma', '50sma']].copy()
-        # Ensure index name is set for proper JSON serialization
-        if after_data.index.name is None:
-            after_data.index.name = 'Date'
-        
-        # Handle null values in after.json data
-        if after_data.isnull().any().any():
-            after_data = after_data.dropna()
-            if after_data.empty:
-                return None
-            
-        # Check if there are too many green candles in the after data
-        if not check_candle_distribution(after_data):
-            return None
+            after_end_idx = min(len(bars) - 1, after_start_idx + min_after_days)
         
-        # Determine category based on performance
-        category = forced_category if forced_category is not None else determine_performance_category(data, focus_idx, cross_idx)
-        
-        # Create directory and write files
-        date_str = format_date(focus_date)
-        directory = SCRIPT_DIR / 'ds' / CONFIG['dataset_name'] / f"{ticker}_{date_str}"
-        
-        try:
-            directory.mkdir(parents=True, exist_ok=True)
-        except Exception:
+        # Get the after rows, skipping bars with null values
+        after_rows = bars.complete_rows(after_start_idx, after_end_idx)
+        if len(after_rows) == 0:
             return None
-        
-        # Write files
-        if forced_category is not None:
-            create_files_with_category(str(directory), data, focus_idx, cross_idx, forced_category, ticker, d_data)
-        else:
-            create_files(str(directory), data, focus_idx, cross_idx, ticker, d_data)
-        
-        # Write D.json and after.json
-        if not write_json(str(directory / "D.json"), d_data):
-            return None
-        if not write_json(str(directory / "after.json"), after_data):
+            
+        # Check if there are too many green candles in the after data
+        if not check_candle_distribution(bars, after_rows):
             return None
         
         # Quality check: Volume surge on breakout day
-        if focus_idx > 0 and focus_idx < len(data):
-            breakout_volume = data.iloc[focus_idx]['volume']
-            avg_volume_10d = data.iloc[max(0, focus_idx-10):focus_idx]['volume'].mean()
-            avg_volume_30d = data.iloc[max(0, focus_idx-30):focus_idx]['volume'].mean()
+        features = bars.features
+        if focus_idx > 0 and focus_idx < len(bars):
+            breakout_volume = bars.volume[focus_idx]
+            avg_volume_10d = features.mean_volume(max(0, focus_idx-10), focus_idx)
+            avg_volume_30d = features.mean_volume(max(0, focus_idx-30), focus_idx)
             volume_surge_10d = breakout_volume / avg_volume_10d if avg_volume_10d > 0 else 0
             volume_surge_30d = breakout_volume / avg_volume_30d if avg_volume_30d > 0 else 0
             if volume_surge_10d < 2.0 and volume_surge_30d < 2.0:
-                return None
+                return reject_unwritten()
         
         # Quality check: Strong close on breakout day
-        if focus_idx < len(data):
-            breakout_row = data.iloc[focus_idx]
-            close_to_high_pct = (breakout_row['high'] - breakout_row['close']) / breakout_row['high'] * 100
+        if focus_idx < len(bars):
+            breakout_high = bars.high[focus_idx]
+            close_to_high_pct = (breakout_high - bars.close[focus_idx]) / breakout_high * 100
             if close_to_high_pct > 2.0:
-                return None
+                return reject_unwritten()
         
         # Quality check: Price above key moving averages
-        if focus_idx < len(data) and '10sma' in data.columns and '20sma' in data.columns:
-            breakout_row = data.iloc[focus_idx]
-            breakout_close = breakout_row['close']
-            sma10 = breakout_row['10sma'] if not pd.isna(breakout_row['10sma']) else None
-            sma20 = breakout_row['20sma'] if not pd.isna(breakout_row['20sma']) else None
+        if focus_idx < len(bars) and bars.sma10 is not None and bars.sma20 is not None:
+            breakout_close = bars.close[focus_idx]
+            sma10 = bars.sma10[focus_idx] if not np.isnan(bars.sma10[focus_idx]) else None
+            sma20 = bars.sma20[focus_idx] if not np.isnan(bars.sma20[focus_idx]) else None
             if sma10 and breakout_close <= sma10 * 1.01:
                 if sma20 and breakout_close <= sma20 * 1.01:
-                    return None
+                    return reject_unwritten()
+        
+        # Determine category based on performance
+        category = forced_category if forced_category is not None else determine_performance_category(bars, focus_idx, cross_idx)
+        applied_indicators = generate_indicators(bars, focus_idx, category)
+        
+        # Pending files as (filename, payload, required) in write order
+        pending_files = [
+            ("points.json", applied_indicators, False),
+            ("D.json", bars.frame(d_rows), True),
+            ("after.json", bars.frame(after_rows), True)
+        ]
         
         # Check if this was a successful breakout (30% rise before crossing below 20SMA)
-        is_successful, peak_date = check_successful_breakout(data, focus_idx, cross_idx)
+        is_successful, peak_date = check_successful_breakout(bars, focus_idx, cross_idx)
         if is_successful and peak_date is not None:
-            # Create successful breakout file
-            success_date_str = format_date(peak_date)
-            success_data = data.iloc[focus_idx:end_idx+1][['open', 'high', 'low', 'close', 'volume', '10sma', '20sma', '50sma']].copy()
-            # Ensure index name is set for proper JSON serialization
-            if success_data.index.name is None:
-                success_data.index.name = 'Date'
-            
-            # Check for null values in success data and candle distribution
-            if not success_data.isnull().any().any() and check_candle_distribution(success_data):
-                if not write_json(str(directory / f"{success_date_str}.json"), success_data):
-                    logger.warning(f"Failed to write {success_date_str}.json for {ticker}")
+            # Add the successful breakout file when the whole window has values and the candle distribution is reasonable
+            success_rows = bars.complete_rows(focus_idx, end_idx)
+            if len(success_rows) == end_idx - focus_idx + 1 and check_candle_distribution(bars, success_rows):
+                pending_files.append((f"{format_date(peak_date)}.json", bars.frame(success_rows), False))
         
         # Get pullback percentage for scoring
-        _, _, pullback_pct = check_orderly_pullback(data, cons_start)
+        _, _, pullback_pct = check_orderly_pullback(bars, cons_start_idx)
+        
+        directory = SCRIPT_DIR / 'ds' / CONFIG['dataset_name'] / f"{ticker}_{format_date(focus_date)}"
         
         # Create and return breakout data dictionary
         return {
             'ticker': ticker,
             'breakout_date': focus_date,
-            'low_date': low_date,
-            'high_date': cons_start,
+            'low_date': bars.dates[low_idx],
+            'high_date': bars.dates[cons_start_idx],
+            'breakout_idx': focus_idx,
+            'low_idx': low_idx,
+            'high_idx': cons_start_idx,
             'category': category,
             'cross_idx': cross_idx,
             'pullback_pct': pullback_pct,
-            'output_path': str(directory)
+            'output_path': str(directory),
+            'pending_files': pending_files
         }
     except Exception as e:
         logger.error(f"Error processing {ticker}: {e}")
         return None
 
-def identify_quality_breakouts(df: pd.DataFrame, ticker: str) -> Tuple[list, dict, dict]:
+def identify_quality_breakouts(bars: Bars, ticker: str) -> Tuple[list, dict, dict]:
     """
     Efficiently identify quality breakouts in the given ticker data.
     
     Args:
-        df: Daily stock price dataframe with technical indicators
+        bars: Daily bars with technical indicators
         ticker: Stock ticker symbol for logging
         
     Returns:
@@ -1454,7 +1923,9 @@ def identify_quality_breakouts(df: pd.DataFrame, ticker: str) -> Tuple[list, dic
         'category3_found': 0,
         'category4_found': 0,
         'green_candle_filter': 0,
-        'integrity_fail': 0
+        'integrity_fail': 0,
+        'files_avoided': 0,
+        'dirs_avoided': 0
     }
     initial_filter_counts = {
         'not_higher_high': 0,
@@ -1463,15 +1934,18 @@ def identify_quality_breakouts(df: pd.DataFrame, ticker: str) -> Tuple[list, dic
         'insufficient_daily_range': 0
     }
     # Early validation
-    if df is None or len(df) < 252:
+    if bars is None or len(bars) < 252:
         if CONFIG.get('verbosity', 0) > 0:
-            logger.debug(f"{ticker}: Insufficient data - need 252 days, got {0 if df is None else len(df)}")
+            logger.debug(f"{ticker}: Insufficient data - need 252 days, got {0 if bars is None else len(bars)}")
         if debug_enabled:
             logger.debug(f"{ticker}: Early exit because dataset length < 252")
         return [], stats, initial_filter_counts
     
-    green_candles = (df['close'] > df['open']).sum()
-    total_candles = len(df)
+    # Feature table shared by the prefilter and every candidate of this ticker
+    features = bars.features
+    
+    green_candles = features.green_count[-1]
+    total_candles = len(bars)
     if total_candles > 0 and (green_candles / total_candles > 0.85):
         if CONFIG.get('verbosity', 0) > 0:
             logger.debug(f"{ticker}: Problematic data pattern - {green_candles/total_candles:.1%} green candles")
@@ -1483,14 +1957,8 @@ def identify_quality_breakouts(df: pd.DataFrame, ticker: str) -> Tuple[list, dic
     all_valid_breakouts = []
     setups = []
     
-    # Pre-calculate commonly used signals to avoid redundant calculations
-    # Calculate price change rates for faster comparison
-    df['daily_range_pct'] = (df['high'] - df['low']) / df['open'] * 100
-    df['close_change'] = df['close'].pct_change() * 100
-    df['volume_ratio'] = df['volume'] / df['volume'].rolling(10).mean()
-    
     # Only examine dates within the valid range efficiently
-    valid_range = slice(252, max(252, len(df) - 63))  # At least 1 year prior, 3 months after
+    valid_range = slice(252, max(252, len(bars) - 63))  # At least 1 year prior, 3 months after
     valid_indices = range(valid_range.start, valid_range.stop)
     
     # Record total dates examined
@@ -1498,55 +1966,54 @@ def identify_quality_breakouts(df: pd.DataFrame, ticker: str) -> Tuple[list, dic
     if debug_enabled:
         logger.debug(f"{ticker}: Total candidate dates to evaluate: {stats['total_dates']}")
     
-    # Use vectorized operations where possible
-    # Pre-filter potential breakout candidates to reduce processing
-    breakout_candidates = []
-    for i in valid_indices:
-        focus_date = df.index[i]
-        if (i > 0 and i < len(df) - 1):  # Ensure we have surrounding data
-            # Check each criterion separately for counting
-            higher_high = df.iloc[i]['high'] > df.iloc[i-1]['high']
-            close_above_prev_high = df.iloc[i]['close'] > df.iloc[i-1]['high']
-            # Stricter volume requirement: must be at least 2.0x previous volume AND above 20-day average
-            prev_volume = df.iloc[i-1]['volume']
-            avg_volume_20 = df.iloc[max(0, i-20):i]['volume'].mean()
-            volume_increase = (df.iloc[i]['volume'] > prev_volume * 2.0) and (df.iloc[i]['volume'] > avg_volume_20 * 1.5)
-            daily_range_sufficient = df.iloc[i]['daily_range_pct'] >= CONFIG['min_daily_range_pct']
-            
-            # Additional quality filter: price should be above key moving averages
-            price_above_mas = True
-            if '20sma' in df.columns and '50sma' in df.columns:
-                close_price = df.iloc[i]['close']
-                sma20 = df.iloc[i]['20sma'] if not pd.isna(df.iloc[i]['20sma']) else 0
-                sma50 = df.iloc[i]['50sma'] if not pd.isna(df.iloc[i]['50sma']) else 0
-                price_above_mas = (sma20 > 0 and close_price > sma20 * 1.01) or (sma50 > 0 and close_price > sma50 * 1.01)
-            
-            # Only log detailed reasons if in verbose mode
-            if CONFIG.get('verbosity', 0) > 1:
-                date_str = focus_date.strftime('%Y-%m-%d')
-                if not higher_high:
-                    logger.debug(f"{ticker} {date_str}: Not a higher high")
-                elif not close_above_prev_high:
-                    logger.debug(f"{ticker} {date_str}: Close not above previous high")
-                elif not volume_increase:
-                    logger.debug(f"{ticker} {date_str}: Insufficient volume increase")
-                elif not daily_range_sufficient:
-                    logger.debug(f"{ticker} {date_str}: Insufficient daily range")
-            
-            # Count reasons why candidates fail the initial filter
-            if not higher_high:
-                initial_filter_counts['not_higher_high'] += 1
-            elif not close_above_prev_high:
-                initial_filter_counts['close_not_above_prev_high'] += 1
-            elif not volume_increase:
-                initial_filter_counts['insufficient_volume'] += 1
-            elif not daily_range_sufficient:
-                initial_filter_counts['insufficient_daily_range'] += 1
-            
-            if (higher_high and close_above_prev_high and volume_increase and daily_range_sufficient and price_above_mas):
-                breakout_candidates.append(i)
-            else:
-                stats['initial_filter'] += 1
+    # Pre-filter potential breakout candidates with whole-array masks
+    prev_high = np.concatenate(([np.nan], bars.high[:-1]))
+    prev_volume = np.concatenate(([np.nan], bars.volume[:-1]))
+    higher_high = bars.high > prev_high
+    close_above_prev_high = bars.close > prev_high
+    # Stricter volume requirement: must be at least 2.0x previous volume AND above 20-day average
+    avg_volume_20 = features.prior_mean_volume(20)
+    volume_increase = (bars.volume > prev_volume * 2.0) & (bars.volume > avg_volume_20 * 1.5)
+    daily_range_sufficient = features.daily_range_pct >= CONFIG['min_daily_range_pct']
+    
+    # Additional quality filter: price should be above key moving averages
+    if bars.sma20 is not None and bars.sma50 is not None:
+        sma20 = np.nan_to_num(bars.sma20, nan=0.0)
+        sma50 = np.nan_to_num(bars.sma50, nan=0.0)
+        price_above_mas = ((sma20 > 0) & (bars.close > sma20 * 1.01)) | ((sma50 > 0) & (bars.close > sma50 * 1.01))
+    else:
+        price_above_mas = np.ones(len(bars), dtype=bool)
+    
+    # Restrict every mask to the examined date range
+    higher_high = higher_high[valid_range]
+    close_above_prev_high = close_above_prev_high[valid_range]
+    volume_increase = volume_increase[valid_range]
+    daily_range_sufficient = daily_range_sufficient[valid_range]
+    price_above_mas = price_above_mas[valid_range]
+    
+    # Count reasons why candidates fail the initial filter (first failing check wins)
+    high_fail = ~higher_high
+    close_fail = higher_high & ~close_above_prev_high
+    volume_fail = higher_high & close_above_prev_high & ~volume_increase
+    range_fail = higher_high & close_above_prev_high & volume_increase & ~daily_range_sufficient
+    initial_filter_counts['not_higher_high'] = int(high_fail.sum())
+    initial_filter_counts['close_not_above_prev_high'] = int(close_fail.sum())
+    initial_filter_counts['insufficient_volume'] = int(volume_fail.sum())
+    initial_filter_counts['insufficient_daily_range'] = int(range_fail.sum())
+    
+    passed = higher_high & close_above_prev_high & volume_increase & daily_range_sufficient & price_above_mas
+    breakout_candidates = (np.flatnonzero(passed) + valid_range.start).tolist()
+    stats['initial_filter'] = len(valid_indices) - len(breakout_candidates)
+    
+    # Only log detailed reasons if in verbose mode
+    if CONFIG.get('verbosity', 0) > 1:
+        reason_masks = [high_fail, close_fail, volume_fail, range_fail]
+        reason_messages = ["Not a higher high", "Close not above previous high",
+                           "Insufficient volume increase", "Insufficient daily range"]
+        reason_codes = np.select(reason_masks, range(len(reason_masks)), default=-1)
+        for pos in np.flatnonzero(reason_codes >= 0):
+            date_str = bars.dates[valid_range.start + pos].strftime('%Y-%m-%d')
+            logger.debug(f"{ticker} {date_str}: {reason_messages[reason_codes[pos]]}")
     
     if len(breakout_candidates) > 0 and CONFIG.get('verbosity', 0) > 0:
         logger.info(f"{ticker}: {len(breakout_candidates)} candidates passed initial filter (examined {stats['total_dates']} dates)")
@@ -1567,19 +2034,22 @@ def identify_quality_breakouts(df: pd.DataFrame, ticker: str) -> Tuple[list, dic
     
     # Process the filtered candidates using unified evaluation
     for i in breakout_candidates:
-        details = evaluate_candidate(df, i, all_valid_breakouts, ticker, stats, debug_enabled)
+        details = evaluate_candidate(bars, i, all_valid_breakouts, ticker, stats, debug_enabled)
         if details is None:
             continue
         
         try:
             breakout_data = process_breakout(
                 ticker,
-                df,
-                details['focus_date'],
-                details['move_start_date'],
-                details['high_date']
+                bars,
+                details['focus_idx'],
+                details['move_start_idx'],
+                details['high_idx'],
+                stats=stats
             )
             if breakout_data is not None:
+                # Phase two: only accepted breakouts reach the (background) writer
+                get_writer().submit(breakout_data)
                 category_key = f"category{details['category']}_found"
                 if category_key in stats:
                     stats[category_key] += 1
@@ -1610,7 +2080,7 @@ def identify_quality_breakouts(df: pd.DataFrame, ticker: str) -> Tuple[list, dic
     # Select the best breakouts efficiently
     if all_valid_breakouts:
         # Score and select breakouts in one step
-        scored_breakouts = score_breakouts(df, all_valid_breakouts)
+        scored_breakouts = score_breakouts(bars, all_valid_breakouts)
         setups = select_with_spacing(scored_breakouts)
         
         if CONFIG.get('verbosity', 0) > 0:
@@ -1627,9 +2097,10 @@ def identify_quality_breakouts(df: pd.DataFrame, ticker: str) -> Tuple[list, dic
     
     return all_valid_breakouts, stats, initial_filter_counts
 
-def score_breakouts(df, valid_breakouts):
+def score_breakouts(bars, valid_breakouts):
     """Score breakouts by quality and return sorted list"""
     scored_breakouts = []
+    outcomes = bars.outcomes
     
     for breakout in valid_breakouts:
         try:
@@ -1643,8 +2114,8 @@ def score_breakouts(df, valid_breakouts):
             pullback_pct = breakout.get('pullback_pct', 0.05)  # Default for backward compatibility
             
             # Get indices for calculation
-            idx = df.index.get_loc(breakout_date)
-            high_idx = df.index.get_loc(high_date)
+            idx = breakout['breakout_idx']
+            high_idx = breakout['high_idx']
             
             # Calculate quality metrics
             # 1. Consolidation tightness - now using the stored max_drop_pct
@@ -1660,7 +2131,7 @@ def score_breakouts(df, valid_breakouts):
             tightness_score = max(0.0, min(1.0, tightness_score))
             
             # 2. Consolidation length
-            cons_days = (breakout_date - high_date).days
+            cons_days = int(bars.day[idx] - bars.day[high_idx])
             days_score = min(cons_days / 60.0, 1.0)
             
             # 3. Pullback quality
@@ -1670,11 +2141,10 @@ def score_breakouts(df, valid_breakouts):
             
             # 4. Post-breakout gain (for higher categories)
             gain_score = 0
-            if category in [3, 4] and cross_idx < len(df):
-                breakout_price = df.iloc[idx]['close']
-                segment = df.iloc[idx:cross_idx+1]
-                if not segment.empty:
-                    highest_price = segment['high'].max()
+            if category in [3, 4] and cross_idx < len(bars):
+                breakout_price = bars.close[idx]
+                if cross_idx >= idx:
+                    highest_price, _ = outcomes.highest_high(idx, cross_idx)
                     gain_pct = (highest_price - breakout_price) / breakout_price
                     gain_score = min(gain_pct, 1.0)
             
@@ -1757,33 +2227,45 @@ def log_breakout_stats(ticker: str, stats: dict, total_valid: int):
         logger.debug(f"  Categories: Cat1={stats['category1_found']}, Cat2={stats['category2_found']}, "
                     f"Cat3={stats['category3_found']}, Cat4={stats['category4_found']}")
 
-def process_ticker(ticker: str) -> Tuple[bool, List[str]]:
+def process_ticker(ticker: str, df: Optional[pd.DataFrame] = None,
+                   data_dir: Optional[Path] = None) -> Tuple[bool, List[str], dict]:
     """
     Process a single ticker to find breakout patterns.
     Loads data, finds breakouts, and writes files immediately.
     
     Args:
         ticker: Stock ticker symbol
+        df: Date-indexed bars as stored by the downloader, used instead of reading the data file
+        data_dir: Directory holding the data files and actions tables (default: DATA_DIR)
         
     Returns:
         Tuple containing:
             - True if breakouts were found, False otherwise
             - List of directories where files were written
+            - Write counters (files and directories avoided by late rejections)
     """
     created_dirs: List[str] = []
+    write_counts = dict.fromkeys(WRITE_STAT_KEYS, 0)
     debug_enabled = CONFIG.get('verbosity', 0) >= 2
     try:
-        # Load data for this ticker only
-        df = read_stock_data(ticker)
+        # Load data for this ticker only (frames handed over by the downloader skip the file)
+        if df is None:
+            df = read_stock_data(ticker, data_dir)
+        else:
+            df = prepare_stock_frame(ticker, df.reset_index(), data_dir)
         if debug_enabled:
             logger.debug(f"{ticker}: Starting processing with data length {0 if df is None else len(df)}")
         if df is None or not check_data_quality(df):
             if debug_enabled:
                 logger.debug(f"{ticker}: Data failed quality checks")
-            return False, created_dirs
+            return False, created_dirs, write_counts
+        
+        # Copy into contiguous arrays once; features and outcomes are built lazily on the bars
+        bars = Bars.from_frame(df, ticker)
         
         # Find and process breakouts (files are written during processing)
-        all_valid_breakouts, stats, initial_counts = identify_quality_breakouts(df, ticker)
+        all_valid_breakouts, stats, initial_counts = identify_quality_breakouts(bars, ticker)
+        write_counts = {key: stats.get(key, 0) for key in WRITE_STAT_KEYS}
         if debug_enabled:
             logger.debug(f"{ticker}: identify_quality_breakouts returned {len(all_valid_breakouts) if all_valid_breakouts else 0} breakouts")
         
@@ -1793,7 +2275,7 @@ def process_ticker(ticker: str) -> Tuple[bool, List[str]]:
                 # Provide immediate feedback on where files were written
                 for path in created_dirs:
                     if path:
-                        tqdm.write(f"[breakout] {ticker}: wrote files to {path}")
+                        tqdm.write(f"[breakout] {ticker}: queued files for {path}")
         elif debug_enabled:
             logger.debug(f"{ticker}: No breakouts produced output directories")
         
@@ -1822,10 +2304,10 @@ def process_ticker(ticker: str) -> Tuple[bool, List[str]]:
                 logger.debug(f"{ticker}: Completed with {len(created_dirs)} output directories")
             else:
                 logger.debug(f"{ticker}: Completed with no output directories created")
-        return success, created_dirs
+        return success, created_dirs, write_counts
     except Exception as e:
         logger.error(f"Error processing ticker {ticker}: {e}", exc_info=True)
-        return False, created_dirs
+        return False, created_dirs, write_counts
     finally:
         # Clear cache for this ticker to free memory
         if ticker in _data_cache:
@@ -1839,22 +2321,64 @@ def get_tickers_to_process() -> list:
         List of ticker symbols
     """
     try:
-        data_dir = SCRIPT_DIR / 'data'
+        data_dir = DATA_DIR
         if not data_dir.exists():
             logger.error(f"Data directory not found: {data_dir}")
             return []
-        files = [f for f in data_dir.iterdir() if f.suffix == '.json' and f.name != 'A.json']
-        tickers = [f.stem for f in files]
+        tickers = [ticker for ticker in list_tickers(data_dir) if ticker != 'A']
         logger.info(f"Found {len(tickers)} tickers to process")
         return tickers
     except Exception as e:
         logger.error(f"Error reading data directory: {e}")
         return []
 
+def order_tickers_by_size(tickers: List[str]) -> List[str]:
+    """
+    Order tickers largest input file first so the slowest tickers start early.
+    
+    Sizes are only comparable within one storage format, which is the normal case
+    since the downloader writes every ticker in the format it was run with.
+    
+    Args:
+        tickers: Ticker symbols with data files under DATA_DIR
+        
+    Returns:
+        Tickers sorted by descending data file size
+    """
+    data_dir = DATA_DIR
+    
+    def file_size(ticker: str) -> int:
+        try:
+            path = find_data_file(data_dir, ticker)
+            return path.stat().st_size if path is not None else 0
+        except OSError:
+            return 0
+    
+    return sorted(tickers, key=file_size, reverse=True)
+
+def init_worker(config: dict, writer_results=None):
+    """
+    Initialize a worker process with the parent's runtime configuration.
+    
+    Args:
+        config: Snapshot of the parent's CONFIG after configure_runtime
+        writer_results: Queue that receives the worker's writer metrics when the process exits
+    """
+    CONFIG.update(config)
+    if writer_results is not None:
+        # The writer runs across tickers and is flushed and closed once, when the pool shuts the worker down
+        multiprocessing.util.Finalize(None, close_worker_writer, args=(writer_results,), exitpriority=10)
+    log_format = '%(asctime)s - %(levelname)s - %(message)s'
+    logging.basicConfig(level=CONFIG.get('log_level', logging.ERROR), format=log_format, force=True)
+    warnings.filterwarnings('ignore', category=pd.errors.PerformanceWarning)
+    warnings.filterwarnings('ignore', category=FutureWarning)
+
 def process_tickers(tickers: list, dataset: str) -> int:
     """
-    Process all tickers iteratively: load -> find breakouts -> write files -> next.
-    This ensures files are written immediately and memory usage is minimized.
+    Process all tickers: load -> find breakouts -> write files -> next.
+    With more than one worker configured, tickers are distributed across a
+    process pool (largest input files first) and per-ticker results are merged
+    back into STATS in the parent process.
     
     Args:
         tickers: List of ticker symbols to process
@@ -1884,42 +2408,120 @@ def process_tickers(tickers: list, dataset: str) -> int:
     dataset_root.mkdir(parents=True, exist_ok=True)
     
     # Pre-check which files exist to avoid unnecessary processing
-    data_dir = SCRIPT_DIR / 'data'
-    existing_tickers = {f.stem for f in data_dir.glob('*.json') if f.name != 'A.json'}
+    data_dir = DATA_DIR
+    existing_tickers = {ticker for ticker in list_tickers(data_dir) if ticker != 'A'}
     tickers_to_process = [t for t in tickers if t in existing_tickers]
     if len(tickers_to_process) < total:
         logger.info(f"Found {len(tickers_to_process)}/{total} tickers with data files")
     
     success = 0
     valid_count = 0
-    created_directories: List[str] = []
+    created_by_ticker = {}
+    max_workers = max(1, min(CONFIG.get('max_workers', 1), len(tickers_to_process)))
     if CONFIG.get('verbosity', 0) >= 2:
-        logger.debug(f"Processing {len(tickers_to_process)} tickers (after filtering existing data files)")
+        logger.debug(f"Processing {len(tickers_to_process)} tickers (after filtering existing data files) "
+                     f"with {max_workers} worker(s)")
+    
+    def record_result(ticker: str, success_flag: bool, created_dirs: List[str], write_counts: dict):
+        nonlocal success, valid_count
+        if record_ticker_stats(ticker, success_flag, write_counts):
+            success += 1
+            valid_count += 1
+            created_by_ticker[ticker] = created_dirs
     
-    # Process iteratively: load -> process -> write -> next
     with tqdm(total=len(tickers_to_process), desc="Processing Tickers", disable=CONFIG.get('verbosity', 0) == 0) as pbar:
-        for ticker in tickers_to_process:
-            try:
-                # Load, process, and write files for this ticker
-                success_flag, created_dirs = process_ticker(ticker)
-                if success_flag:
-                    success += 1
-                    valid_count += 1
-                    STATS['success_count'] += 1
-                    created_directories.extend(created_dirs)
-                else:
+        if max_workers > 1:
+            # Largest files first so the longest-running tickers don't trail at the end
+            ordered = order_tickers_by_size(tickers_to_process)
+            writer_results = multiprocessing.Queue()
+            with concurrent.futures.ProcessPoolExecutor(
+                max_workers=max_workers,
+                initializer=init_worker,
+                initargs=(dict(CONFIG), writer_results)
+            ) as executor:
+                futures = {executor.submit(process_ticker_wrapper, ticker): ticker for ticker in ordered}
+                for future in concurrent.futures.as_completed(futures):
+                    ticker = futures[future]
+                    try:
+                        success_flag, created_dirs, write_counts = future.result()
+                        record_result(ticker, success_flag, created_dirs, write_counts)
+                    except Exception as e:
+                        logger.error(f"Error processing {ticker}: {e}", exc_info=True)
+                        STATS['failed_count'] += 1
+                    finally:
+                        pbar.update(1)
+            # Workers have exited, so every writer has flushed and reported its metrics
+            while True:
+                try:
+                    merge_writer_metrics(STATS, writer_results.get_nowait())
+                except queue.Empty:
+                    break
+        else:
+            # Process iteratively: load -> process -> write -> next
+            for ticker in tickers_to_process:
+                try:
+                    # Load, process, and write files for this ticker
+                    success_flag, created_dirs, write_counts = process_ticker(ticker)
+                    record_result(ticker, success_flag, created_dirs, write_counts)
+                except Exception as e:
+                    logger.error(f"Error processing {ticker}: {e}", exc_info=True)
                     STATS['failed_count'] += 1
-                    if CONFIG.get('verbosity', 0) >= 2:
-                        logger.debug(f"{ticker}: No output created during processing loop")
-            except Exception as e:
-                logger.error(f"Error processing {ticker}: {e}", exc_info=True)
-                STATS['failed_count'] += 1
-            finally:
-                pbar.update(1)
-                # Periodic garbage collection to free memory
-                if pbar.n % 50 == 0:
-                    gc.collect()
+                finally:
+                    pbar.update(1)
+                    # Periodic garbage collection to free memory
+                    if pbar.n % 50 == 0:
+                        gc.collect()
+            # Wait for the background writer before reporting
+            merge_writer_metrics(STATS, close_writer())
+    
+    # Breakouts are counted when accepted; take out the ones the writer had to drop
+    created_directories, lost = drop_unwritten_breakouts(created_by_ticker)
+    success -= lost
+    valid_count -= lost
+    report_created_directories(created_directories)
+    print_summary(total, valid_count, success)
+    return success
+
+def record_ticker_stats(ticker: str, success_flag: bool, write_counts: dict) -> bool:
+    """Merge one ticker's result into STATS; returns success_flag."""
+    for key in WRITE_STAT_KEYS:
+        STATS[key] += write_counts.get(key, 0)
+    if success_flag:
+        STATS['success_count'] += 1
+    else:
+        STATS['failed_count'] += 1
+        if CONFIG.get('verbosity', 0) >= 2:
+            logger.debug(f"{ticker}: No output created during processing loop")
+    return success_flag
+
+def drop_unwritten_breakouts(created_by_ticker: dict) -> Tuple[List[str], int]:
+    """
+    Take the directories the writer dropped out of the per-ticker results.
     
+    Detection counts a ticker as successful once its breakouts are accepted, before
+    they are written. Call this after the writer has closed: tickers whose every
+    breakout was dropped at write time are moved from success_count to failed_count.
+    
+    Args:
+        created_by_ticker: {ticker: output directories of its accepted breakouts}
+        
+    Returns:
+        Tuple of (directories that were written, tickers left without any breakout)
+    """
+    dropped = set(STATS.get('dropped_dirs', []))
+    created = []
+    lost = 0
+    for dirs in created_by_ticker.values():
+        kept = [path for path in dirs if path not in dropped]
+        if dirs and not kept:
+            lost += 1
+        created.extend(kept)
+    STATS['success_count'] -= lost
+    STATS['failed_count'] += lost
+    return created, lost
+
+def report_created_directories(created_directories: List[str]):
+    """List the breakout directories created during the run (and the ones dropped at write time)."""
     unique_dirs = sorted(set(created_directories))
     if unique_dirs:
         tqdm.write("Created breakout directories:")
@@ -1927,17 +2529,92 @@ def process_tickers(tickers: list, dataset: str) -> int:
             tqdm.write(f" - {path}")
     else:
         tqdm.write("No breakout directories were created.")
+    dropped = sorted(set(STATS.get('dropped_dirs', [])))
+    if dropped:
+        tqdm.write("Dropped breakout directories (D.json or after.json could not be written):")
+        for path in dropped:
+            tqdm.write(f" - {path}")
+
+class DetectionWorker:
+    """
+    Streaming detection stage for the downloader's pipelined mode.
+    
+    The downloader hands every ticker it stores to submit(), with the frame it just
+    wrote when it has one, so the data file is not parsed again. A background thread
+    runs process_ticker on the queue while later batches are still downloading;
+    submit() only blocks while the bounded queue is full. Tickers submitted without
+    a frame are read from disk, and each ticker is detected once per run. Files and
+    actions tables are read from data_dir, the downloader's output directory.
+    """
     
-    print_summary(total, valid_count, success)
-    return success
+    def __init__(self, queue_size: Optional[int] = None, data_dir: Optional[Path] = None):
+        self.data_dir = DATA_DIR if data_dir is None else Path(data_dir)
+        self.submitted = set()
+        self.success = 0
+        self.created_by_ticker = {}
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=max(1, CONFIG.get('detect_queue_size', 32) if queue_size is None else queue_size))
+        self._thread = threading.Thread(target=self._run, name="breakout-detector", daemon=True)
+        self._thread.start()
+    
+    def submit(self, ticker: str, df: Optional[pd.DataFrame] = None):
+        """Queue a stored ticker for detection (df: its Date-indexed bars, or None to read the file)."""
+        # 'A' is skipped like in get_tickers_to_process
+        with self._lock:
+            if ticker == 'A' or ticker in self.submitted:
+                return
+            self.submitted.add(ticker)
+        self._queue.put((ticker, df))
+    
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                ticker, df = item
+                success_flag, created_dirs, write_counts = process_ticker(ticker, df, self.data_dir)
+                if record_ticker_stats(ticker, success_flag, write_counts):
+                    self.success += 1
+                    self.created_by_ticker[ticker] = created_dirs
+            except Exception as e:
+                logger.error(f"Error processing {item[0]}: {e}", exc_info=True)
+                STATS['failed_count'] += 1
+            finally:
+                self._queue.task_done()
+    
+    def close(self) -> int:
+        """Wait for queued tickers, stop the thread and the writer, and print the summary; returns breakouts found."""
+        self._queue.put(None)
+        self._thread.join()
+        merge_writer_metrics(STATS, close_writer())
+        STATS['ticker_count'] = len(self.submitted)
+        created_directories, lost = drop_unwritten_breakouts(self.created_by_ticker)
+        self.success -= lost
+        report_created_directories(created_directories)
+        print_summary(len(self.submitted), self.success, self.success)
+        return self.success
+
+def start_detection(queue_size: Optional[int] = None, data_dir: Optional[Path] = None) -> DetectionWorker:
+    """Clear the dataset output directory and start a detection worker for the downloader's data_dir."""
+    prepare_dataset_dir()
+    return DetectionWorker(queue_size, data_dir)
 
 def process_ticker_wrapper(ticker):
-    """Wrapper function for process_ticker to handle exceptions"""
+    """
+    Wrapper function for process_ticker to handle exceptions.
+    Runs in pool workers; the worker's writer keeps writing while the next ticker
+    is detected and reports its metrics through close_worker_writer.
+    """
     try:
         return process_ticker(ticker)
     except Exception as e:
         logger.error(f"Error processing ticker {ticker}: {e}")
-        return False, []
+        return False, [], dict.fromkeys(WRITE_STAT_KEYS, 0)
+
+def close_worker_writer(writer_results):
+    """Flush and stop a pool worker's writer at process exit and send its metrics to the parent."""
+    writer_results.put(close_writer())
 
 def print_summary(total: int, valid_count: int, success: int):
     """
@@ -1955,13 +2632,50 @@ def print_summary(total: int, valid_count: int, success: int):
     logger.info(f"  Breakouts found: {success}")
     if valid_count > 0:
         logger.info(f"  Success rate: {success / valid_count * 100:.2f}%")
+    logger.info(f"  Files written: {STATS.get('files_written', 0)} "
+                f"({STATS.get('write_failures', 0)} failed, {STATS.get('writer_batches', 0)} writer batches)")
+    if STATS.get('write_integrity_fail', 0) > 0:
+        logger.info(f"  Integrity failures at write time: {STATS['write_integrity_fail']} breakouts dropped "
+                    f"(D.json or after.json could not be written)")
+    logger.info(f"  Writes avoided (rejected before disk): {STATS.get('files_avoided', 0)} files "
+                f"in {STATS.get('dirs_avoided', 0)} directories")
+    queued = STATS.get('breakouts_queued', 0)
+    if queued > 0:
+        logger.info(f"  Writer queue depth: avg {STATS.get('queue_depth_sum', 0) / queued:.1f}, "
+                    f"max {STATS.get('queue_depth_max', 0)}")
+        logger.info(f"  Writer flush latency: avg {STATS.get('flush_latency_sum', 0) / queued * 1000:.1f} ms, "
+                    f"max {STATS.get('flush_latency_max', 0) * 1000:.1f} ms")
     logger.info("=" * 50)
 
 def cleanup():
     """Clean up global state and resources."""
     global _data_cache, STATS
     _data_cache.clear()
-    STATS = {'ticker_count': 0, 'success_count': 0, 'failed_count': 0}
+    close_writer()
+    STATS = {'ticker_count': 0, 'success_count': 0, 'failed_count': 0,
+             'files_avoided': 0, 'dirs_avoided': 0}
+
+def prepare_dataset_dir() -> Path:
+    """
+    Create an empty output directory for the dataset.
+    
+    Returns:
+        Dataset directory (root data/ if available, otherwise the legacy ds/ location)
+    """
+    root_data_dir = Path(SCRIPT_DIR.parent.parent) / 'data' / CONFIG['dataset_name']
+    legacy_ds_dir = SCRIPT_DIR / 'ds' / CONFIG['dataset_name']
+    
+    # Prefer root data/ directory
+    if root_data_dir.parent.exists() or root_data_dir.parent.parent.exists():
+        ds_dir = root_data_dir
+    else:
+        ds_dir = legacy_ds_dir
+    
+    if ds_dir.exists():
+        shutil.rmtree(ds_dir)
+    
+    ds_dir.mkdir(parents=True, exist_ok=True)
+    return ds_dir
 
 def main() -> int:
     """
@@ -1975,21 +2689,7 @@ def main() -> int:
     try:
         args = parse_args()
         configure_runtime(args)
-        
-        # Use root data/ directory if available, otherwise use legacy ds/ location
-        root_data_dir = Path(SCRIPT_DIR.parent.parent) / 'data' / CONFIG['dataset_name']
-        legacy_ds_dir = SCRIPT_DIR / 'ds' / CONFIG['dataset_name']
-        
-        # Prefer root data/ directory
-        if root_data_dir.parent.exists() or root_data_dir.parent.parent.exists():
-            ds_dir = root_data_dir
-        else:
-            ds_dir = legacy_ds_dir
-        
-        if ds_dir.exists():
-            shutil.rmtree(ds_dir)
-        
-        ds_dir.mkdir(parents=True, exist_ok=True)
+        ds_dir = prepare_dataset_dir()
         
         verbosity = CONFIG.get('verbosity', 1)
         if verbosity == 0:
@@ -2056,6 +2756,10 @@ def configure_runtime(args) -> dict:
         CONFIG['dataset_name'] = args.dataset
     if args.workers:
         CONFIG['max_workers'] = args.workers
+    if args.writer_threads is not None:
+        CONFIG['writer_threads'] = max(0, args.writer_threads)
+    if args.compact_json:
+        CONFIG['compact_json'] = True
     
     logger.info("Starting breakout analysis")
     return CONFIG
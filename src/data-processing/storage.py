@@ -0,0 +1,382 @@
+"""
+On-disk formats for downloaded price data.
+
+Each ticker is stored as data/{ticker}.{json,npz,parquet}:
+- json: records-oriented array with ISO dates (the original format, always readable)
+- npz: typed columns (datetime64[D] dates, float64 prices and SMAs, int64 volume)
+- parquet: the same columns through pandas, when pyarrow or fastparquet is installed
+
+JSON files may be compressed as {ticker}.json.zst (zstd, when the zstandard package
+is installed) or {ticker}.json.gz (gzip). Readers detect the codec from the file's
+magic bytes, so compressed and plain files load the same way.
+
+Readers look for the columnar files first and fall back to JSON. Writers replace
+any copy of the ticker in another format so a ticker never has two diverging files.
+
+Unadjusted downloads keep their split/dividend events in data/actions/{ticker}.json;
+adjust_price_data applies them to the raw prices when a ticker is loaded. Tickers
+without an actions table hold prices that were already adjusted by the provider.
+"""
+
+import argparse
+import gzip
+import io
+import json
+import os
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+    PARQUET_AVAILABLE = True
+except ImportError:
+    try:
+        import fastparquet  # noqa: F401
+        PARQUET_AVAILABLE = True
+    except ImportError:
+        PARQUET_AVAILABLE = False
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    zstandard = None
+    ZSTD_AVAILABLE = False
+
+SUFFIXES = {'npz': '.npz', 'parquet': '.parquet', 'json': '.json'}
+FORMATS = [fmt for fmt in ['json', 'npz', 'parquet'] if fmt != 'parquet' or PARQUET_AVAILABLE]
+# Lookup order when a ticker is read: typed columnar files first, JSON as fallback
+READ_ORDER = ['npz', 'parquet', 'json']
+# Codecs for JSON files: file suffix, magic bytes and default level
+COMPRESSION_SUFFIXES = {'zstd': '.zst', 'gzip': '.gz'}
+COMPRESSION_MAGIC = {'zstd': b'\x28\xb5\x2f\xfd', 'gzip': b'\x1f\x8b'}
+DEFAULT_LEVELS = {'zstd': 3, 'gzip': 6}
+COMPRESSIONS = [codec for codec in ['zstd', 'gzip'] if codec != 'zstd' or ZSTD_AVAILABLE]
+# Split/dividend tables kept next to unadjusted price files
+ACTIONS_DIR = 'actions'
+ACTION_COLUMNS = ['Dividends', 'Stock Splits']
+
+def file_suffix(fmt: str, compression: Optional[str] = None) -> str:
+    """File name suffix for a format, e.g. '.json.zst' for zstd-compressed JSON."""
+    return SUFFIXES[fmt] + (COMPRESSION_SUFFIXES[compression] if compression else '')
+
+# Every suffix a stored ticker file can have, in lookup order
+DATA_SUFFIXES = [file_suffix(fmt, codec) for fmt in READ_ORDER
+                 for codec in ([None] + list(COMPRESSION_SUFFIXES) if fmt == 'json' else [None])]
+
+def split_data_file_name(name: str) -> Optional[Tuple[str, str]]:
+    """Split a data file name into (ticker, suffix); None for names that are not ticker files."""
+    for suffix in sorted(DATA_SUFFIXES, key=len, reverse=True):
+        if name.endswith(suffix) and len(name) > len(suffix):
+            return name[:-len(suffix)], suffix
+    return None
+
+def data_file_format(path) -> Tuple[str, Optional[str]]:
+    """(format, compression named by the suffix) of a stored ticker file."""
+    suffix = split_data_file_name(Path(path).name)[1]
+    for codec, codec_suffix in COMPRESSION_SUFFIXES.items():
+        if suffix.endswith(codec_suffix):
+            return suffix[:-len(codec_suffix)].lstrip('.'), codec
+    return suffix.lstrip('.'), None
+
+def compress_payload(payload: bytes, compression: Optional[str], level: Optional[int] = None) -> bytes:
+    """Compress an encoded file with a codec from COMPRESSION_SUFFIXES (None returns it unchanged)."""
+    if not compression:
+        return payload
+    level = DEFAULT_LEVELS[compression] if level is None else level
+    if compression == 'gzip':
+        # mtime=0 keeps the output identical for identical data
+        return gzip.compress(payload, compresslevel=level, mtime=0)
+    if compression == 'zstd':
+        if zstandard is None:
+            raise ImportError("The zstandard package is required for zstd compression")
+        return zstandard.ZstdCompressor(level=level).compress(payload)
+    raise ValueError(f"Unsupported compression: {compression}")
+
+def read_file_bytes(path) -> bytes:
+    """Read a stored file, decompressing it when its magic bytes show a known codec."""
+    with open(path, 'rb') as f:
+        payload = f.read()
+    if payload.startswith(COMPRESSION_MAGIC['gzip']):
+        return gzip.decompress(payload)
+    if payload.startswith(COMPRESSION_MAGIC['zstd']):
+        if zstandard is None:
+            raise ImportError(f"The zstandard package is required to read {path}")
+        return zstandard.ZstdDecompressor().decompressobj().decompress(payload)
+    return payload
+
+def find_data_file(data_dir, ticker: str) -> Optional[Path]:
+    """Return the stored file for ticker, or None if it has not been downloaded."""
+    data_dir = Path(data_dir)
+    for suffix in DATA_SUFFIXES:
+        path = data_dir / f'{ticker}{suffix}'
+        if path.exists():
+            return path
+    return None
+
+def list_tickers(data_dir) -> List[str]:
+    """Tickers with a stored file in any supported format, compressed or plain."""
+    names = (split_data_file_name(name) for name in os.listdir(data_dir) if not name.startswith('.'))
+    return sorted({name[0] for name in names if name is not None})
+
+def decode_price_data(payload: bytes, fmt: str = 'json') -> Optional[pd.DataFrame]:
+    """
+    Parse an uncompressed stored payload as a Date-indexed frame with the stored column names.
+
+    Returns:
+        DataFrame, or None if the payload holds no rows
+    """
+    if fmt == 'npz':
+        with np.load(io.BytesIO(payload), allow_pickle=False) as stored:
+            columns = {name: stored[name] for name in stored.files if name != 'Date'}
+            dates = stored['Date']
+        if len(dates) == 0:
+            return None
+        df = pd.DataFrame(columns, index=pd.DatetimeIndex(dates.astype('datetime64[ns]'), name='Date'))
+    elif fmt == 'parquet':
+        df = pd.read_parquet(io.BytesIO(payload))
+        if df.empty:
+            return None
+    else:
+        records = json.loads(payload)
+        if not records:
+            return None
+        df = pd.DataFrame(records)
+        df['Date'] = pd.to_datetime(df['Date'])
+        return df.set_index('Date')
+    return df
+
+def read_price_data(path) -> Optional[pd.DataFrame]:
+    """
+    Load a stored file as a Date-indexed frame with the stored column names.
+
+    Returns:
+        DataFrame, or None if the file holds no rows
+    """
+    return decode_price_data(read_file_bytes(path), data_file_format(path)[0])
+
+def serialize_price_data(df: pd.DataFrame, fmt: str = 'json') -> bytes:
+    """Encode a Date-indexed frame in the given format."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported storage format: {fmt}")
+    if fmt == 'json':
+        return df.reset_index().to_json(orient='records', date_format='iso').encode()
+    buffer = io.BytesIO()
+    if fmt == 'npz':
+        arrays = {'Date': df.index.values.astype('datetime64[D]')}
+        for col in df.columns:
+            # float64 keeps the values JSON would round-trip (float32 loses 5-decimal prices)
+            values = df[col].to_numpy(dtype='float64')
+            if col == 'Volume' and not np.isnan(values).any():
+                values = values.astype('int64')
+            arrays[col] = values
+        np.savez(buffer, **arrays)
+    else:
+        df.to_parquet(buffer)
+    return buffer.getvalue()
+
+def store_payload(data_dir, ticker: str, payload: bytes, fmt: str = 'json', compression: Optional[str] = None) -> Path:
+    """
+    Write an encoded ticker file atomically (via a temp file).
+
+    The payload must already be compressed with `compression` (see compress_payload).
+    Copies of the ticker in other formats or codecs are removed afterwards.
+    """
+    if compression and fmt != 'json':
+        raise ValueError("Compression is only supported for json files")
+    data_dir = Path(data_dir)
+    suffix = file_suffix(fmt, compression)
+    path = data_dir / f'{ticker}{suffix}'
+    temp_path = data_dir / f'.{ticker}{suffix}.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(payload)
+    os.replace(temp_path, path)
+    for other in DATA_SUFFIXES:
+        if other != suffix:
+            stale = data_dir / f'{ticker}{other}'
+            if stale.exists():
+                stale.unlink()
+    return path
+
+def write_price_data(data_dir, ticker: str, df: pd.DataFrame, fmt: str = 'json',
+                     compression: Optional[str] = None, level: Optional[int] = None) -> Path:
+    """Serialize, optionally compress and store a Date-indexed frame for ticker in the given format."""
+    payload = compress_payload(serialize_price_data(df, fmt), compression, level)
+    return store_payload(data_dir, ticker, payload, fmt, compression)
+
+def append_price_data(data_dir, ticker: str, stored: pd.DataFrame, new_rows: pd.DataFrame, fmt: str = 'json',
+                      compression: Optional[str] = None, level: Optional[int] = None) -> Path:
+    """
+    Add bars newer than the stored series.
+
+    A plain JSON file that stays plain JSON is extended in place without rewriting its
+    history; compressed and columnar files (or a change of format) are rewritten with
+    the combined series.
+    """
+    path = find_data_file(data_dir, ticker)
+    if path is None or not path.name.endswith(file_suffix(fmt, compression)) or fmt != 'json' or compression:
+        return write_price_data(data_dir, ticker, pd.concat([stored, new_rows]), fmt, compression, level)
+    payload = serialize_price_data(new_rows, 'json')
+    with open(path, 'rb+') as f:
+        f.seek(-2, os.SEEK_END)
+        tail = f.read(2)
+        if not tail.endswith(b']'):
+            raise ValueError(f"Stored file for {ticker} is not a JSON array")
+        f.seek(-1, os.SEEK_END)
+        f.write(payload[1:] if tail.startswith(b'[') else b',' + payload[1:])
+    return path
+
+def actions_path(data_dir, ticker: str) -> Path:
+    """Location of the split/dividend table for ticker."""
+    return Path(data_dir) / ACTIONS_DIR / f'{ticker}.json'
+
+def extract_actions(df: pd.DataFrame) -> pd.DataFrame:
+    """Rows of a price frame that carry a dividend or split (missing action columns count as none)."""
+    actions = df.reindex(columns=ACTION_COLUMNS).fillna(0.0).astype('float64')
+    return actions[(actions != 0).any(axis=1)]
+
+def read_actions(data_dir, ticker: str) -> Optional[pd.DataFrame]:
+    """
+    Load the split/dividend table for ticker.
+
+    Returns:
+        Date-indexed frame with ACTION_COLUMNS (possibly empty), or None if the ticker has no table
+    """
+    path = actions_path(data_dir, ticker)
+    if not path.exists():
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        records = json.load(f)
+    actions = pd.DataFrame(records, columns=['Date'] + ACTION_COLUMNS)
+    actions['Date'] = pd.to_datetime(actions['Date'])
+    return actions.set_index('Date').astype('float64')
+
+def merge_actions(data_dir, ticker: str, events: pd.DataFrame, replace: bool = False) -> Path:
+    """
+    Add events to the ticker's split/dividend table (written even when empty, which marks the ticker as unadjusted).
+
+    Args:
+        events: Frame with ACTION_COLUMNS for the fetched range (extract_actions output)
+        replace: Start a new table instead of merging into the stored one (full downloads)
+    """
+    path = actions_path(data_dir, ticker)
+    path.parent.mkdir(exist_ok=True)
+    stored = None if replace else read_actions(data_dir, ticker)
+    if stored is not None and not stored.empty:
+        events = pd.concat([stored[~stored.index.isin(events.index)], events]).sort_index()
+    events = events.rename_axis('Date').reset_index()
+    events['Date'] = pd.to_datetime(events['Date']).dt.strftime('%Y-%m-%d')
+    temp_path = path.parent / f'.{path.name}.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(events.to_dict(orient='records'), f)
+    os.replace(temp_path, path)
+    return path
+
+def remove_actions(data_dir, ticker: str):
+    """Drop the ticker's split/dividend table (its stored prices are adjusted already)."""
+    path = actions_path(data_dir, ticker)
+    if path.exists():
+        path.unlink()
+
+def adjustment_factors(dates: np.ndarray, close: np.ndarray, actions: pd.DataFrame):
+    """
+    Cumulative back-adjustment factors for raw bars.
+
+    A bar is scaled by every event with a later ex-date: a split of ratio r divides
+    prices by r and multiplies volume by r, a dividend d multiplies prices by
+    1 - d / (close before the ex-date), as Yahoo does for adjusted closes.
+
+    Returns:
+        Tuple of (price factors, volume factors), one per bar
+    """
+    event_dates = actions.index.values.astype('datetime64[ns]')
+    splits = actions['Stock Splits'].to_numpy(dtype='float64')
+    splits = np.where(splits > 0, splits, 1.0)
+    dividends = actions['Dividends'].to_numpy(dtype='float64')
+    
+    # Close of the last bar before each ex-date, in the same share units as the dividend
+    previous = np.searchsorted(dates, event_dates, side='left') - 1
+    previous_close = np.where(previous >= 0, close[np.maximum(previous, 0)], np.nan) / splits
+    dividend_factor = 1.0 - dividends / previous_close
+    dividend_factor = np.where((dividend_factor > 0) & (dividend_factor <= 1), dividend_factor, 1.0)
+    
+    # Suffix products: position k holds the combined factor of events k and later
+    price_factor = np.append(np.cumprod((dividend_factor / splits)[::-1])[::-1], 1.0)
+    volume_factor = np.append(np.cumprod(splits[::-1])[::-1], 1.0)
+    first_later_event = np.searchsorted(event_dates, dates, side='right')
+    return price_factor[first_later_event], volume_factor[first_later_event]
+
+def adjust_price_data(df: pd.DataFrame, actions: Optional[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Apply split/dividend adjustments to a Date-indexed frame of raw bars.
+
+    Open/High/Low/Close and Volume are adjusted in one vectorized pass; other
+    columns (stored SMAs) are left as they are. Frames without events are
+    returned unchanged.
+    """
+    if actions is None or actions.empty or df.empty:
+        return df
+    actions = actions.sort_index()
+    if not df.index.is_monotonic_increasing:
+        df = df.sort_index()
+    price_factor, volume_factor = adjustment_factors(df.index.values.astype('datetime64[ns]'),
+                                                     df['Close'].to_numpy(dtype='float64'), actions)
+    df = df.copy()
+    for col in ['Open', 'High', 'Low', 'Close']:
+        df[col] = df[col].to_numpy(dtype='float64') * price_factor
+    df['Volume'] = df['Volume'].to_numpy(dtype='float64') * volume_factor
+    return df
+
+def convert_directory(data_dir, fmt: str, compression: Optional[str] = None, level: Optional[int] = None) -> int:
+    """Rewrite every stored ticker in data_dir in the given format and codec; returns the number converted."""
+    converted = 0
+    target = file_suffix(fmt, compression)
+    for ticker in list_tickers(data_dir):
+        path = find_data_file(data_dir, ticker)
+        if split_data_file_name(path.name)[1] == target:
+            continue
+        df = read_price_data(path)
+        if df is not None:
+            write_price_data(data_dir, ticker, df, fmt, compression, level)
+            converted += 1
+    return converted
+
+def measure_directory(data_dir, sample: int = 200):
+    """Print average load time, file size and load throughput per ticker for each format and codec in data_dir."""
+    by_format = {}
+    for ticker in list_tickers(data_dir):
+        path = find_data_file(data_dir, ticker)
+        by_format.setdefault(split_data_file_name(path.name)[1].lstrip('.'), []).append(path)
+    for fmt, paths in sorted(by_format.items()):
+        paths = paths[:sample]
+        started = time.perf_counter()
+        rows = sum(len(df) for df in map(read_price_data, paths) if df is not None)
+        elapsed = time.perf_counter() - started
+        size = sum(p.stat().st_size for p in paths)
+        print(f"{fmt:9s} {len(paths):6d} files  {size / len(paths) / 1024:8.1f} KiB/ticker  "
+              f"{elapsed / len(paths) * 1000:7.2f} ms/ticker  {rows / max(elapsed, 1e-9):12,.0f} rows/s  "
+              f"{size / 2**20 / max(elapsed, 1e-9):8.1f} MiB/s read")
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert or measure stored price data files')
+    parser.add_argument('data_dir', nargs='?', default='data', help='Directory with ticker files')
+    parser.add_argument('--to', choices=FORMATS, help='Convert every ticker to this format')
+    parser.add_argument('--compression', choices=COMPRESSIONS,
+                        help='Compress converted json files (zstd needs the zstandard package)')
+    parser.add_argument('--level', type=int, help='Compression level (default: zstd 3, gzip 6)')
+    parser.add_argument('--sample', type=int, default=200, help='Files per format to time when measuring')
+    args = parser.parse_args()
+    if args.compression and args.to not in (None, 'json'):
+        parser.error("--compression only applies to json files")
+    if args.to or args.compression:
+        fmt = args.to or 'json'
+        converted = convert_directory(args.data_dir, fmt, args.compression, args.level)
+        print(f"Converted {converted} tickers to {file_suffix(fmt, args.compression).lstrip('.')}")
+    measure_directory(args.data_dir, args.sample)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Check that pipelined detection matches a standalone detection pass.
+
+Downloads synthetic tickers into a temporary directory with the downloader
+handing every stored frame to a DetectionWorker (what download.py --detect
+does), then runs process_ticker on the same files the way quality_breakouts.py
+reads them. The two breakout trees are written under separate dataset names in
+ds/ and must be byte-identical; the script exits non-zero on any difference:
+
+    python verify_detection.py --tickers 40 --format npz
+"""
+
+import argparse
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, List
+
+import pandas as pd
+from rich.console import Console
+
+script_dir = Path(__file__).parent
+sys.path.insert(0, str(script_dir))
+import quality_breakouts
+from download import StockDataDownloader
+from providers import SyntheticProvider
+from storage import COMPRESSIONS, FORMATS, list_tickers
+
+def read_tree(root: Path) -> Dict[str, bytes]:
+    """Contents of every file below root, keyed by its relative path."""
+    if not root.exists():
+        return {}
+    return {path.relative_to(root).as_posix(): path.read_bytes() for path in sorted(root.rglob('*')) if path.is_file()}
+
+def detect_handoff(args, output_dir: str) -> List[str]:
+    """Download the synthetic tickers with detection fed from the downloader; returns the stored tickers."""
+    end_date = pd.Timestamp(args.end_date)
+    start_date = end_date - pd.offsets.BDay(args.history_days - 1)
+    provider = SyntheticProvider(start_date=start_date.strftime('%Y-%m-%d'), end_date=end_date.strftime('%Y-%m-%d'),
+                                 latency=0, jitter=0, seed=args.seed)
+    detector = quality_breakouts.DetectionWorker(data_dir=Path(output_dir))
+    try:
+        downloader = StockDataDownloader(output_dir=output_dir, workers=args.workers, requests_per_second=1000,
+                                         provider=provider, storage_format=args.format, compression=args.compression,
+                                         on_stored=detector.submit)
+        downloader.batch_pause = 0
+        downloader.console = Console(quiet=True)
+        downloader.process_all([f'SYN{i:05d}' for i in range(args.tickers)])
+        downloader.manifest.close()
+    finally:
+        detector.close()
+    return list_tickers(output_dir)
+
+def detect_standalone(tickers: List[str], output_dir: str):
+    """Detect breakouts from the stored files, as quality_breakouts.py does."""
+    for ticker in tickers:
+        quality_breakouts.process_ticker(ticker, None, Path(output_dir))
+    quality_breakouts.close_writer()
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description='Compare pipelined and standalone breakout detection')
+    parser.add_argument('--tickers', type=int, default=40,
+                        help='Synthetic tickers to download')
+    parser.add_argument('--history-days', type=int, default=2500,
+                        help='Bars per ticker')
+    parser.add_argument('--end-date', default='2024-12-31',
+                        help='Last date of the synthetic histories')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed for the synthetic series')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Concurrent batch workers')
+    parser.add_argument('--format', choices=FORMATS, default='json',
+                        help='Storage format for the downloaded files')
+    parser.add_argument('--compression', choices=COMPRESSIONS,
+                        help='Compress json data files')
+    return parser.parse_args()
+
+def main() -> int:
+    console = Console()
+    args = parse_args()
+    dataset_name = quality_breakouts.CONFIG['dataset_name']
+    names = {mode: f'verify-{mode}-{args.seed}' for mode in ('handoff', 'standalone')}
+    roots = {mode: quality_breakouts.SCRIPT_DIR / 'ds' / name for mode, name in names.items()}
+    for root in roots.values():
+        shutil.rmtree(root, ignore_errors=True)
+
+    try:
+        with tempfile.TemporaryDirectory(prefix='verify-detection-') as output_dir:
+            quality_breakouts.CONFIG['dataset_name'] = names['handoff']
+            tickers = detect_handoff(args, output_dir)
+            quality_breakouts.CONFIG['dataset_name'] = names['standalone']
+            detect_standalone(tickers, output_dir)
+        trees = {mode: read_tree(root) for mode, root in roots.items()}
+    finally:
+        quality_breakouts.CONFIG['dataset_name'] = dataset_name
+        for root in roots.values():
+            shutil.rmtree(root, ignore_errors=True)
+
+    handoff, standalone = trees['handoff'], trees['standalone']
+    differing = sorted(name for name in handoff.keys() & standalone.keys() if handoff[name] != standalone[name])
+    only_handoff = sorted(handoff.keys() - standalone.keys())
+    only_standalone = sorted(standalone.keys() - handoff.keys())
+    for label, names in (('Differs', differing), ('Only in handoff run', only_handoff),
+                         ('Only in standalone run', only_standalone)):
+        for name in names[:10]:
+            console.print(f"[red]{label}: {name}[/red]")
+    if differing or only_handoff or only_standalone:
+        console.print(f"[bold red]{len(differing)} differing, {len(only_handoff)} handoff-only and "
+                      f"{len(only_standalone)} standalone-only files across {len(tickers)} tickers[/bold red]")
+        return 1
+    console.print(f"[bold green]{len(handoff)} files byte-identical across {len(tickers)} tickers[/bold green]")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())